@@ -0,0 +1,68 @@
+"""
+Payload size and encode/decode time of JSON compared to MessagePack for the workout endpoints.
+
+Usage:
+    python benchmarks/content_negotiation_benchmark.py [--workouts 200] [--rounds 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import msgpack
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from garmin.serializer import GarminSerializer  # noqa: E402
+from negotiation import NegotiatedResponse  # noqa: E402
+from parser.runfun_parser import RunFunParser  # noqa: E402
+
+
+def timed(function, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds
+
+
+def report(label: str, size: int, encode: float, decode: float) -> None:
+    print(f"{label:<12} {size:>10,} bytes {encode * 1_000_000:>10.1f} us encode {decode * 1_000_000:>10.1f} us decode")
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--workouts", type=int, default=200)
+    arguments.add_argument("--rounds", type=int, default=200)
+    options = arguments.parse_args()
+
+    parser, serializer = RunFunParser(), GarminSerializer()
+    payloads = [
+        serializer.serialize(parser.parse(f"{10 + i % 10}' zr + {3 + i % 5}x (1km + 2' zr) + 10' zr"))
+        for i in range(options.workouts)
+    ]
+    content = {"workouts": payloads}
+
+    # The JSON side is what JSONResponse and Request.json() do.
+    json_body = NegotiatedResponse(content).body
+    report(
+        "json",
+        len(json_body),
+        timed(lambda: NegotiatedResponse(content).body, options.rounds),
+        timed(lambda: json.loads(json_body), options.rounds),
+    )
+
+    msgpack_body = msgpack.packb(content, use_bin_type=True)
+    report(
+        "msgpack",
+        len(msgpack_body),
+        timed(lambda: msgpack.packb(content, use_bin_type=True), options.rounds),
+        timed(lambda: msgpack.unpackb(msgpack_body, raw=False), options.rounds),
+    )
+
+    print(f"msgpack is {len(msgpack_body) / len(json_body):.0%} of the JSON size "
+          f"for {options.workouts} workouts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Throughput of the FIT workout encoder and of the streamed ZIP export.
+
+Usage:
+    python benchmarks/fit_encoder_benchmark.py [--workouts 5000]
+"""
+import argparse
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from garmin.fit_archive import iter_fit_archive  # noqa: E402
+from garmin.fit_encoder import FitWorkoutEncoder  # noqa: E402
+from parser.runfun_parser import RunFunParser  # noqa: E402
+
+
+EXPRESSIONS = [
+    "50' zr",
+    "15' zr + 2x (8' zm + 5' zr) + 10' zr",
+    "20' zr + 6x (3' ze + 2' zr) + 10' zr",
+    "10' zr + 1,5km + 3x (4' zs + 2' zr) + 15' zr",
+]
+
+
+def report(label: str, count: int, size: int, elapsed: float) -> None:
+    print(
+        f"{label:<24} {count / elapsed:>12,.0f} files/s {size / elapsed / 1_000_000:>10.1f} MB/s"
+        f" {elapsed * 1_000_000 / count:>8.1f} us/file"
+    )
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--workouts", type=int, default=5000)
+    count = arguments.parse_args().workouts
+
+    parser = RunFunParser()
+    workouts = [parser.parse(EXPRESSIONS[i % len(EXPRESSIONS)]) for i in range(count)]
+    encoder = FitWorkoutEncoder()
+
+    start = time.perf_counter()
+    size = sum(len(encoder.encode_view(workout)) for workout in workouts)
+    report("encode_view", count, size, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    size = sum(len(encoder.encode(workout)) for workout in workouts)
+    report("encode", count, size, time.perf_counter() - start)
+
+    for label, compression in [("zip stored", zipfile.ZIP_STORED), ("zip deflated", zipfile.ZIP_DEFLATED)]:
+        files = ((f"{i:05d}.fit", workout) for i, workout in enumerate(workouts))
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in iter_fit_archive(files, compression))
+        report(label, count, size, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
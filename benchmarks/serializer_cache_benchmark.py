@@ -0,0 +1,47 @@
+"""
+Time to serialize a plan whose workouts reuse a few blocks, with and without the serialized step cache.
+
+Usage:
+    python benchmarks/serializer_cache_benchmark.py [--workouts 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from garmin.serializer import GarminSerializer, SerializedStepCache  # noqa: E402
+from parser.runfun_parser import RunFunParser  # noqa: E402
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--workouts", type=int, default=10_000)
+    options = arguments.parse_args()
+
+    parser = RunFunParser()
+    blocks = ["2x (8' zm + 5' zr)", "3x (1km + 2' zr)", "5x (400m + 1' zr)", "20' zm", "4x (3' ze + 2' zr)"]
+    workouts = [
+        parser.parse(f"{10 + i % 3 * 5}' zr + {blocks[i % 5]} + {blocks[(i * 3 + 1) % 5]} + 10' zr")
+        for i in range(options.workouts)
+    ]
+    steps = sum(1 + len(getattr(step, "steps", ())) for workout in workouts for step in workout.steps)
+
+    uncached = timed(lambda: [GarminSerializer().serialize(w) for w in workouts])
+    cache = SerializedStepCache()
+    cached = timed(lambda: [GarminSerializer(cache=cache).serialize(w) for w in workouts])
+
+    print(f"{options.workouts:,} workouts, {steps:,} steps")
+    print(f"{'uncached':<10} {uncached * 1000:>8.1f} ms")
+    print(f"{'cached':<10} {cached * 1000:>8.1f} ms ({uncached / cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Instantiating a compiled workout template compared to parsing and serializing the expression.
+
+Each measure is the best of --repeat runs. Fails when instantiate_payload is not TARGET_SPEEDUP times
+faster than parse + serialize.
+
+Usage:
+    python benchmarks/template_benchmark.py [--workouts 20000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from garmin.serializer import GarminSerializer  # noqa: E402
+from parser.runfun_parser import RunFunParser  # noqa: E402
+from parser.template import WorkoutTemplate  # noqa: E402
+
+
+TEMPLATE = "{warm}' zr + {km}km + {n}x ({rep}' ze + {rec}' zr) + {cool}' zr"
+
+TARGET_SPEEDUP = 10
+
+
+def report(label: str, count: int, elapsed: float) -> None:
+    print(f"{label:<24} {count / elapsed:>12,.0f} workouts/s {elapsed * 1_000_000 / count:>8.1f} us/workout")
+
+
+def best(run, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--workouts", type=int, default=20000)
+    arguments.add_argument("--repeat", type=int, default=3)
+    options = arguments.parse_args()
+    count = options.workouts
+
+    values = [
+        {"warm": 10 + i % 10, "km": 1 + i % 3 / 2, "n": 3 + i % 5, "rep": 2 + i % 4, "rec": 1 + i % 2, "cool": 10}
+        for i in range(count)
+    ]
+    expressions = [
+        f"{v['warm']}' zr + {v['km']:g}km + {v['n']}x ({v['rep']}' ze + {v['rec']}' zr) + {v['cool']}' zr"
+        .replace(".", ",")
+        for v in values
+    ]
+
+    parser = RunFunParser()
+
+    def parse_all():
+        for expression in expressions:
+            GarminSerializer().serialize(parser.parse(expression))
+
+    parsing = best(parse_all, options.repeat)
+    report("parse + serialize", count, parsing)
+
+    start = time.perf_counter()
+    template = WorkoutTemplate(TEMPLATE)
+    report("compile", 1, time.perf_counter() - start)
+
+    def instantiate_payloads():
+        for parameters in values:
+            template.instantiate_payload(parameters)
+
+    def instantiate_workouts():
+        for parameters in values:
+            template.instantiate(parameters)
+
+    instantiating = best(instantiate_payloads, options.repeat)
+    report("instantiate_payload", count, instantiating)
+    report("instantiate", count, best(instantiate_workouts, options.repeat))
+
+    speedup = parsing / instantiating
+    print(f"speedup {speedup:.1f}x")
+    assert speedup >= TARGET_SPEEDUP, f"instantiate_payload is {speedup:.1f}x faster, the target is {TARGET_SPEEDUP}x"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Cost of a span when the request is sampled out, when it is sampled, and of parsing a workout with and
+without a sampled trace.
+
+Usage:
+    python benchmarks/tracing_benchmark.py [--rounds 200000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from parser.runfun_parser import RunFunParser  # noqa: E402
+from tracing import SpanExporter, Tracer, span  # noqa: E402
+
+
+class DiscardExporter(SpanExporter):
+    def export(self, span) -> None:
+        pass
+
+
+def timed(function, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds
+
+
+def empty_span() -> None:
+    with span("noop"):
+        pass
+
+
+def report(label: str, seconds: float) -> None:
+    print(f"{label:<28} {seconds * 1_000_000:>8.2f} us")
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--rounds", type=int, default=200_000)
+    options = arguments.parse_args()
+
+    parser = RunFunParser()
+    expression = "15' zr + 2x (8' zm + 5' zr) + 3x (1km + 2' zr) + 10' zr"
+    tracer = Tracer(DiscardExporter(), sample_ratio=1.0)
+
+    report("span, sampled out", timed(empty_span, options.rounds))
+    report("parse, sampled out", timed(lambda: parser.parse(expression), options.rounds // 10))
+
+    with tracer.start_trace("benchmark"):
+        report("span, sampled", timed(empty_span, options.rounds))
+        report("parse, sampled", timed(lambda: parser.parse(expression), options.rounds // 10))
+
+
+if __name__ == "__main__":
+    main()
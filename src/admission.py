@@ -0,0 +1,277 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from enum import IntEnum
+from typing import Any, Callable, Coroutine, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.dependencies.models import Dependant
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.background import BackgroundTask
+
+from metrics import MetricsRegistry, metrics
+from negotiation import NegotiatedResponse
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    LOW = 1
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is shed instead of admitted.
+
+    Attributes:
+        reason (str): "queue_full" when the wait queue is full, "evicted" when a higher priority
+            request took its place in the queue, or "queue_timeout" when it waited too long.
+        retry_after (int): Seconds after which the client may try again.
+    """
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"Request shed: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "sequence", "future")
+
+    def __init__(self, priority: Priority, sequence: int, future: asyncio.Future) -> None:
+        self.priority = priority
+        self.sequence = sequence
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class AdmissionController:
+    """
+    The AdmissionController bounds the number of requests handled at once.
+
+    Up to limit requests run concurrently. The next ones wait in a queue of at most queue_size requests,
+    served by priority and then in arrival order, for at most queue_timeout seconds. Requests that
+    cannot wait are shed at once with AdmissionRejected, so clients get a fast answer telling them when
+    to retry instead of a timeout. When the queue is full, a high priority request takes the place of
+    the latest low priority one.
+
+    A limit of 0 admits every request. The controller is not thread-safe, it is meant to be used
+    from the event loop.
+    """
+
+    def __init__(self,
+                 limit: int,
+                 queue_size: int,
+                 queue_timeout: float,
+                 name: str = "default",
+                 registry: MetricsRegistry = metrics) -> None:
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.name = name
+        self._in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        # Moving average of the time requests hold a slot, used to tell clients when to retry.
+        self._service_time = 1.0
+
+        self._in_flight_gauge = registry.gauge("admission_in_flight", "Requests being handled")
+        self._queue_depth = registry.gauge("admission_queue_depth", "Requests waiting to be admitted")
+        self._queue_time = registry.histogram("admission_queue_seconds", "Time requests waited to be admitted")
+        self._shed = registry.counter("admission_shed_total", "Requests shed by admission control")
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """
+        Return the seconds the queue takes to drain at the current pace, at least one.
+        """
+        if self.limit <= 0:
+            return 1
+        return max(1, math.ceil(self._service_time * (len(self._waiters) + 1) / self.limit))
+
+    async def acquire(self, priority: Priority = Priority.HIGH) -> None:
+        """
+        Wait for a slot, raising AdmissionRejected if the request is shed.
+        """
+        if self.limit <= 0:
+            return
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            self._update_in_flight()
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            victim = max(self._waiters, default=None)
+            if victim is None or victim.priority <= priority:
+                self._reject(priority, "queue_full")
+            self._remove(victim)
+            victim.future.set_exception(AdmissionRejected("evicted", self.retry_after()))
+            self._shed.inc(controller=self.name, priority=victim.priority.label, reason="evicted")
+
+        waiter = _Waiter(priority, next(self._sequence), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._update_queue_depth()
+        started = time.monotonic()
+
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            self._reject(priority, "queue_timeout")
+        except asyncio.CancelledError:
+            self._remove(waiter)
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # The slot was handed over as the request was cancelled, pass it on.
+                self.release()
+            raise
+        finally:
+            self._queue_time.observe(time.monotonic() - started, controller=self.name, priority=priority.label)
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """
+        Give the slot of a finished request to the next waiting request.
+        """
+        if self.limit <= 0:
+            return
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if not waiter.future.done():
+                # The slot moves to the waiter, so the number of requests in flight does not change.
+                waiter.future.set_result(None)
+                self._update_queue_depth()
+                return
+
+        self._in_flight -= 1
+        self._update_in_flight()
+        self._update_queue_depth()
+
+    def _reject(self, priority: Priority, reason: str) -> None:
+        self._shed.inc(controller=self.name, priority=priority.label, reason=reason)
+        raise AdmissionRejected(reason, self.retry_after())
+
+    def _remove(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            self._update_queue_depth()
+
+    def _update_in_flight(self) -> None:
+        self._in_flight_gauge.set(self._in_flight, controller=self.name)
+
+    def _update_queue_depth(self) -> None:
+        for priority in Priority:
+            depth = sum(1 for waiter in self._waiters if waiter.priority == priority)
+            self._queue_depth.set(depth, controller=self.name, priority=priority.label)
+
+
+def depends_on(dependant: Dependant, calls: Iterable[Callable]) -> bool:
+    """
+    Return whether one of the calls is a dependency of the dependant, directly or not.
+    """
+    calls = tuple(calls)
+    return any(
+        dependency.call in calls or depends_on(dependency, calls) for dependency in dependant.dependencies
+    )
+
+
+class AdmittedRoute(APIRoute):
+    """
+    Route class putting the endpoints of a router behind an AdmissionController.
+
+    Subclasses set the controller in admission. Endpoints depending on one of low_priority_dependencies,
+    such as the client of a slow remote service, wait behind the other endpoints of the router. The
+    slot is held while the endpoint runs and, for a streaming response, until its body is sent, since
+    the work of such endpoints is done as the body is produced.
+    """
+
+    admission: Optional[AdmissionController] = None
+    low_priority_dependencies: Tuple[Callable, ...] = ()
+    reject_status_code = 503
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        controller = self.admission
+        if controller is None:
+            return handler
+
+        priority = Priority.LOW if depends_on(self.dependant, self.low_priority_dependencies) else Priority.HIGH
+        status_code = self.reject_status_code
+
+        async def admitted_handler(request: Request) -> Response:
+            try:
+                await controller.acquire(priority)
+            except AdmissionRejected as ex:
+                return NegotiatedResponse(
+                    status_code=status_code,
+                    headers={"Retry-After": str(ex.retry_after)},
+                    content={
+                        "error": "overloaded",
+                        "message": "The server is busy, retry later",
+                        "detail": ex.reason,
+                    },
+                )
+
+            started = time.monotonic()
+            released = False
+
+            def release() -> None:
+                nonlocal released
+                if not released:
+                    released = True
+                    controller.release(time.monotonic() - started)
+
+            try:
+                response = await handler(request)
+            except BaseException:
+                release()
+                raise
+            if isinstance(response, StreamingResponse):
+                _release_after_body(response, release)
+            else:
+                release()
+            return response
+
+        return admitted_handler
+
+
+def _release_after_body(response: StreamingResponse, release: Callable[[], None]) -> None:
+    """
+    Call release once the body of the response is sent, or once sending it stopped because the client
+    went away, whichever comes first.
+    """
+    body = response.body_iterator
+
+    async def releasing_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            release()
+
+    background = response.background
+
+    async def after_body() -> None:
+        release()
+        if background is not None:
+            await background()
+
+    response.body_iterator = releasing_body()
+    response.background = BackgroundTask(after_body)
@@ -0,0 +1,236 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.step import RepeatedStep
+from models.target import PaceTarget
+from models.workout import Workout
+
+
+# Exponent of the Riegel model, T2 = T1 * (D2 / D1) ** 1.06.
+RIEGEL_EXPONENT = 1.06
+
+# Relative width of a pace target around the race pace, 2% is about 5 s/km at 4:00/km.
+PACE_TOLERANCE = 0.02
+
+STANDARD_DISTANCES = (1000.0, 1500.0, 1609.344, 3000.0, 5000.0, 10000.0, 15000.0, 21097.5, 42195.0)
+
+# Reference race times of an athlete, seconds per distance in meters.
+RaceTimes = Mapping[float, float]
+
+
+def predict_race_times(reference_distances: np.ndarray,
+                       reference_times: np.ndarray,
+                       distances: np.ndarray,
+                       exponent: float = RIEGEL_EXPONENT) -> np.ndarray:
+    """
+    Predict race times for many athletes at once with the Riegel model.
+
+    Args:
+        reference_distances: (athletes, references) meters of the reference races, NaN where missing.
+        reference_times: (athletes, references) seconds of the reference races, NaN where missing.
+        distances: (distances,) meters to predict.
+
+    Returns:
+        (athletes, distances) predicted seconds. Each distance is predicted from the reference race of the
+        athlete closest to it in log distance, so a 5k pace comes from a 10k rather than a marathon.
+    """
+    ratio = distances[None, None, :] / reference_distances[:, :, None]
+    predictions = reference_times[:, :, None] * ratio ** exponent
+
+    gap = np.abs(np.log(ratio))
+    gap[np.isnan(gap)] = np.inf
+    closest = np.argmin(gap, axis=1)[:, None, :]
+    return np.take_along_axis(predictions, closest, axis=1)[:, 0, :]
+
+
+class PaceTable:
+    """
+    The race times of one athlete over a set of distances, with the speed range of the pace targets at
+    each race pace.
+
+    Speed ranges of the table distances are computed once, when the table is built. Other distances are
+    predicted from the closest table distance on first use and kept.
+    """
+
+    def __init__(self,
+                 distances: Sequence[float],
+                 times: Sequence[float],
+                 tolerance: float = PACE_TOLERANCE,
+                 exponent: float = RIEGEL_EXPONENT) -> None:
+        self.tolerance = tolerance
+        self.exponent = exponent
+        self._times: Dict[float, float] = {float(d): float(t) for d, t in zip(distances, times)}
+        self._speeds: Dict[float, Tuple[float, float]] = {
+            distance: self._speed_range(distance, time) for distance, time in self._times.items()
+        }
+
+    def race_time(self, distance: float) -> float:
+        """
+        Return the predicted race time in seconds over a distance in meters.
+        """
+        time = self._times.get(distance)
+        if time is None:
+            closest = min(self._times, key=lambda d: abs(np.log(distance / d)))
+            time = self._times[closest] * (distance / closest) ** self.exponent
+        return time
+
+    def pace(self, distance: float) -> float:
+        """
+        Return the race pace in seconds per kilometer over a distance in meters.
+        """
+        return self.race_time(distance) * 1000 / distance
+
+    def speed_range(self, distance: float) -> Tuple[float, float]:
+        """
+        Return the (low, high) speed range in meters per second of a pace target at the race pace.
+        """
+        speeds = self._speeds.get(distance)
+        if speeds is None:
+            speeds = self._speeds[distance] = self._speed_range(distance, self.race_time(distance))
+        return speeds
+
+    def to_dict(self) -> dict:
+        return {
+            "races": [
+                {"distance_meters": distance, "time_secs": round(time, 1), "pace_secs_per_km": round(time * 1000 / distance, 1)}
+                for distance, time in sorted(self._times.items())
+            ],
+        }
+
+    def _speed_range(self, distance: float, time: float) -> Tuple[float, float]:
+        return (
+            round(distance / (time * (1 + self.tolerance)), 3),
+            round(distance / (time * (1 - self.tolerance)), 3),
+        )
+
+
+def build_pace_tables(athletes: Mapping[str, RaceTimes],
+                      distances: Sequence[float] = STANDARD_DISTANCES,
+                      tolerance: float = PACE_TOLERANCE,
+                      exponent: float = RIEGEL_EXPONENT) -> Dict[str, PaceTable]:
+    """
+    Build the pace tables of many athletes with one vectorized prediction over every athlete and distance.
+    """
+    names = list(athletes)
+    if not names:
+        return {}
+
+    width = max(len(races) for races in athletes.values())
+    reference_distances = np.full((len(names), width), np.nan)
+    reference_times = np.full((len(names), width), np.nan)
+    for row, name in enumerate(names):
+        races = _validate(name, athletes[name])
+        reference_distances[row, :len(races)] = list(races)
+        reference_times[row, :len(races)] = list(races.values())
+
+    table_distances = np.asarray(distances, dtype=float)
+    times = predict_race_times(reference_distances, reference_times, table_distances, exponent)
+    return {
+        name: PaceTable(table_distances, times[row], tolerance, exponent)
+        for row, name in enumerate(names)
+    }
+
+
+class PaceTableCache:
+    """
+    Thread-safe cache of pace tables by athlete and reference race times, so a table is rebuilt when the
+    race times of the athlete change. Missing tables are built together in one batch, and the least
+    recently used tables are dropped beyond max_entries.
+    """
+
+    def __init__(self,
+                 max_entries: int = 4096,
+                 distances: Sequence[float] = STANDARD_DISTANCES,
+                 tolerance: float = PACE_TOLERANCE,
+                 exponent: float = RIEGEL_EXPONENT) -> None:
+        self.max_entries = max_entries
+        self.distances = tuple(distances)
+        self.tolerance = tolerance
+        self.exponent = exponent
+        self._lock = threading.Lock()
+        self._tables: "OrderedDict[Tuple[str, tuple], PaceTable]" = OrderedDict()
+
+    def get(self, athlete: str, races: RaceTimes) -> PaceTable:
+        return self.get_many({athlete: races})[athlete]
+
+    def get_many(self, athletes: Mapping[str, RaceTimes]) -> Dict[str, PaceTable]:
+        keys = {name: (name, tuple(sorted(races.items()))) for name, races in athletes.items()}
+        tables: Dict[str, PaceTable] = {}
+
+        with self._lock:
+            for name, key in keys.items():
+                table = self._tables.get(key)
+                if table is not None:
+                    self._tables.move_to_end(key)
+                    tables[name] = table
+
+        missing = {name: athletes[name] for name in keys if name not in tables}
+        built = build_pace_tables(missing, self.distances, self.tolerance, self.exponent)
+
+        with self._lock:
+            for name, table in built.items():
+                self._tables[keys[name]] = table
+                tables[name] = table
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+
+        return tables
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+
+
+pace_tables = PaceTableCache()
+
+
+def race_distances(workout: Workout) -> List[float]:
+    """
+    Return the race distances whose pace the steps of a workout target, in order of first use.
+    """
+    distances: Dict[float, None] = {}
+    for step in workout.steps:
+        for inner in step.steps if isinstance(step, RepeatedStep) else (step,):
+            if isinstance(inner.target, PaceTarget):
+                distances.setdefault(inner.target.race_distance)
+    return list(distances)
+
+
+def _validate(athlete: str, races: RaceTimes) -> Dict[float, float]:
+    if not races:
+        raise ValueError(f"Athlete {athlete} has no reference race time")
+    for distance, time in races.items():
+        if not distance > 0 or not time > 0:
+            raise ValueError(f"Invalid race time for athlete {athlete}: {time} seconds over {distance} meters")
+    return {float(distance): float(time) for distance, time in races.items()}
+
+
+def read_race_times(rows: Iterable[Mapping[str, str]]) -> Dict[str, Dict[float, float]]:
+    """
+    Read reference race times from rows with athlete, distance and time columns. Distances are in meters
+    or kilometers ("5000", "5000m", "10km", "21,0975km") and times in seconds or [h:]mm:ss.
+    """
+    athletes: Dict[str, Dict[float, float]] = {}
+    for row in rows:
+        athlete = (row.get("athlete") or "").strip()
+        if not athlete:
+            raise ValueError("Every race time needs an athlete")
+        athletes.setdefault(athlete, {})[_parse_distance(row["distance"])] = _parse_time(row["time"])
+    return athletes
+
+
+def _parse_distance(value: str) -> float:
+    value = value.strip().lower().replace(",", ".")
+    if value.endswith("km"):
+        return float(value[:-2]) * 1000
+    return float(value[:-1] if value.endswith("m") else value)
+
+
+def _parse_time(value: str) -> float:
+    seconds = 0.0
+    for part in value.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
@@ -0,0 +1,213 @@
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from models.condition import Distance, Duration
+from models.step import RepeatedStep, Step
+from models.target import HeartRateZoneTarget
+from models.workout import Workout
+from parser.runfun_parser import HeartRateZone, HeartRateZoneConfig
+
+
+NO_ZONE = -1
+
+
+class TrainingLoadConfig:
+    """
+    Athlete physiology used to turn heart rate targets into training load.
+
+    Attributes:
+        resting_hr (int): Resting heart rate in bpm.
+        max_hr (int): Maximum heart rate in bpm.
+        threshold_hr (int): Lactate threshold heart rate in bpm, used for hrTSS.
+        default_pace (float): Pace in seconds per kilometer used to estimate the duration of distance steps.
+    """
+
+    def __init__(self,
+                 resting_hr: int = 50,
+                 max_hr: int = 216,
+                 threshold_hr: int = 186,
+                 default_pace: float = 300.0) -> None:
+        if not resting_hr < threshold_hr <= max_hr:
+            raise ValueError("Heart rates must satisfy resting_hr < threshold_hr <= max_hr")
+        if default_pace <= 0:
+            raise ValueError("Default pace must be positive")
+
+        self.resting_hr = resting_hr
+        self.max_hr = max_hr
+        self.threshold_hr = threshold_hr
+        self.default_pace = default_pace
+
+
+class FlattenedSteps:
+    """
+    Column-oriented view of the executable steps of many workouts, with repetitions already
+    folded into the step durations.
+
+    Attributes:
+        workout_index (np.ndarray): Index of the workout that owns each step.
+        seconds (np.ndarray): Total time spent in each step, multiplied by its iterations.
+        zone (np.ndarray): Index of the heart rate zone of each step, or NO_ZONE.
+        heart_rate (np.ndarray): Midpoint of the heart rate target of each step, or NaN.
+    """
+
+    def __init__(self, workouts: List[Workout], config: TrainingLoadConfig) -> None:
+        zones = {HeartRateZoneConfig.ZONES[zone]: index for index, zone in enumerate(HeartRateZone)}
+        names = {zone.value: index for index, zone in enumerate(HeartRateZone)}
+        workout_index, seconds, zone, low, high = [], [], [], [], []
+
+        def append(index: int, step: Step, iterations: int) -> None:
+            workout_index.append(index)
+            seconds.append(self._step_seconds(step, config) * iterations)
+            if isinstance(step.target, HeartRateZoneTarget):
+                values = tuple(step.target.values)
+                zone.append(names[step.target.zone] if step.target.zone else zones.get(values, NO_ZONE))
+                low.append(values[0])
+                high.append(values[1])
+            else:
+                zone.append(NO_ZONE)
+                low.append(np.nan)
+                high.append(np.nan)
+
+        for index, workout in enumerate(workouts):
+            for step in workout.steps:
+                if isinstance(step, RepeatedStep):
+                    for inner in step.steps:
+                        append(index, inner, step.iterations)
+                else:
+                    append(index, step, 1)
+
+        self.workout_index = np.asarray(workout_index, dtype=np.intp)
+        self.seconds = np.asarray(seconds, dtype=np.float64)
+        self.zone = np.asarray(zone, dtype=np.intp)
+        self.heart_rate = (np.asarray(low, dtype=np.float64) + np.asarray(high, dtype=np.float64)) / 2
+
+    @staticmethod
+    def _step_seconds(step: Step, config: TrainingLoadConfig) -> float:
+        if isinstance(step.condition, Duration):
+            return float(step.condition.value)
+        if isinstance(step.condition, Distance):
+            return step.condition.value / 1000 * config.default_pace
+        return 0.0
+
+
+class PlanLoad:
+    """
+    Training load of a plan, computed for every workout at once.
+
+    Attributes:
+        duration (np.ndarray): Estimated duration of each workout in seconds.
+        time_in_zone (np.ndarray): Seconds spent in each heart rate zone, shaped (workouts, zones).
+        untargeted (np.ndarray): Seconds of each workout without a heart rate target.
+        trimp (np.ndarray): Banister TRIMP of each workout.
+        hr_tss (np.ndarray): Heart rate based training stress score of each workout.
+    """
+
+    ZONES: List[HeartRateZone] = list(HeartRateZone)
+
+    def __init__(self, workouts: List[Workout], dates: List[Optional[date]], config: TrainingLoadConfig) -> None:
+        self.workouts = workouts
+        self.dates = dates
+
+        steps = FlattenedSteps(workouts, config)
+        count = len(workouts)
+        targeted = steps.zone != NO_ZONE
+
+        self.duration = np.bincount(steps.workout_index, weights=steps.seconds, minlength=count)
+
+        self.time_in_zone = np.zeros((count, len(self.ZONES)), dtype=np.float64)
+        np.add.at(self.time_in_zone, (steps.workout_index[targeted], steps.zone[targeted]), steps.seconds[targeted])
+        self.untargeted = np.bincount(
+            steps.workout_index[~targeted], weights=steps.seconds[~targeted], minlength=count
+        )
+
+        heart_rate = np.nan_to_num(steps.heart_rate, nan=config.resting_hr)
+        reserve = np.clip((heart_rate - config.resting_hr) / (config.max_hr - config.resting_hr), 0.0, 1.0)
+        trimp = steps.seconds / 60 * reserve * 0.64 * np.exp(1.92 * reserve)
+        intensity = np.where(np.isnan(steps.heart_rate), 0.0, heart_rate / config.threshold_hr)
+        hr_tss = steps.seconds / 3600 * intensity ** 2 * 100
+
+        self.trimp = np.bincount(steps.workout_index, weights=trimp, minlength=count)
+        self.hr_tss = np.bincount(steps.workout_index, weights=hr_tss, minlength=count)
+
+    def per_workout(self) -> List[dict]:
+        return [
+            {
+                "workout_name": workout.name,
+                "workout_schedule": self.dates[index].isoformat() if self.dates[index] else None,
+                **self._summary(
+                    self.duration[index],
+                    self.time_in_zone[index],
+                    self.untargeted[index],
+                    self.trimp[index],
+                    self.hr_tss[index],
+                ),
+            }
+            for index, workout in enumerate(self.workouts)
+        ]
+
+    def per_week(self) -> List[dict]:
+        """
+        Aggregate the scheduled workouts by ISO week, starting on Monday. Unscheduled workouts are ignored.
+        """
+        scheduled = np.array([d is not None for d in self.dates], dtype=bool)
+        if not scheduled.any():
+            return []
+
+        days = np.array([d for d in self.dates if d is not None], dtype="datetime64[D]")
+        # 1970-01-01 was a Thursday, so shifting by 3 days aligns the modulo on Mondays.
+        weeks = days - (days.astype(np.int64) + 3) % 7
+        week_starts, week_index = np.unique(weeks, return_inverse=True)
+        count = len(week_starts)
+
+        def aggregate(values: np.ndarray) -> np.ndarray:
+            return np.bincount(week_index, weights=values[scheduled], minlength=count)
+
+        time_in_zone = np.zeros((count, len(self.ZONES)), dtype=np.float64)
+        np.add.at(time_in_zone, week_index, self.time_in_zone[scheduled])
+
+        workouts = np.bincount(week_index, minlength=count)
+        duration = aggregate(self.duration)
+        untargeted = aggregate(self.untargeted)
+        trimp = aggregate(self.trimp)
+        hr_tss = aggregate(self.hr_tss)
+
+        return [
+            {
+                "week_start": str(week_starts[index]),
+                "workouts": int(workouts[index]),
+                **self._summary(duration[index], time_in_zone[index], untargeted[index], trimp[index], hr_tss[index]),
+            }
+            for index in range(count)
+        ]
+
+    def _summary(self, duration, time_in_zone, untargeted, trimp, hr_tss) -> Dict[str, object]:
+        return {
+            "estimated_duration_in_secs": int(round(duration)),
+            "time_in_zone_in_secs": {
+                zone.value: int(round(seconds)) for zone, seconds in zip(self.ZONES, time_in_zone)
+            },
+            "untargeted_in_secs": int(round(untargeted)),
+            "trimp": round(float(trimp), 1),
+            "hr_tss": round(float(hr_tss), 1),
+        }
+
+
+class TrainingLoadEstimator:
+    """
+    The TrainingLoadEstimator computes time in zone, TRIMP and hrTSS for whole plans. The steps of all
+    workouts are flattened into arrays once, so the cost of the math does not grow with Python loops
+    over individual steps.
+    """
+
+    def __init__(self, config: TrainingLoadConfig = None) -> None:
+        self.config = config if config else TrainingLoadConfig()
+
+    def estimate(self, workouts: List[Workout], dates: List[Optional[date]] = None) -> PlanLoad:
+        if dates is None:
+            dates = [None] * len(workouts)
+        if len(dates) != len(workouts):
+            raise ValueError("Every workout must have a matching date entry")
+
+        return PlanLoad(workouts, dates, self.config)
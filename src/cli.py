@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+from analysis.race_pace import read_race_times
+from compiler.batch import BatchCompiler, read_csv, read_lines
+from garmin.authorization import GarminAuthorization
+from garmin.connect import GarminConnectClient
+from garmin.export import AccountExporter
+from library.store import WorkoutLibrary
+
+
+def compile_command(args: argparse.Namespace) -> int:
+    csv_input = args.format == "csv" or (args.format == "auto" and args.input.lower().endswith(".csv"))
+    race_times = None
+    if args.race_times:
+        with open(args.race_times, "r", encoding="utf-8", newline="") as f:
+            try:
+                race_times = read_race_times(csv.DictReader(f))
+            except ValueError as ex:
+                print(ex, file=sys.stderr)
+                return 2
+    compiler = BatchCompiler(workers=args.workers, chunk_size=args.chunk_size, race_times=race_times)
+
+    def on_error(line: str) -> None:
+        if not args.quiet:
+            print(line, file=sys.stderr)
+
+    with open(args.input, "r", encoding="utf-8", newline="") as f:
+        try:
+            records = read_csv(f, args.expression_column) if csv_input else read_lines(f)
+        except ValueError as ex:
+            print(ex, file=sys.stderr)
+            return 2
+        with (open(args.output, "w", encoding="utf-8") if args.output != "-" else nullcontext(sys.stdout)) as output:
+            report = compiler.run(records, output, on_error)
+
+    print(report, file=sys.stderr)
+    return 1 if report.failed else 0
+
+
+def export_command(args: argparse.Namespace) -> int:
+    email, password = os.getenv("GARMIN_CLIENT_ID"), os.getenv("GARMIN_CLIENT_SECRET")
+    if not email or not password:
+        print("GARMIN_CLIENT_ID and GARMIN_CLIENT_SECRET environment variables must be set", file=sys.stderr)
+        return 2
+
+    client = GarminConnectClient(GarminAuthorization.authenticate(email=email, password=password))
+    exporter = AccountExporter(client, page_size=args.page_size, limit=args.concurrency)
+
+    if args.library:
+        library = WorkoutLibrary(args.library)
+        try:
+            result = asyncio.run(exporter.to_library(library))
+        finally:
+            library.close()
+        print(json.dumps(result), file=sys.stderr)
+        return 1 if result["failed"] else 0
+
+    async def write(output) -> dict:
+        line = ""
+        async for line in exporter.ndjson():
+            output.write(line)
+        return json.loads(line)["summary"]
+
+    with (open(args.output, "w", encoding="utf-8") if args.output != "-" else nullcontext(sys.stdout)) as output:
+        summary = asyncio.run(write(output))
+
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Garmin workout builder command line tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser(
+        "compile",
+        help="Compile a file of workout expressions into Garmin Connect payloads written as NDJSON.",
+    )
+    compile_parser.add_argument("input", help="File with one expression per line, or a CSV file.")
+    compile_parser.add_argument("-o", "--output", default="-", help="NDJSON output file, defaults to stdout.")
+    compile_parser.add_argument("--format", choices=["auto", "lines", "csv"], default="auto")
+    compile_parser.add_argument("--expression-column", default="expression")
+    compile_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    compile_parser.add_argument("--chunk-size", type=int, default=1000)
+    compile_parser.add_argument(
+        "--race-times",
+        help="CSV file of reference race times with athlete, distance and time columns, for race-pace steps.",
+    )
+    compile_parser.add_argument("--quiet", action="store_true", help="Do not print per-line errors.")
+    compile_parser.set_defaults(handler=compile_command)
+
+    export_parser = commands.add_parser(
+        "export",
+        help="Export every workout of the Garmin Connect account, with credentials from GARMIN_CLIENT_ID and "
+             "GARMIN_CLIENT_SECRET, as NDJSON or into a workout library.",
+    )
+    export_parser.add_argument("-o", "--output", default="-", help="NDJSON output file, defaults to stdout.")
+    export_parser.add_argument("--library", help="Store the workouts in this workout library database instead.")
+    export_parser.add_argument("--page-size", type=int, default=100)
+    export_parser.add_argument("--concurrency", type=int, default=None)
+    export_parser.set_defaults(handler=export_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import csv
+import json
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import IO, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from analysis.race_pace import PaceTable, RaceTimes, pace_tables, race_distances
+from garmin.exceptions import GarminPayloadValidationError
+from garmin.schema import validate_payload
+from garmin.serializer import GarminSerializer, serialized_steps
+from parser.runfun_parser import RunFunParser
+
+
+# (line number, athlete, date, expression)
+Record = Tuple[int, Optional[str], Optional[str], str]
+
+
+def read_lines(f: IO[str]) -> Iterator[Record]:
+    """
+    Read one workout expression per line. Blank lines and lines starting with # are skipped.
+    """
+    for number, line in enumerate(f, start=1):
+        expression = line.strip()
+        if expression and not expression.startswith("#"):
+            yield number, None, None, expression
+
+
+def read_csv(f: IO[str], expression_column: str = "expression") -> Iterator[Record]:
+    """
+    Read workout expressions from a CSV file with a header row. The athlete and date columns are optional
+    and copied to the output as they are.
+    """
+    reader = csv.DictReader(f)
+    # Checked when called, not on the first record, so a bad input fails before any output is written.
+    if reader.fieldnames is None or expression_column not in reader.fieldnames:
+        raise ValueError(f"CSV input must have a '{expression_column}' column")
+    return _read_rows(reader, expression_column)
+
+
+def _read_rows(reader: csv.DictReader, expression_column: str) -> Iterator[Record]:
+    for row in reader:
+        expression = (row.get(expression_column) or "").strip()
+        if expression:
+            yield reader.line_num, row.get("athlete"), row.get("date"), expression
+
+
+def compile_chunk(records: List[Record],
+                  athlete_tables: Optional[Mapping[str, PaceTable]] = None) -> List[Tuple[bool, str]]:
+    """
+    Parse, serialize and validate a chunk of records. Returns, for each record, whether it succeeded
+    and its NDJSON line, so the encoding also happens in the worker process. Payloads that Garmin
+    Connect would reject are reported as errors with the path of every problem.
+
+    Race-pace steps take their targets from the pace table of the athlete of the record. When pace
+    tables are given, workouts with race-pace steps for an athlete without a table are errors.
+    """
+    parser = RunFunParser()
+    results = []
+
+    for number, athlete, day, expression in records:
+        result = {"line": number}
+        if athlete is not None:
+            result["athlete"] = athlete
+        if day is not None:
+            result["date"] = day
+
+        try:
+            workout = parser.parse(expression)
+            table = athlete_tables.get(athlete) if athlete_tables is not None else None
+            if athlete_tables is not None and table is None and race_distances(workout):
+                raise ValueError(f"No race times for athlete {athlete}")
+            payload = GarminSerializer(pace_table=table, cache=serialized_steps).serialize(workout)
+            validate_payload(payload)
+            result["payload"] = payload
+            results.append((True, json.dumps(result, separators=(",", ":"))))
+        except GarminPayloadValidationError as ex:
+            result["error"] = str(ex)
+            result["errors"] = [{"path": path, "message": message} for path, message in ex.errors]
+            results.append((False, json.dumps(result, separators=(",", ":"))))
+        except Exception as ex:
+            result["error"] = str(ex)
+            results.append((False, json.dumps(result, separators=(",", ":"))))
+
+    return results
+
+
+def chunked(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BatchReport:
+    """
+    Summary of a batch compilation.
+
+    Attributes:
+        compiled (int): Number of expressions turned into payloads.
+        failed (int): Number of expressions that could not be compiled.
+        elapsed (float): Wall time in seconds.
+    """
+
+    def __init__(self) -> None:
+        self.compiled = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.compiled + self.failed
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.total} expressions, {self.compiled} compiled, {self.failed} failed "
+            f"in {self.elapsed:.2f}s ({self.throughput:,.0f} expressions/s)"
+        )
+
+
+class BatchCompiler:
+    """
+    The BatchCompiler turns a stream of workout expressions into Garmin Connect payloads written as NDJSON.
+
+    Records are split into chunks that are compiled by a pool of worker processes. At most
+    `workers * 2` chunks are in flight and results are written in input order as soon as the oldest
+    chunk completes, so memory stays bounded by the chunk size regardless of the input size.
+
+    With reference race times, the pace tables of every athlete are built in one batch before compiling
+    and each chunk only carries the tables of its own athletes.
+    """
+
+    def __init__(self,
+                 workers: int = 1,
+                 chunk_size: int = 1000,
+                 race_times: Optional[Mapping[str, RaceTimes]] = None) -> None:
+        if workers < 1:
+            raise ValueError("At least one worker is required")
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be positive")
+
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.pace_tables: Optional[Dict[str, PaceTable]] = (
+            pace_tables.get_many(race_times) if race_times is not None else None
+        )
+
+    def run(self,
+            records: Iterable[Record],
+            output: IO[str],
+            on_error: Optional[Callable[[str], None]] = None) -> BatchReport:
+        report = BatchReport()
+        start = time.perf_counter()
+
+        for results in self._compile(records):
+            for ok, line in results:
+                output.write(line)
+                output.write("\n")
+                if ok:
+                    report.compiled += 1
+                else:
+                    report.failed += 1
+                    if on_error is not None:
+                        on_error(line)
+
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _compile(self, records: Iterable[Record]) -> Iterator[List[Tuple[bool, str]]]:
+        chunks = chunked(records, self.chunk_size)
+
+        if self.workers == 1:
+            for chunk in chunks:
+                yield compile_chunk(chunk, self._chunk_tables(chunk))
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending: Deque[Future] = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(compile_chunk, chunk, self._chunk_tables(chunk)))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def _chunk_tables(self, chunk: List[Record]) -> Optional[Dict[str, PaceTable]]:
+        if self.pace_tables is None:
+            return None
+        athletes = {athlete for _, athlete, _, _ in chunk}
+        return {athlete: self.pace_tables[athlete] for athlete in athletes if athlete in self.pace_tables}
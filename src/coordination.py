@@ -0,0 +1,273 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from logger import log_event
+from metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CoordinationUnavailable(Exception):
+    """
+    Exception raised when the shared coordination store cannot be reached
+    """
+
+    pass
+
+
+class CoordinationBackend(ABC):
+    """
+    The CoordinationBackend interface declares the primitives replicas of the API use to coordinate:
+    expiring values, token buckets and locks, each addressed by a key.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def take_tokens(self, key: str, rate: float, burst: float, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket of the key, refilled at `rate` tokens per second up to `burst`.
+        Return 0 when they were taken, otherwise the seconds to wait before trying again.
+        """
+        pass
+
+    @abstractmethod
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Take the lock of the key for at most ttl seconds. Return the owner token, or None if it is held.
+        """
+        pass
+
+    @abstractmethod
+    def release_lock(self, key: str, owner: str) -> None:
+        """
+        Release the lock of the key if it is still held by the owner.
+        """
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBackend(CoordinationBackend):
+    """
+    The LocalBackend keeps the coordination state in process, for a single replica or as a stand-in for
+    the shared store. Expired entries are dropped when they are read.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[bytes, float]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._values[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def take_tokens(self, key: str, rate: float, burst: float, tokens: float = 1) -> float:
+        with self._lock:
+            now = time.monotonic()
+            available, updated = self._buckets.get(key, (burst, now))
+            available = min(burst, available + (now - updated) * rate)
+            if available >= tokens:
+                self._buckets[key] = (available - tokens, now)
+                return 0.0
+            self._buckets[key] = (available, now)
+            return (tokens - available) / rate
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        with self._lock:
+            now = time.monotonic()
+            held = self._locks.get(key)
+            if held is not None and held[1] > now:
+                return None
+            owner = uuid.uuid4().hex
+            self._locks[key] = (owner, now + ttl)
+            return owner
+
+    def release_lock(self, key: str, owner: str) -> None:
+        with self._lock:
+            held = self._locks.get(key)
+            if held is not None and held[0] == owner:
+                del self._locks[key]
+
+
+class RedisBackend(CoordinationBackend):
+    """
+    The RedisBackend keeps the coordination state in a Redis-protocol store shared by every replica.
+
+    Token buckets are refilled and taken in a Lua script on the clock of the store, so replicas with
+    skewed clocks share one rate. Locks are SET NX PX keys released only by their owner. The redis
+    package is imported when the backend is created, so it is only required when the backend is used.
+    Errors reaching the store are raised as CoordinationUnavailable.
+    """
+
+    TAKE_TOKENS = """
+        local now = redis.call('TIME')
+        now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+        local rate, burst, tokens = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local available = tonumber(state[1]) or burst
+        local updated = tonumber(state[2]) or now
+        available = math.min(burst, available + math.max(0, now - updated) * rate)
+        local wait = 0
+        if available >= tokens then
+            available = available - tokens
+        else
+            wait = (tokens - available) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(available), 'updated', tostring(now))
+        redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+        return tostring(wait)
+    """
+
+    RELEASE_LOCK = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url: str, prefix: str = "workout-parser:", socket_timeout: float = 0.5) -> None:
+        try:
+            import redis
+        except ImportError as ex:
+            raise ImportError("The redis package is required to coordinate through a Redis store") from ex
+
+        self.prefix = prefix
+        self._errors = (redis.RedisError,)
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout
+        )
+        self._take_tokens = self._client.register_script(self.TAKE_TOKENS)
+        self._release_lock = self._client.register_script(self.RELEASE_LOCK)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._call(self._client.get, self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._call(self._client.set, self.prefix + key, value, px=max(1, math.ceil(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self._call(self._client.delete, self.prefix + key)
+
+    def take_tokens(self, key: str, rate: float, burst: float, tokens: float = 1) -> float:
+        return float(self._call(self._take_tokens, keys=[self.prefix + key], args=[rate, burst, tokens]))
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        owner = uuid.uuid4().hex
+        acquired = self._call(self._client.set, self.prefix + key, owner, nx=True, px=max(1, math.ceil(ttl * 1000)))
+        return owner if acquired else None
+
+    def release_lock(self, key: str, owner: str) -> None:
+        self._call(self._release_lock, keys=[self.prefix + key], args=[owner])
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except self._errors as ex:
+            raise CoordinationUnavailable(str(ex)) from ex
+
+
+class FailoverBackend(CoordinationBackend):
+    """
+    The FailoverBackend uses the shared store and falls back to the in-process state while the store is
+    unavailable, so an outage degrades coordination to one replica instead of failing requests. After a
+    failure the shared store is not tried again for `retry_after` seconds.
+    """
+
+    def __init__(self,
+                 primary: CoordinationBackend,
+                 fallback: Optional[CoordinationBackend] = None,
+                 retry_after: float = 5,
+                 registry: MetricsRegistry = metrics) -> None:
+        self.primary = primary
+        self.fallback = fallback or LocalBackend()
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._fallbacks = registry.counter(
+            "coordination_fallback_total", "Coordination calls served in process while the shared store was down"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._call("get", key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._call("set", key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self._call("delete", key)
+
+    def take_tokens(self, key: str, rate: float, burst: float, tokens: float = 1) -> float:
+        return self._call("take_tokens", key, rate, burst, tokens)
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        return self._call("acquire_lock", key, ttl)
+
+    def release_lock(self, key: str, owner: str) -> None:
+        self._call("release_lock", key, owner)
+
+    def close(self) -> None:
+        self.primary.close()
+        self.fallback.close()
+
+    def _call(self, name: str, *args):
+        if time.monotonic() >= self._down_until:
+            try:
+                return getattr(self.primary, name)(*args)
+            except CoordinationUnavailable as ex:
+                self._down_until = time.monotonic() + self.retry_after
+                log_event(logger, logging.WARNING, "coordination_unavailable", operation=name, error=str(ex))
+
+        self._fallbacks.inc()
+        return getattr(self.fallback, name)(*args)
+
+
+def create_backend(url: Optional[str] = None) -> CoordinationBackend:
+    """
+    Return the coordination backend for a store URL: a Redis store with failover for redis:// and
+    rediss:// URLs, the in-process backend when no URL is given or the redis package is not installed.
+    """
+    if not url:
+        return LocalBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            primary = RedisBackend(url)
+        except ImportError as ex:
+            log_event(logger, logging.WARNING, "coordination_unavailable", operation="create_backend", error=str(ex))
+            return LocalBackend()
+        return FailoverBackend(primary)
+    raise ValueError(f"Unsupported coordination store: {url}")
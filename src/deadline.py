@@ -0,0 +1,121 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "30"))
+MAX_REQUEST_DEADLINE = float(os.getenv("MAX_REQUEST_DEADLINE", "120"))
+
+# Clients give the time budget of their request, in seconds, in this header.
+DEADLINE_HEADER = "X-Request-Timeout"
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Exception raised when the deadline of the request is spent before an outbound call is made
+    """
+
+    pass
+
+
+class Deadline:
+    """
+    The point in time, on the monotonic clock, by which a request must be answered.
+    """
+
+    def __init__(self, expires_at: float) -> None:
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+# The deadline of the request being handled. Context variables are copied into the worker threads of
+# asyncio.to_thread and of the FastAPI thread pool, so blocking calls see the deadline of their request.
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: float, detached: bool = False) -> Iterator[Deadline]:
+    """
+    Run the block with a deadline in the given number of seconds. A nested scope can shorten the
+    deadline of the enclosing one but never extend it, unless it is detached: the block then has a
+    budget of its own, for work that outlives the request such as a streamed response body.
+    """
+    deadline = Deadline.after(seconds)
+    enclosing = _current_deadline.get()
+    if not detached and enclosing is not None and enclosing.expires_at < deadline.expires_at:
+        deadline = enclosing
+
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def call_timeout(connect: float, read: float) -> Tuple[float, float]:
+    """
+    Return the (connect, read) timeouts of an outbound call, each bounded by the time left before the
+    current deadline. Raise DeadlineExceeded instead of making a call that could not finish in time.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return connect, read
+
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("The request deadline expired before the call could be made")
+    return min(connect, remaining), min(read, remaining)
+
+
+def requested_budget(value: Optional[str],
+                     default: float = REQUEST_DEADLINE,
+                     maximum: float = MAX_REQUEST_DEADLINE) -> float:
+    """
+    Return the time budget of a request from the value of its deadline header, clamped to maximum.
+    A missing or invalid value gives the default budget.
+    """
+    try:
+        budget = float(value) if value is not None else default
+    except ValueError:
+        budget = default
+    if not budget > 0:
+        budget = default
+    return min(budget, maximum)
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving every HTTP request a deadline, from its X-Request-Timeout header or the
+    REQUEST_DEADLINE default. The deadline covers the dependencies and the endpoint, including the time
+    spent waiting for admission, and bounds the timeouts of the Garmin Connect calls made for it.
+    """
+
+    def __init__(self, app, default: float = REQUEST_DEADLINE, maximum: float = MAX_REQUEST_DEADLINE) -> None:
+        self.app = app
+        self.default = default
+        self.maximum = maximum
+        self._header = DEADLINE_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = next((v.decode("latin-1") for k, v in scope["headers"] if k == self._header), None)
+        with deadline_scope(requested_budget(value, self.default, self.maximum)):
+            await self.app(scope, receive, send)
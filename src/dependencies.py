@@ -1,11 +1,31 @@
 import os
 from fastapi import Depends, Query
+from admission import AdmissionController
+from coordination import create_backend
 from garmin.authorization import GarminAuthorization
+from garmin.cache import ReadThroughCache
+from garmin.coordination import AccountCoordinator
 from garmin.connect import GarminConnectClient
+from garmin.timeouts import GARMIN_HEDGED_READS
+from library.store import WorkoutLibrary
+from parser.incremental import IncrementalParseSessions
 from parser.runfun_parser import RunFunParser
+from plan.sync import PlanSyncStore
+from tracing import traced
 
 GARMIN_CLIENT_ID = os.getenv("GARMIN_CLIENT_ID")
 GARMIN_CLIENT_SECRET = os.getenv("GARMIN_CLIENT_SECRET")
+PLAN_SYNC_STATE_PATH = os.getenv("PLAN_SYNC_STATE_PATH")
+GARMIN_CACHE_TTL = float(os.getenv("GARMIN_CACHE_TTL", "60"))
+WORKOUT_LIBRARY_PATH = os.getenv("WORKOUT_LIBRARY_PATH", "workout_library.db")
+PARSE_SESSION_TTL = float(os.getenv("PARSE_SESSION_TTL", "900"))
+WORKOUT_CONCURRENCY_LIMIT = int(os.getenv("WORKOUT_CONCURRENCY_LIMIT", "16"))
+WORKOUT_QUEUE_SIZE = int(os.getenv("WORKOUT_QUEUE_SIZE", "64"))
+WORKOUT_QUEUE_TIMEOUT = float(os.getenv("WORKOUT_QUEUE_TIMEOUT", "5"))
+WORKOUT_REJECT_STATUS = int(os.getenv("WORKOUT_REJECT_STATUS", "503"))
+COORDINATION_URL = os.getenv("COORDINATION_URL")
+GARMIN_RATE_LIMIT = float(os.getenv("GARMIN_RATE_LIMIT", "5"))
+GARMIN_RATE_BURST = float(os.getenv("GARMIN_RATE_BURST", "10"))
 
 if GARMIN_CLIENT_ID is None:
     raise ValueError("GARMIN_CLIENT_ID environment variable is not set")
@@ -13,18 +33,49 @@ if GARMIN_CLIENT_ID is None:
 if GARMIN_CLIENT_SECRET is None:
     raise ValueError("GARMIN_CLIENT_SECRET environment variable is not set")
 
+plan_sync_store = PlanSyncStore(PLAN_SYNC_STATE_PATH)
+garmin_read_cache = ReadThroughCache(ttl=GARMIN_CACHE_TTL)
+workout_library = WorkoutLibrary(WORKOUT_LIBRARY_PATH)
+parse_sessions = IncrementalParseSessions(ttl=PARSE_SESSION_TTL)
+workout_admission = AdmissionController(
+    limit=WORKOUT_CONCURRENCY_LIMIT,
+    queue_size=WORKOUT_QUEUE_SIZE,
+    queue_timeout=WORKOUT_QUEUE_TIMEOUT,
+    name="workout",
+)
+coordination_backend = create_backend(COORDINATION_URL)
+garmin_coordinator = AccountCoordinator(
+    account=GARMIN_CLIENT_ID,
+    backend=coordination_backend,
+    rate=GARMIN_RATE_LIMIT,
+    burst=GARMIN_RATE_BURST,
+)
+
+@traced("dependency get_garmin_authorization")
 def get_garmin_authorization():
-    return GarminAuthorization.authenticate(
-        email=GARMIN_CLIENT_ID, password=GARMIN_CLIENT_SECRET
+    return garmin_coordinator.authorization(
+        lambda: GarminAuthorization.authenticate(email=GARMIN_CLIENT_ID, password=GARMIN_CLIENT_SECRET)
     )
 
+@traced("dependency get_garmin_connect_client")
 def get_garmin_connect_client(
     auth: GarminAuthorization = Depends(get_garmin_authorization),
 ):
     return GarminConnectClient(
-        authorization=auth
+        authorization=auth,
+        cache=garmin_read_cache.for_account(GARMIN_CLIENT_ID),
+        hedge_reads=GARMIN_HEDGED_READS,
+        coordinator=garmin_coordinator,
     )
 
+def get_garmin_connect_client_factory():
+    """
+    Return a function resolving the Garmin Connect client, for routes that only call Garmin Connect on
+    some paths and should not log in on the others.
+    """
+    return lambda: get_garmin_connect_client(get_garmin_authorization())
+
+@traced("dependency get_workout_parser")
 def get_workout_parser(
     workout_parser: str = Query(alias="workout_parser")
 ):
@@ -36,4 +87,17 @@ def get_workout_parser(
     if not parser_class:
         raise NotImplementedError(f"Parser type '{workout_parser}' is not supported")
     
-    return parser_class()
+    # Heart rate zones changed through /plan/zones are kept in the sync store.
+    return parser_class(zones=plan_sync_store.zones())
+
+def get_plan_sync_store():
+    return plan_sync_store
+
+def get_workout_library():
+    return workout_library
+
+def get_parse_sessions():
+    return parse_sessions
+
+def get_workout_admission():
+    return workout_admission
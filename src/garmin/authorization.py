@@ -3,8 +3,15 @@ from http.cookiejar import CookieJar
 from re import search
 from copy import deepcopy
 from datetime import datetime, timedelta
+from typing import Optional
 
 import cloudscraper
+from requests import Timeout
+from requests.cookies import RequestsCookieJar, create_cookie
+
+from deadline import DeadlineExceeded
+from garmin.timeouts import request_timeout
+from tracing import trace_requests
 
 
 class GarminAuthorization:
@@ -31,13 +38,14 @@ class GarminAuthorization:
         refresh_token: str,
         refresh_token_expires_in: int,
         cookies: CookieJar,
+        logged_in: Optional[datetime] = None,
     ):
         self._token = token
         self._epxires_in = expires_in
         self._refresh_token = refresh_token
         self._refresh_token_expires_in = refresh_token_expires_in
         self._cookies = cookies
-        self._logged_in = datetime.now()
+        self._logged_in = logged_in or datetime.now()
 
     @property
     def token(self) -> str:
@@ -50,6 +58,53 @@ class GarminAuthorization:
     def is_token_expired(self) -> bool:
         return (self._logged_in + timedelta(seconds=self._epxires_in) < datetime.now())
 
+    def expires_in(self) -> float:
+        """
+        Return the seconds left before the token expires.
+        """
+        return (self._logged_in + timedelta(seconds=self._epxires_in) - datetime.now()).total_seconds()
+
+    def to_dict(self) -> dict:
+        """
+        Convert the tokens and cookies into plain values, to share the login with other replicas.
+        """
+        return {
+            "token": self._token,
+            "expires_in": self._epxires_in,
+            "refresh_token": self._refresh_token,
+            "refresh_token_expires_in": self._refresh_token_expires_in,
+            "logged_in": self._logged_in.timestamp(),
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "secure": cookie.secure,
+                    "expires": cookie.expires,
+                }
+                for cookie in self._cookies
+            ],
+        }
+
+    @staticmethod
+    def from_dict(value: dict) -> GarminAuthorization:
+        """
+        Rebuild a GarminAuthorization from the output of to_dict.
+        """
+        cookies = RequestsCookieJar()
+        for cookie in value["cookies"]:
+            cookies.set_cookie(create_cookie(**cookie))
+
+        return GarminAuthorization(
+            token=value["token"],
+            expires_in=value["expires_in"],
+            refresh_token=value["refresh_token"],
+            refresh_token_expires_in=value["refresh_token_expires_in"],
+            cookies=cookies,
+            logged_in=datetime.fromtimestamp(value["logged_in"]),
+        )
+
     @staticmethod
     def authenticate(
         email: str,
@@ -60,13 +115,14 @@ class GarminAuthorization:
         """
         Static method to authenticate with Garmin Connect and obtain a bearer token.
         Returns an instance of GarminAuthorization.
+        Each call is bounded by the deadline of the current request; timeouts are raised as they are.
         """
         extract_ticket_id = lambda x: search(
             r'response_url\s*=\s*".*\?ticket=(.+)"', x
         ).group(1)
 
         try:
-            session = cloudscraper.CloudScraper()
+            session = trace_requests(cloudscraper.CloudScraper())
 
             r = session.post(
                 url=f"{sso_url}/sso/signin",
@@ -80,6 +136,7 @@ class GarminAuthorization:
                     "password": password,
                     "embed": "false",
                 },
+                timeout=request_timeout(),
             )
 
             if r.status_code != 200:
@@ -89,11 +146,11 @@ class GarminAuthorization:
             if not ticket_id:
                 raise Exception("Authentication failed")
 
-            r = session.get(url=f"{connect_url}/modern?ticket={ticket_id}")
+            r = session.get(url=f"{connect_url}/modern?ticket={ticket_id}", timeout=request_timeout())
             if r.status_code != 200:
                 raise Exception("Authentication failed")
 
-            r = session.post(url=f"{connect_url}/modern/di-oauth/exchange")
+            r = session.post(url=f"{connect_url}/modern/di-oauth/exchange", timeout=request_timeout())
             if r.status_code != 200:
                 raise Exception("Authentication failed")
 
@@ -108,5 +165,7 @@ class GarminAuthorization:
                 refresh_token_expires_in=response["refresh_token_expires_in"],
                 cookies=deepcopy(session.cookies),
             )
+        except (DeadlineExceeded, Timeout):
+            raise
         except Exception as e:
             raise Exception("Authentication failed") from e
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheEntry:
+    """
+    A cached Garmin Connect response.
+
+    Attributes:
+        value (Any): The decoded response body. It is shared between readers and must not be mutated.
+        etag (str): The ETag header of the response, used for conditional revalidation.
+        last_modified (str): The Last-Modified header of the response, used for conditional revalidation.
+        expires_at (float): Monotonic time after which the entry must be revalidated.
+    """
+
+    def __init__(self,
+                 value: Any,
+                 etag: Optional[str] = None,
+                 last_modified: Optional[str] = None) -> None:
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = 0.0
+
+    @property
+    def revalidatable(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+NOT_MODIFIED = object()
+
+
+class ReadThroughCache:
+    """
+    The ReadThroughCache keeps Garmin Connect read responses per account for a fixed time to live.
+
+    On a miss the fetch function is called with no entry. Once an entry expires, the fetch function is
+    called with the stale entry so it can send a conditional request; returning NOT_MODIFIED keeps the
+    cached value for another TTL. Entries are evicted in least recently used order beyond max_entries.
+
+    Every invalidation bumps a generation per account and kind. A fetch that was running when its kind
+    was invalidated returns its result without storing it, so a read started before a write cannot put
+    the data from before the write back in the cache.
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 1024) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], CacheEntry]" = OrderedDict()
+        self._generations: Dict[Tuple[str, Optional[Hashable]], int] = {}
+
+    def for_account(self, account: str) -> "AccountCache":
+        return AccountCache(self, account)
+
+    def get(self,
+            account: str,
+            key: Tuple[Hashable, ...],
+            fetch: Callable[[Optional[CacheEntry]], Any]) -> Any:
+        cache_key = (account, key)
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                if entry.expires_at > time.monotonic():
+                    return entry.value
+            generation = self._generation(account, key[0])
+
+        stale = entry if entry is not None and entry.revalidatable else None
+        result = fetch(stale)
+
+        if result is NOT_MODIFIED:
+            result = stale
+
+        with self._lock:
+            if self._generation(account, key[0]) != generation:
+                return result.value
+            result.expires_at = time.monotonic() + self.ttl
+            self._entries[cache_key] = result
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return result.value
+
+    def invalidate(self, account: str, *kinds: str) -> None:
+        """
+        Drop the entries of an account whose key starts with one of the given kinds, or all of them.
+        """
+        with self._lock:
+            for kind in kinds or (None,):
+                self._generations[(account, kind)] = self._generations.get((account, kind), 0) + 1
+            for cache_key in list(self._entries):
+                entry_account, key = cache_key
+                if entry_account == account and (not kinds or key[0] in kinds):
+                    del self._entries[cache_key]
+
+    def _generation(self, account: str, kind: Hashable) -> Tuple[int, int]:
+        return self._generations.get((account, kind), 0), self._generations.get((account, None), 0)
+
+
+class AccountCache:
+    """
+    A view of the ReadThroughCache restricted to a single Garmin Connect account.
+    """
+
+    def __init__(self, cache: ReadThroughCache, account: str) -> None:
+        self._cache = cache
+        self.account = account
+
+    def get(self, key: Tuple[Hashable, ...], fetch: Callable[[Optional[CacheEntry]], Any]) -> Any:
+        return self._cache.get(self.account, key, fetch)
+
+    def invalidate(self, *kinds: str) -> None:
+        self._cache.invalidate(self.account, *kinds)
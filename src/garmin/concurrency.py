@@ -0,0 +1,53 @@
+import asyncio
+import os
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple, TypeVar, Union
+
+
+T = TypeVar("T")
+
+GARMIN_MAX_CONCURRENCY = int(os.getenv("GARMIN_MAX_CONCURRENCY", "4"))
+
+
+async def run_concurrently(
+    calls: Iterable[Callable[[], T]],
+    limit: Optional[int] = None,
+) -> List[Union[T, Exception]]:
+    """
+    Run blocking Garmin Connect calls in worker threads, with at most `limit` of them in flight.
+
+    The results are returned in the same order as the calls. A call that raises does not cancel
+    the others: its exception is returned in place of the result so callers can report partial failures.
+    """
+    semaphore = asyncio.Semaphore(limit or GARMIN_MAX_CONCURRENCY)
+
+    async def run(call: Callable[[], T]) -> T:
+        async with semaphore:
+            return await asyncio.to_thread(call)
+
+    return await asyncio.gather(*(run(call) for call in calls), return_exceptions=True)
+
+
+async def iter_concurrently(
+    calls: Iterable[Callable[[], T]],
+    limit: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, Union[T, Exception]]]:
+    """
+    Like run_concurrently, but yield (index, result) pairs as soon as each call completes so callers
+    can report progress.
+    """
+    semaphore = asyncio.Semaphore(limit or GARMIN_MAX_CONCURRENCY)
+
+    async def run(index: int, call: Callable[[], T]) -> Tuple[int, Union[T, Exception]]:
+        async with semaphore:
+            try:
+                return index, await asyncio.to_thread(call)
+            except Exception as ex:
+                return index, ex
+
+    tasks = [asyncio.ensure_future(run(index, call)) for index, call in enumerate(calls)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,11 +1,18 @@
 import datetime
+import threading
+from typing import Iterator, List, Optional
 
 import cloudscraper
 
 from garmin.authorization import GarminAuthorization
+from garmin.cache import NOT_MODIFIED, AccountCache, CacheEntry
+from garmin.coordination import AccountCoordinator
 from garmin.exceptions import GarminWorkoutIdError
+from garmin.schema import validate_payload
 from garmin.serializer import GarminSerializer
+from garmin.timeouts import request_timeout, timed_read
 from models.workout import Workout
+from tracing import trace_requests
 
 
 class GarminConnectClient:
@@ -14,13 +21,55 @@ class GarminConnectClient:
 
     Attributes:
         authorization (GarminAuthorization): The authorization object containing the token and cookies.
+        cache (AccountCache): Optional read-through cache for the account, invalidated by the write methods.
+        hedge_reads (bool): Whether reads slower than the 95th percentile of recent reads are sent a
+            second time, the first answer winning.
+        coordinator (AccountCoordinator): Optional coordinator of the account shared with other replicas.
+            Every call then waits for the rate limit of the account, concurrent creates with the same
+            idempotency key create the workout once and a rejected token is dropped from the shared login.
+
+    Every call has connect and read timeouts bounded by the deadline of the current request, and raises
+    DeadlineExceeded without a request once the deadline has passed.
 
     Methods:
-        __init__(authorization: GarminAuthorization):
+        __init__(authorization: GarminAuthorization, cache: AccountCache = None, hedge_reads: bool = False,
+                 coordinator: AccountCoordinator = None):
             Initializes the GarminConnectClient with the given authorization.
 
-        create_workout(workout: Workout) -> None:
-            Creates a new workout on Garmin Connect.
+        list_workouts(start: int = 0, limit: int = 100) -> List[dict]:
+            Lists the workouts of the account.
+
+        get_workout(workout_id: int) -> dict:
+            Fetches a single workout with its steps.
+
+        iter_workouts(page_size: int = 100) -> Iterator[dict]:
+            Iterates over every workout of the account, one page at a time.
+
+        get_calendar(year: int, month: int) -> dict:
+            Fetches the calendar of a month, including the scheduled workouts.
+
+        create_workout(workout: Workout, idempotency_key: Optional[str] = None) -> int:
+            Creates a new workout on Garmin Connect and returns its ID. The payload is validated
+            locally first and GarminPayloadValidationError is raised without a request if it is invalid.
+            Concurrent creates with the same idempotency key create the workout once.
+
+        update_workout(workout_id: int, workout: Workout) -> None:
+            Replaces the steps of an existing workout on Garmin Connect, validating the payload first.
+
+        delete_workout(workout_id: int) -> None:
+            Deletes a workout, and its calendar entries, from Garmin Connect.
+
+        schedule_workout(workout_id: int, date: datetime.date) -> int:
+            Schedules a workout on the calendar and returns the schedule ID.
+
+        unschedule_workout(schedule_id: int) -> None:
+            Removes a scheduled workout from the calendar.
+
+        get_scheduled_workouts(start: datetime.date, end: datetime.date) -> List[dict]:
+            Lists the workouts scheduled between two dates, inclusive.
+
+        reschedule_workout(schedule_id: int, workout_id: int, date: datetime.date) -> int:
+            Moves a scheduled workout to another date and returns the new schedule ID.
     """
 
     DEFAULT_HEADERS = {
@@ -32,53 +81,219 @@ class GarminConnectClient:
         "Accept": "application/json, text/plain, */*",
     }
 
-    def __init__(self, authorization: GarminAuthorization):
+    def __init__(self,
+                 authorization: GarminAuthorization,
+                 cache: Optional[AccountCache] = None,
+                 hedge_reads: bool = False,
+                 coordinator: Optional[AccountCoordinator] = None):
         self.authorization = authorization
-        self.session = cloudscraper.CloudScraper()
-        self.session.cookies.update(self.authorization.cookies)
+        self.cache = cache
+        self.hedge_reads = hedge_reads
+        self.coordinator = coordinator
+        self._sessions = threading.local()
+        self._sessions.session = self._new_session()
+
+    @property
+    def session(self):
+        """
+        The session of the calling thread. Sessions are not thread-safe, and one client is shared by the
+        worker threads of concurrent calls and by both attempts of a hedged read, so each thread that
+        makes calls gets a session of its own.
+        """
+        session = getattr(self._sessions, "session", None)
+        if session is None:
+            session = self._sessions.session = self._new_session()
+        return session
+
+    def list_workouts(self, start: int = 0, limit: int = 100) -> List[dict]:
+        url = "https://connect.garmin.com/workout-service/workouts"
+        params = {"start": start, "limit": limit}
+        return self._get(("workouts", start, limit), url, params)
+
+    def iter_workouts(self, page_size: int = 100) -> Iterator[dict]:
+        start = 0
+        while True:
+            page = self.list_workouts(start=start, limit=page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            start += page_size
 
-    def create_workout(self, workout: Workout) -> None:
+    def get_workout(self, workout_id: int) -> dict:
+        url = f"https://connect.garmin.com/workout-service/workout/{workout_id}"
+        return self._get(("workout", workout_id), url)
+
+    def get_calendar(self, year: int, month: int) -> dict:
+        # Garmin Connect numbers the months of the calendar service from 0.
+        url = f"https://connect.garmin.com/calendar-service/year/{year}/month/{month - 1}"
+        return self._get(("calendar", year, month), url)
+
+    def create_workout(self, workout: Workout, idempotency_key: Optional[str] = None) -> int:
         url = "https://connect.garmin.com/workout-service/workout"
-        headers = {
-            **self.DEFAULT_HEADERS,
-            "Authorization": f"Bearer {self.authorization.token}",
-        }
+        headers = self._headers()
 
         try:
             sz = GarminSerializer()
             workout_serialized = sz.serialize(workout)
+            validate_payload(workout_serialized)
 
-            r = self.session.post(
-                url, headers=headers, json=workout_serialized
-            )
-            r.raise_for_status()
+            def upload() -> int:
+                self._throttle()
+                r = self.session.post(
+                    url, headers=headers, json=workout_serialized, timeout=request_timeout()
+                )
+                self._raise_for_status(r)
 
-            response = r.json()
-            workout_id = response.get("workoutId")
-            if workout_id is None:
-                raise GarminWorkoutIdError("Workout ID not found in the response")
+                response = r.json()
+                workout_id = response.get("workoutId")
+                if workout_id is None:
+                    raise GarminWorkoutIdError("Workout ID not found in the response")
+
+                self._invalidate("workouts")
+                return workout_id
 
-            return workout_id
+            if self.coordinator is None or idempotency_key is None:
+                return upload()
+            return self.coordinator.upload(idempotency_key, upload)
         except Exception as err:
             raise
 
-    def schedule_workout(self, workout_id: int, date: datetime.date) -> None:
+    def update_workout(self, workout_id: int, workout: Workout) -> None:
+        url = f"https://connect.garmin.com/workout-service/workout/{workout_id}"
+        headers = self._headers()
+
+        sz = GarminSerializer()
+        workout_serialized = sz.serialize(workout)
+        validate_payload(workout_serialized)
+        workout_serialized["workoutId"] = workout_id
+
+        self._throttle()
+        r = self.session.put(
+            url, headers=headers, json=workout_serialized, timeout=request_timeout()
+        )
+        self._raise_for_status(r)
+        self._invalidate("workouts", "workout", "calendar")
+
+    def delete_workout(self, workout_id: int) -> None:
+        url = f"https://connect.garmin.com/workout-service/workout/{workout_id}"
+        headers = self._headers()
+
+        self._throttle()
+        r = self.session.delete(url, headers=headers, timeout=request_timeout())
+        self._raise_for_status(r)
+        self._invalidate("workouts", "workout", "calendar")
+
+    def schedule_workout(self, workout_id: int, date: datetime.date) -> int:
         url = f"https://connect.garmin.com/workout-service/schedule/{workout_id}"
-        headers = {
-            **self.DEFAULT_HEADERS,
-            "Authorization": f"Bearer {self.authorization.token}",
-        }
+        headers = self._headers()
 
         payload = {"date": date.strftime("%Y-%m-%d")}
 
         try:
+            self._throttle()
             r = self.session.post(
-                url, headers=headers, json=payload,
+                url, headers=headers, json=payload, timeout=request_timeout(),
             )
-            r.raise_for_status()
+            self._raise_for_status(r)
+
+            self._invalidate("calendar")
 
             response = r.json()
             if "workoutScheduleId" not in response:
                 raise Exception("Workout schedule ID not found in the response")
+
+            return response["workoutScheduleId"]
         except Exception as err:
             raise
+
+    def unschedule_workout(self, schedule_id: int) -> None:
+        url = f"https://connect.garmin.com/workout-service/schedule/{schedule_id}"
+        headers = self._headers()
+
+        self._throttle()
+        r = self.session.delete(url, headers=headers, timeout=request_timeout())
+        self._raise_for_status(r)
+        self._invalidate("calendar")
+
+    def get_scheduled_workouts(self, start: datetime.date, end: datetime.date) -> List[dict]:
+        entries = []
+        year, month = start.year, start.month
+
+        while (year, month) <= (end.year, end.month):
+            calendar = self.get_calendar(year, month)
+            for item in calendar.get("calendarItems", []):
+                if item.get("itemType") != "workout":
+                    continue
+                day = datetime.date.fromisoformat(item["date"])
+                if start <= day <= end:
+                    entries.append(item)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        return sorted(entries, key=lambda item: item["date"])
+
+    def reschedule_workout(self, schedule_id: int, workout_id: int, date: datetime.date) -> int:
+        # The new entry is created before the old one is removed, so a failure never loses the workout.
+        new_schedule_id = self.schedule_workout(workout_id, date)
+        self.unschedule_workout(schedule_id)
+        return new_schedule_id
+
+    def _get(self, key: tuple, url: str, params: Optional[dict] = None):
+        if self.cache is None:
+            return self._fetch(url, params, None).value
+
+        return self.cache.get(key, lambda entry: self._fetch(url, params, entry))
+
+    def _fetch(self, url: str, params: Optional[dict], entry: Optional[CacheEntry]):
+        headers = self._headers()
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        # The timeout is taken here, where the deadline of the request is known, not in a hedging thread.
+        timeout = request_timeout()
+
+        def read():
+            return self.session.get(url, headers=headers, params=params, timeout=timeout)
+
+        def hedge():
+            # The second attempt of a hedged read counts against the rate limit too.
+            self._throttle()
+            return read()
+
+        self._throttle()
+        r = timed_read(read, self.hedge_reads, hedge)
+        if r.status_code == 304 and entry is not None:
+            return NOT_MODIFIED
+        self._raise_for_status(r)
+
+        return CacheEntry(
+            r.json(),
+            etag=r.headers.get("ETag"),
+            last_modified=r.headers.get("Last-Modified"),
+        )
+
+    def _new_session(self):
+        session = trace_requests(cloudscraper.CloudScraper())
+        session.cookies.update(self.authorization.cookies)
+        return session
+
+    def _throttle(self) -> None:
+        if self.coordinator is not None:
+            self.coordinator.throttle()
+
+    def _raise_for_status(self, r) -> None:
+        if r.status_code == 401 and self.coordinator is not None:
+            self.coordinator.invalidate_authorization(self.authorization)
+        r.raise_for_status()
+
+    def _invalidate(self, *kinds: str) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(*kinds)
+
+    def _headers(self) -> dict:
+        return {
+            **self.DEFAULT_HEADERS,
+            "Authorization": f"Bearer {self.authorization.token}",
+        }
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Callable, Optional, TypeVar
+
+from coordination import CoordinationBackend, LocalBackend
+from deadline import DeadlineExceeded, current_deadline
+from garmin.authorization import GarminAuthorization
+from logger import log_event
+from metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AccountCoordinator:
+    """
+    The AccountCoordinator coordinates the Garmin Connect calls made for one account across replicas of
+    the API through a shared CoordinationBackend.
+
+    - The login is shared: replicas reuse the stored authorization until shortly before it expires, and
+      a single replica logs in again while the others wait for its result.
+    - Every call takes a token from a token bucket of the account, `rate` calls per second with bursts of
+      up to `burst` calls, whichever replica makes it.
+    - Uploads in flight at the same time with the same idempotency key run once: concurrent uploads of
+      the same logical workout, such as a retried request, wait for the first one and get its result.
+      The key is given by the caller, as identical payloads may rightly be created several times, for
+      example one workout per date of a plan. An upload made after the first one completed runs again.
+
+    Waits are bounded by the deadline of the current request and raise DeadlineExceeded once it has
+    passed. With the default LocalBackend the same holds between the threads of a single replica.
+    """
+
+    def __init__(self,
+                 account: str,
+                 backend: Optional[CoordinationBackend] = None,
+                 rate: Optional[float] = None,
+                 burst: float = 10,
+                 login_timeout: float = 30,
+                 expiry_margin: float = 60,
+                 poll_interval: float = 0.05,
+                 registry: MetricsRegistry = metrics) -> None:
+        self.account = account
+        self.backend = backend or LocalBackend()
+        self.rate = rate
+        self.burst = burst
+        self.login_timeout = login_timeout
+        self.expiry_margin = expiry_margin
+        self.poll_interval = poll_interval
+        self._logins = registry.counter("garmin_logins_total", "Logins to Garmin Connect")
+        self._throttled = registry.histogram("garmin_throttle_seconds", "Time Garmin Connect calls waited for the rate limit")
+        self._deduplicated = registry.counter("garmin_uploads_deduplicated_total", "Uploads answered with the result of an upload with the same idempotency key")
+
+        digest = hashlib.sha256(account.encode("utf-8")).hexdigest()[:16]
+        self._auth_key = f"garmin:{digest}:auth"
+        self._login_key = f"garmin:{digest}:login"
+        self._rate_key = f"garmin:{digest}:rate"
+        self._upload_key = f"garmin:{digest}:upload"
+
+    def authorization(self, authenticate: Callable[[], GarminAuthorization]) -> GarminAuthorization:
+        """
+        Return the shared authorization of the account, logging in with authenticate when there is none.
+        """
+        started = time.monotonic()
+        while True:
+            authorization = self._stored_authorization()
+            if authorization is not None:
+                return authorization
+
+            owner = self.backend.acquire_lock(self._login_key, self.login_timeout)
+            if owner is not None:
+                try:
+                    # Another replica may have logged in between the read and the lock.
+                    authorization = self._stored_authorization()
+                    if authorization is None:
+                        authorization = authenticate()
+                        self._logins.inc()
+                        self._store_authorization(authorization)
+                    return authorization
+                finally:
+                    self.backend.release_lock(self._login_key, owner)
+
+            if time.monotonic() - started > self.login_timeout:
+                # The replica holding the lock is stuck, log in without it rather than fail.
+                log_event(logger, logging.WARNING, "garmin_login_wait_timeout", waited=self.login_timeout)
+                authorization = authenticate()
+                self._logins.inc()
+                self._store_authorization(authorization)
+                return authorization
+            self._sleep(self.poll_interval)
+
+    def invalidate_authorization(self, authorization: GarminAuthorization) -> None:
+        """
+        Drop the shared authorization if it is still the given one, after Garmin Connect rejected it.
+        """
+        stored = self._stored_authorization()
+        if stored is not None and stored.token == authorization.token:
+            self.backend.delete(self._auth_key)
+
+    def throttle(self) -> None:
+        """
+        Wait until the rate limit of the account allows one more call.
+        """
+        if not self.rate:
+            return
+
+        waited = 0.0
+        while True:
+            wait = self.backend.take_tokens(self._rate_key, self.rate, self.burst)
+            if wait <= 0:
+                break
+            self._sleep(wait)
+            waited += wait
+        if waited:
+            self._throttled.observe(waited)
+
+    def upload(self, key: str, call: Callable[[], T]) -> T:
+        """
+        Run call, which makes an upload and returns a JSON-compatible result, once for the uploads with
+        the same idempotency key made concurrently. Each upload that finds none in flight runs call itself.
+        """
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        flight_key = f"{self._upload_key}:{digest}"
+        lock_key = f"{flight_key}:lock"
+
+        flight = None
+        while True:
+            if flight is not None:
+                result = self.backend.get(f"{flight_key}:{flight}")
+                if result is not None:
+                    self._deduplicated.inc()
+                    return json.loads(result)
+
+            owner = self.backend.acquire_lock(lock_key, self.login_timeout)
+            if owner is not None:
+                try:
+                    # The flight id tells the uploads waiting on this one where to find its result. Results
+                    # of earlier flights are never read, so a completed upload is not served again.
+                    self.backend.set(flight_key, owner.encode("utf-8"), self.login_timeout)
+                    value = call()
+                    self.backend.set(f"{flight_key}:{owner}", json.dumps(value).encode("utf-8"), self.login_timeout)
+                    return value
+                finally:
+                    self.backend.delete(flight_key)
+                    self.backend.release_lock(lock_key, owner)
+
+            # An upload with the same key is in flight. Its result is published under its flight id when it
+            # succeeds, and when it fails the lock is released and this upload is made instead.
+            if flight is None:
+                value = self.backend.get(flight_key)
+                flight = value.decode("utf-8") if value is not None else None
+            self._sleep(self.poll_interval)
+
+    def _stored_authorization(self) -> Optional[GarminAuthorization]:
+        value = self.backend.get(self._auth_key)
+        if value is None:
+            return None
+        authorization = GarminAuthorization.from_dict(json.loads(value))
+        return authorization if authorization.expires_in() > self.expiry_margin else None
+
+    def _store_authorization(self, authorization: GarminAuthorization) -> None:
+        ttl = authorization.expires_in() - self.expiry_margin
+        if ttl > 0:
+            self.backend.set(self._auth_key, json.dumps(authorization.to_dict()).encode("utf-8"), ttl)
+
+    @staticmethod
+    def _sleep(seconds: float) -> None:
+        deadline = current_deadline()
+        if deadline is not None and deadline.remaining() <= seconds:
+            raise DeadlineExceeded("The request deadline expired while waiting for Garmin Connect")
+        time.sleep(seconds)
@@ -0,0 +1,129 @@
+import re
+from typing import Dict, Optional, Union
+
+from models.condition import Distance, Duration
+from models.distance_type import DistanceType
+from models.sport_type import SportType
+from models.step import RepeatedStep, Step
+from models.step_type import StepType
+from models.target import HeartRateZoneTarget, NoTarget, PaceTarget, Target
+from models.target_type import TargetType
+from models.workout import Workout
+from parser.runfun_parser import HeartRateZoneConfig
+from parser.runfun_printer import RunFunPrinter
+
+
+SPORT_TYPES = {sport.key: sport for sport in SportType}
+STEP_TYPES = {step_type.key: step_type for step_type in StepType}
+
+# The description RunFunParser gives race-pace steps, the only place a payload keeps the race distance.
+PATTERN_RACE_PACE = r"Run \d+(?:,\d+)? (?:km|m) at (\d+(?:,\d+)?) (km|m) race pace"
+
+
+class GarminDeserializer:
+    """
+    The GarminDeserializer class turns Garmin Connect workout payloads back into Workout objects.
+
+    It reads what GarminSerializer writes and what Garmin Connect returns for a workout: time and
+    distance steps, with no target, a custom heart rate range or a race-pace target, nested in repeat
+    groups. Steps are named as RunFunParser names them, so printing the result with RunFunPrinter gives
+    the RunFun expression of the workout. The race distance of a race-pace step is read from the
+    description RunFunParser gives it, with the speed range of the payload when it was serialized with a
+    pace table. Anything else, such as lap button steps or pace targets of other steps, raises a
+    ValueError.
+    """
+
+    def deserialize(self, payload: dict) -> Workout:
+        sport = payload.get("sportType") or {}
+        sport_type = SPORT_TYPES.get(sport.get("sportTypeKey"))
+        if sport_type is None:
+            raise ValueError(f"Unsupported sport type: {sport.get('sportTypeKey')}")
+
+        workout = Workout(payload.get("workoutName") or "", sport_type)
+        zones = _zone_names()
+        for segment in sorted(payload.get("workoutSegments") or [], key=lambda s: s.get("segmentOrder", 0)):
+            for step in _ordered(segment.get("workoutSteps")):
+                workout.add_step(self.deserialize_step(step, zones))
+        return workout
+
+    def deserialize_step(self,
+                         step: dict,
+                         zones: Optional[Dict[tuple, str]] = None) -> Union[Step, RepeatedStep]:
+        """
+        Convert a Garmin Connect ExecutableStepDTO or RepeatGroupDTO into a Step or RepeatedStep.
+        """
+        zones = zones if zones is not None else _zone_names()
+
+        if step.get("type") == "RepeatGroupDTO":
+            return RepeatedStep(
+                iterations=int(step["numberOfIterations"]),
+                steps=[self.deserialize_step(s, zones) for s in _ordered(step.get("workoutSteps"))],
+            )
+        if step.get("type") != "ExecutableStepDTO":
+            raise ValueError(f"Unsupported step type: {step.get('type')}")
+
+        step_type = STEP_TYPES.get((step.get("stepType") or {}).get("stepTypeKey"))
+        if step_type is None or step_type == StepType.Repeat:
+            raise ValueError(f"Unsupported step type: {(step.get('stepType') or {}).get('stepTypeKey')}")
+
+        target = self._deserialize_target(step)
+        condition_key = (step.get("endCondition") or {}).get("conditionTypeKey")
+        value = step.get("endConditionValue")
+
+        if condition_key == "time":
+            condition = Duration.from_seconds(round(value))
+            zone = zones.get(tuple(target.values)) if isinstance(target, HeartRateZoneTarget) else None
+            if zone:
+                target.zone = zone.upper()
+            minutes = f"{condition.value // 60}'" if condition.value % 60 == 0 else f"{condition.value}s"
+            name = f"{minutes} {zone}" if zone else minutes
+        elif condition_key == "distance":
+            condition = Distance.from_meters(value)
+            name = RunFunPrinter._print_distance(condition.value)
+            if isinstance(target, PaceTarget):
+                name = f"{name} ritmo de prova {RunFunPrinter._print_distance(target.race_distance)}"
+        else:
+            raise ValueError(f"Unsupported end condition: {condition_key}")
+
+        return Step(
+            step_name=name,
+            description=step.get("description"),
+            step_type=step_type,
+            target=target,
+            condition=condition,
+        )
+
+    @staticmethod
+    def _deserialize_target(step: dict) -> Target:
+        key = (step.get("targetType") or {}).get("workoutTargetTypeKey", TargetType.NoTarget.key)
+        race_distance = _race_distance(step.get("description"))
+        if key == TargetType.NoTarget.key:
+            # Race-pace steps serialized without a pace table have no target, only their description.
+            return PaceTarget(race_distance) if race_distance is not None else NoTarget()
+        if key == TargetType.HeartRate.key:
+            low, high = step.get("targetValueOne"), step.get("targetValueTwo")
+            if low is None or high is None:
+                raise ValueError("Heart rate targets without a custom range are not supported")
+            return HeartRateZoneTarget([int(low), int(high)])
+        if key == TargetType.Pace.key:
+            low, high = step.get("targetValueOne"), step.get("targetValueTwo")
+            if race_distance is None or low is None or high is None:
+                raise ValueError("Pace targets are only supported on race-pace steps with a speed range")
+            return PaceTarget(race_distance, [float(low), float(high)])
+        raise ValueError(f"Unsupported target type: {key}")
+
+
+def _ordered(steps: Optional[list]) -> list:
+    return sorted(steps or [], key=lambda s: s.get("stepOrder", 0))
+
+
+def _race_distance(description: Optional[str]) -> Optional[float]:
+    match = re.fullmatch(PATTERN_RACE_PACE, description or "")
+    if match is None:
+        return None
+    race, unit = match.groups()
+    return Distance(race, DistanceType.KILOMETERS if unit == "km" else DistanceType.METERS).value
+
+
+def _zone_names() -> Dict[tuple, str]:
+    return {tuple(values): zone.value.lower() for zone, values in HeartRateZoneConfig.ZONES.items()}
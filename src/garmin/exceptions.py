@@ -36,3 +36,16 @@ class GarminWorkoutIdError(Exception):
     """
 
     pass
+
+
+class GarminPayloadValidationError(ValueError):
+    """
+    Exception raised when a workout payload would be rejected by Garmin Connect, before it is sent
+
+    Attributes:
+        errors: The (path, message) pairs of every problem found in the payload.
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(f"{path or 'payload'} {message}" for path, message in self.errors))
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Callable, List, Optional, Tuple, TypeVar
+
+from deadline import REQUEST_DEADLINE, deadline_scope
+from garmin.concurrency import GARMIN_MAX_CONCURRENCY, iter_concurrently, run_concurrently
+from garmin.connect import GarminConnectClient
+from garmin.deserializer import GarminDeserializer
+from library.codec import workout_to_dict
+from library.store import WorkoutLibrary
+from logger import log_event
+from models.workout import Workout
+from parser.runfun_printer import RunFunPrinter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _budgeted(call: Callable[[], T], budget: Optional[float]) -> Callable[[], T]:
+    """
+    Return call made with a deadline of its own, budget seconds from when it starts, instead of the
+    deadline of the request. Without a budget, call is returned unchanged.
+    """
+    if budget is None:
+        return call
+
+    def run() -> T:
+        with deadline_scope(budget, detached=True):
+            return call()
+
+    return run
+
+
+async def iter_account_workouts(
+    client: GarminConnectClient,
+    page_size: int = 100,
+    limit: Optional[int] = None,
+    budget: Optional[float] = None,
+) -> AsyncIterator[List[dict]]:
+    """
+    Yield the workout summaries of the account page by page, fetching `limit` pages at a time, each
+    within `budget` seconds when given.
+
+    The number of workouts is not known in advance, so pages are requested in windows and listing stops
+    after the first short page. Only one window of summaries is held at a time.
+    """
+    window = limit or GARMIN_MAX_CONCURRENCY
+    start = 0
+    while True:
+        starts = [start + index * page_size for index in range(window)]
+        pages = await run_concurrently(
+            [_budgeted(lambda s=s: client.list_workouts(start=s, limit=page_size), budget) for s in starts],
+            window,
+        )
+        for page in pages:
+            if isinstance(page, Exception):
+                raise page
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+        start += window * page_size
+
+
+class AccountExporter:
+    """
+    The AccountExporter downloads every workout of a Garmin Connect account with its steps.
+
+    Summary pages and workouts are fetched concurrently, one window of pages at a time, so memory stays
+    bounded whatever the size of the library. Each workout becomes a record with its Garmin Connect
+    payload, kept as the backup of record, and, when it can be modeled, its Workout tree and RunFun
+    expression. Workouts that fail to download or to deserialize are reported with their error.
+
+    An export of a large account outlasts any request deadline, so each Garmin Connect call gets a
+    budget of its own of `call_budget` seconds instead.
+    """
+
+    def __init__(self,
+                 client: GarminConnectClient,
+                 page_size: int = 100,
+                 limit: Optional[int] = None,
+                 call_budget: Optional[float] = REQUEST_DEADLINE) -> None:
+        self.client = client
+        self.page_size = page_size
+        self.limit = limit
+        self.call_budget = call_budget
+        self.deserializer = GarminDeserializer()
+        self.printer = RunFunPrinter()
+
+    async def records(self) -> AsyncIterator[dict]:
+        """
+        Yield one record per workout, in the order downloads complete.
+        """
+        async for record, _ in self._export():
+            yield record
+
+    async def _export(self) -> AsyncIterator[Tuple[dict, Optional[Workout]]]:
+        async for page in iter_account_workouts(self.client, self.page_size, self.limit, self.call_budget):
+            calls = [
+                _budgeted(lambda w=summary["workoutId"]: self.client.get_workout(w), self.call_budget)
+                for summary in page
+            ]
+            async for index, payload in iter_concurrently(calls, self.limit):
+                yield self._record(page[index], payload)
+
+    def _record(self, summary: dict, payload) -> Tuple[dict, Optional[Workout]]:
+        record = {
+            "workout_id": summary["workoutId"],
+            "workout_name": summary.get("workoutName"),
+            "expression": None,
+            "workout": None,
+            "payload": None,
+        }
+        if isinstance(payload, Exception):
+            return {**record, "error": f"Download failed: {payload}"}, None
+
+        record["payload"] = payload
+        try:
+            workout = self.deserializer.deserialize(payload)
+            record["workout"] = workout_to_dict(workout)
+            record["expression"] = self.printer.print(workout)
+        except (ValueError, KeyError, TypeError) as ex:
+            record["error"] = str(ex)
+            return record, None
+        return record, workout
+
+    async def ndjson(self) -> AsyncIterator[str]:
+        """
+        Stream the records as NDJSON, followed by a summary line. The response has already started when
+        listing the account fails, so the failure is streamed as an error line before the summary, which
+        tells whether the export is complete.
+        """
+        exported = failed = 0
+        complete = True
+        try:
+            async for record in self.records():
+                exported += 1
+                failed += 1 if "error" in record else 0
+                yield json.dumps(record, separators=(",", ":")) + "\n"
+        except Exception as ex:
+            complete = False
+            log_event(logger, logging.WARNING, "account_export_failed", exported=exported, error=str(ex))
+            yield json.dumps({"error": f"Export stopped: {ex}"}) + "\n"
+        yield json.dumps({"summary": {"exported": exported, "failed": failed, "complete": complete}}) + "\n"
+
+    async def to_library(self, library: WorkoutLibrary, batch_size: int = 500) -> dict:
+        """
+        Store the workouts that have a RunFun expression in the library, in batches, and return counts.
+        """
+        exported, stored, failed = 0, 0, []
+        batch = []
+
+        async for record, workout in self._export():
+            exported += 1
+            if workout is None:
+                failed.append({"workout_id": record["workout_id"], "error": record["error"]})
+                continue
+            batch.append((record["expression"], workout))
+            if len(batch) >= batch_size:
+                stored += len(await asyncio.to_thread(library.add_many, batch))
+                batch = []
+
+        if batch:
+            stored += len(await asyncio.to_thread(library.add_many, batch))
+        return {"exported": exported, "stored": stored, "failed": failed}
@@ -0,0 +1,48 @@
+import zipfile
+from typing import Iterable, Iterator, List, Tuple
+
+from garmin.fit_encoder import FitWorkoutEncoder
+from models.workout import Workout
+
+
+class _ChunkWriter:
+    """
+    Write-only, non-seekable file object that collects what ZipFile writes until it is drained.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_fit_archive(
+    workouts: Iterable[Tuple[str, Workout]],
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> Iterator[bytes]:
+    """
+    Stream a ZIP archive with one FIT file per (file name, workout) pair.
+
+    Each file is encoded and compressed as soon as it is requested and its bytes are yielded right away,
+    so only one encoded file is held in memory at a time regardless of how many are exported.
+    """
+    encoder = FitWorkoutEncoder()
+    writer = _ChunkWriter()
+
+    with zipfile.ZipFile(writer, mode="w", compression=compression) as archive:
+        for file_name, workout in workouts:
+            with archive.open(file_name, mode="w") as f:
+                f.write(encoder.encode_view(workout))
+            yield writer.drain()
+
+    yield writer.drain()
@@ -0,0 +1,255 @@
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from models.condition import Distance, Duration
+from models.sport_type import SportType
+from models.step import RepeatedStep, Step
+from models.step_type import StepType
+from models.target import HeartRateZoneTarget, PaceTarget
+from models.workout import Workout
+
+if TYPE_CHECKING:
+    from analysis.race_pace import PaceTable
+
+
+def _crc_table() -> Tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_TABLE = _crc_table()
+
+
+def fit_crc(data, crc: int = 0) -> int:
+    """
+    CRC-16 used by the FIT protocol, computed one byte at a time with a lookup table.
+    """
+    table = CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+class FitWorkoutEncoder:
+    """
+    The FitWorkoutEncoder converts a Workout object into a FIT workout file that can be copied to a device.
+
+    A file contains a file_id, a workout and one workout_step message per executable step. Repeated steps
+    are written after their children as a repeat_until_steps_cmplt step pointing back to the first child.
+    The size of the file is computed up front and every record is packed in place into a buffer that is
+    reused between workouts, so no intermediate bytes objects are concatenated.
+
+    Race-pace targets are written as custom speed ranges, from the target values or the pace table of the
+    athlete, and as open targets when neither is known.
+    """
+
+    FIT_EPOCH = 631065600
+    PROFILE_VERSION = 2132
+    PROTOCOL_VERSION = 0x20
+    HEADER_SIZE = 14
+    CRC_SIZE = 2
+
+    STEP_NAME_SIZE = 32
+    WORKOUT_NAME_SIZE = 64
+
+    UINT8_INVALID = 0xFF
+    UINT32_INVALID = 0xFFFFFFFF
+
+    # FIT base types.
+    ENUM = 0x00
+    UINT16 = 0x84
+    UINT32 = 0x86
+    UINT32Z = 0x8C
+    STRING = 0x07
+
+    # Global message numbers.
+    FILE_ID = 0
+    WORKOUT = 26
+    WORKOUT_STEP = 27
+
+    # Enumerations of the FIT profile.
+    FILE_TYPE_WORKOUT = 5
+    MANUFACTURER_DEVELOPMENT = 255
+    DURATION_TIME = 0
+    DURATION_DISTANCE = 1
+    DURATION_REPEAT_UNTIL_STEPS_COMPLETE = 6
+    TARGET_SPEED = 0
+    TARGET_HEART_RATE = 1
+    TARGET_OPEN = 2
+    HEART_RATE_OFFSET = 100
+    SPEED_SCALE = 1000
+
+    SPORTS = {
+        SportType.Running: 1,
+        SportType.Cycling: 2,
+        SportType.Swimming: 5,
+        SportType.Strength: 10,
+        SportType.Cardio: 10,
+    }
+
+    INTENSITIES = {
+        StepType.Interval: 0,
+        StepType.Rest: 1,
+        StepType.WarmUp: 2,
+        StepType.CoolDown: 3,
+        StepType.Recovery: 4,
+    }
+
+    HEADER = struct.Struct("<BBHI4sH")
+    FILE_ID_DATA = struct.Struct("<BBHHII")
+    WORKOUT_DATA = struct.Struct(f"<BBH{WORKOUT_NAME_SIZE}s")
+    STEP_DATA = struct.Struct(f"<BH{STEP_NAME_SIZE}sBIBIIIB")
+    CRC = struct.Struct("<H")
+
+    def __init__(self, pace_table: Optional["PaceTable"] = None) -> None:
+        self.pace_table = pace_table
+        self._definitions = b"".join([
+            self._definition(0, self.FILE_ID, [
+                (0, 1, self.ENUM),
+                (1, 2, self.UINT16),
+                (2, 2, self.UINT16),
+                (3, 4, self.UINT32Z),
+                (4, 4, self.UINT32),
+            ]),
+            self._definition(1, self.WORKOUT, [
+                (4, 1, self.ENUM),
+                (6, 2, self.UINT16),
+                (8, self.WORKOUT_NAME_SIZE, self.STRING),
+            ]),
+            self._definition(2, self.WORKOUT_STEP, [
+                (254, 2, self.UINT16),
+                (0, self.STEP_NAME_SIZE, self.STRING),
+                (1, 1, self.ENUM),
+                (2, 4, self.UINT32),
+                (3, 1, self.ENUM),
+                (4, 4, self.UINT32),
+                (5, 4, self.UINT32),
+                (6, 4, self.UINT32),
+                (7, 1, self.ENUM),
+            ]),
+        ])
+        self._buffer = bytearray(4096)
+
+    def encode(self, workout: Workout, time_created: Optional[datetime] = None) -> bytes:
+        return bytes(self.encode_view(workout, time_created))
+
+    def encode_view(self, workout: Workout, time_created: Optional[datetime] = None) -> memoryview:
+        """
+        Encode the workout into the internal buffer and return a view of the file. The view is only
+        valid until the next call, callers that keep the file must copy it.
+        """
+        steps = self._flatten(workout)
+        data_size = (
+            len(self._definitions)
+            + self.FILE_ID_DATA.size
+            + self.WORKOUT_DATA.size
+            + self.STEP_DATA.size * len(steps)
+        )
+        size = self.HEADER_SIZE + data_size + self.CRC_SIZE
+
+        if len(self._buffer) < size:
+            self._buffer = bytearray(max(size, len(self._buffer) * 2))
+        buffer = self._buffer
+        view = memoryview(buffer)
+
+        self.HEADER.pack_into(
+            buffer, 0, self.HEADER_SIZE, self.PROTOCOL_VERSION, self.PROFILE_VERSION, data_size, b".FIT", 0
+        )
+        struct.pack_into("<H", buffer, 12, fit_crc(view[:12]))
+
+        offset = self.HEADER_SIZE
+        buffer[offset:offset + len(self._definitions)] = self._definitions
+        offset += len(self._definitions)
+
+        name = self._encode_string(workout.name, self.WORKOUT_NAME_SIZE)
+        created = time_created if time_created else datetime.now(timezone.utc)
+        self.FILE_ID_DATA.pack_into(
+            buffer, offset,
+            0,
+            self.FILE_TYPE_WORKOUT,
+            self.MANUFACTURER_DEVELOPMENT,
+            0,
+            zlib.crc32(name) or 1,
+            int(created.timestamp()) - self.FIT_EPOCH,
+        )
+        offset += self.FILE_ID_DATA.size
+
+        self.WORKOUT_DATA.pack_into(
+            buffer, offset, 1, self.SPORTS.get(workout.type, 0), len(steps), name
+        )
+        offset += self.WORKOUT_DATA.size
+
+        pack_step = self.STEP_DATA.pack_into
+        for index, step in enumerate(steps):
+            pack_step(buffer, offset, 2, index, *step)
+            offset += self.STEP_DATA.size
+
+        self.CRC.pack_into(buffer, offset, fit_crc(view[:offset]))
+        return view[:size]
+
+    def _flatten(self, workout: Workout) -> List[tuple]:
+        steps = []
+        for step in workout.steps:
+            if isinstance(step, RepeatedStep):
+                first = len(steps)
+                steps.extend(self._step_fields(s) for s in step.steps)
+                steps.append((
+                    b"",
+                    self.DURATION_REPEAT_UNTIL_STEPS_COMPLETE,
+                    first,
+                    self.UINT8_INVALID,
+                    step.iterations,
+                    self.UINT32_INVALID,
+                    self.UINT32_INVALID,
+                    self.UINT8_INVALID,
+                ))
+            else:
+                steps.append(self._step_fields(step))
+        return steps
+
+    def _step_fields(self, step: Step) -> tuple:
+        if isinstance(step.condition, Duration):
+            duration_type, duration_value = self.DURATION_TIME, step.condition.value * 1000
+        elif isinstance(step.condition, Distance):
+            duration_type, duration_value = self.DURATION_DISTANCE, round(step.condition.value * 100)
+        else:
+            raise ValueError(f"Step {step.step_name} has no end condition supported by FIT")
+
+        if isinstance(step.target, HeartRateZoneTarget):
+            target_type = self.TARGET_HEART_RATE
+            low, high = (value + self.HEART_RATE_OFFSET for value in step.target.values)
+        elif isinstance(step.target, PaceTarget) and (step.target.values or self.pace_table):
+            target_type = self.TARGET_SPEED
+            speeds = step.target.values or self.pace_table.speed_range(step.target.race_distance)
+            low, high = (round(value * self.SPEED_SCALE) for value in speeds)
+        else:
+            target_type = self.TARGET_OPEN
+            low = high = self.UINT32_INVALID
+
+        return (
+            self._encode_string(step.step_name, self.STEP_NAME_SIZE),
+            duration_type,
+            duration_value,
+            target_type,
+            0,
+            low,
+            high,
+            self.INTENSITIES.get(step.step_type, self.UINT8_INVALID),
+        )
+
+    @staticmethod
+    def _encode_string(value: str, size: int) -> bytes:
+        # Keep room for the null terminator without cutting a multi-byte character in half.
+        return value.encode("utf-8")[:size - 1].decode("utf-8", "ignore").encode("utf-8")
+
+    @staticmethod
+    def _definition(local_type: int, global_number: int, fields: List[Tuple[int, int, int]]) -> bytes:
+        header = struct.pack("<BBBHB", 0x40 | local_type, 0, 0, global_number, len(fields))
+        return header + b"".join(struct.pack("<BBB", *field) for field in fields)
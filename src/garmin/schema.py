@@ -0,0 +1,338 @@
+from typing import Callable, Dict, List, Tuple, Union
+
+from garmin.exceptions import GarminPayloadValidationError
+from models.sport_type import SportType
+from models.step_type import StepType
+from models.target_type import TargetType
+
+
+MAX_STEPS = 50
+MAX_ITERATIONS = 99
+MAX_WORKOUT_NAME_LENGTH = 255
+
+# A schema node validates one value and returns (path, message) pairs for every problem found, with
+# paths relative to the value. Valid values return an empty tuple, so no path is built unless needed.
+Errors = Union[List[Tuple[str, str]], Tuple[()]]
+Validator = Callable[[object], Errors]
+
+NO_ERRORS: Tuple[()] = ()
+
+
+def _enum_object(key_field: str, keys: List[str]) -> dict:
+    return {
+        "type": "object",
+        "properties": {
+            key_field.replace("Key", "Id"): {"type": "integer", "minimum": 1},
+            key_field: {"type": "string", "enum": keys},
+            "displayOrder": {"type": "integer", "minimum": 1},
+        },
+    }
+
+
+SPORT_TYPE = _enum_object("sportTypeKey", [sport.key for sport in SportType])
+STEP_TYPE = _enum_object("stepTypeKey", [step_type.key for step_type in StepType])
+
+EXECUTABLE_STEP = {
+    "type": "object",
+    "properties": {
+        "stepId": {"type": "integer", "minimum": 1},
+        "stepOrder": {"type": "integer", "minimum": 1},
+        "stepType": STEP_TYPE,
+        "endCondition": {
+            "type": "object",
+            "properties": {
+                "conditionTypeId": {"type": "integer", "minimum": 1},
+                "conditionTypeKey": {"type": "string", "enum": ["time", "distance"]},
+            },
+        },
+        # Garmin Connect rounds to whole seconds and meters, anything below one is lost.
+        "endConditionValue": {"type": "number", "minimum": 1},
+        "description": {"type": "string", "nullable": True},
+        "targetType": {
+            "type": "object",
+            "nullable": True,
+            "properties": {
+                "workoutTargetTypeId": {"type": "integer", "minimum": 1},
+                "workoutTargetTypeKey": {"type": "string", "enum": [target.key for target in TargetType]},
+            },
+        },
+    },
+    "checks": ["target_range"],
+}
+
+REPEAT_STEP = {
+    "type": "object",
+    "properties": {
+        "stepId": {"type": "integer", "minimum": 1},
+        "stepOrder": {"type": "integer", "minimum": 1},
+        "stepType": STEP_TYPE,
+        "numberOfIterations": {"type": "integer", "minimum": 1, "maximum": MAX_ITERATIONS},
+        "workoutSteps": {"type": "array", "minItems": 1, "items": {"$ref": "step"}},
+    },
+}
+
+STEP = {
+    "discriminator": "type",
+    "mapping": {"ExecutableStepDTO": EXECUTABLE_STEP, "RepeatGroupDTO": REPEAT_STEP},
+}
+
+WORKOUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sportType": SPORT_TYPE,
+        "workoutName": {"type": "string", "minLength": 1, "maxLength": MAX_WORKOUT_NAME_LENGTH},
+        "estimatedDurationInSecs": {"type": "number", "minimum": 0},
+        "workoutSegments": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "segmentOrder": {"type": "integer", "minimum": 1},
+                    "sportType": SPORT_TYPE,
+                    "workoutSteps": {"type": "array", "minItems": 1, "items": {"$ref": "step"}},
+                },
+            },
+        },
+    },
+    "checks": ["steps"],
+}
+
+DEFINITIONS = {"step": STEP}
+
+
+class PayloadValidator:
+    """
+    The PayloadValidator checks Garmin Connect workout payloads locally, before they are uploaded.
+
+    The schema is a small subset of JSON Schema (types, required properties, ranges, enums, arrays and
+    a discriminator on "type") plus a few named checks across fields. It is compiled once into nested
+    closures specialized for each node, so validating a payload is a walk over the payload without
+    interpreting the schema. Every problem is reported with its path, for example
+    "workoutSegments[0].workoutSteps[1].workoutSteps[0].endConditionValue".
+    """
+
+    def __init__(self, schema: dict = WORKOUT_SCHEMA, definitions: Dict[str, dict] = DEFINITIONS) -> None:
+        self._definitions: Dict[str, Validator] = {}
+        self._sources = definitions
+        self._validate = self._compile(schema)
+
+    def errors(self, payload: dict) -> List[Tuple[str, str]]:
+        """
+        Return the (path, message) pairs of every problem in the payload, empty when it is valid.
+        """
+        return list(self._validate(payload))
+
+    def validate(self, payload: dict) -> None:
+        """
+        Raise a GarminPayloadValidationError listing every problem of an invalid payload.
+        """
+        errors = self._validate(payload)
+        if errors:
+            raise GarminPayloadValidationError(errors)
+
+    def _compile(self, schema: dict) -> Validator:
+        if "$ref" in schema:
+            return self._reference(schema["$ref"])
+        if "discriminator" in schema:
+            return self._discriminated(schema)
+
+        kind = schema.get("type")
+        if kind == "object":
+            validator = self._object(schema)
+        elif kind == "array":
+            validator = self._array(schema)
+        elif kind in ("integer", "number"):
+            validator = self._number(schema)
+        elif kind == "string":
+            validator = self._string(schema)
+        else:
+            raise ValueError(f"Unsupported schema type: {kind}")
+
+        if not schema.get("nullable", False):
+            return validator
+
+        def validate(value):
+            return NO_ERRORS if value is None else validator(value)
+
+        return validate
+
+    def _reference(self, name: str) -> Validator:
+        # References are compiled on first use so a schema can refer to itself, as repeat groups do.
+        def validate(value):
+            validator = self._definitions.get(name)
+            if validator is None:
+                validator = self._definitions[name] = self._compile(self._sources[name])
+            return validator(value)
+
+        return validate
+
+    def _discriminated(self, schema: dict) -> Validator:
+        field = schema["discriminator"]
+        mapping = {key: self._compile(option) for key, option in schema["mapping"].items()}
+
+        def validate(value):
+            if not isinstance(value, dict):
+                return [("", "must be an object")]
+            option = mapping.get(value.get(field))
+            if option is None:
+                return [(field, f"must be one of {sorted(mapping)}")]
+            return option(value)
+
+        return validate
+
+    def _object(self, schema: dict) -> Validator:
+        properties = [
+            (name, self._compile(child), child.get("nullable", False))
+            for name, child in schema.get("properties", {}).items()
+        ]
+        checks = [CHECKS[name] for name in schema.get("checks", [])]
+
+        def validate(value):
+            if not isinstance(value, dict):
+                return [("", "must be an object")]
+
+            errors = []
+            for name, child, optional in properties:
+                if name in value:
+                    found = child(value[name])
+                    if found:
+                        errors.extend((_join(name, path), message) for path, message in found)
+                elif not optional:
+                    errors.append((name, "is required"))
+            for check in checks:
+                errors.extend(check(value))
+            return errors or NO_ERRORS
+
+        return validate
+
+    def _array(self, schema: dict) -> Validator:
+        items = self._compile(schema["items"]) if "items" in schema else None
+        min_items = schema.get("minItems", 0)
+
+        def validate(value):
+            if not isinstance(value, list):
+                return [("", "must be an array")]
+
+            errors = []
+            if len(value) < min_items:
+                errors.append(("", f"must have at least {min_items} items"))
+            if items is not None:
+                for index, item in enumerate(value):
+                    found = items(item)
+                    if found:
+                        errors.extend((_join(f"[{index}]", path), message) for path, message in found)
+            return errors or NO_ERRORS
+
+        return validate
+
+    @staticmethod
+    def _number(schema: dict) -> Validator:
+        types = int if schema["type"] == "integer" else (int, float)
+        description = "an integer" if schema["type"] == "integer" else "a number"
+        minimum = schema.get("minimum", float("-inf"))
+        maximum = schema.get("maximum", float("inf"))
+
+        def validate(value):
+            if isinstance(value, bool) or not isinstance(value, types):
+                return [("", f"must be {description}")]
+            if value < minimum:
+                return [("", f"must be at least {minimum}, got {value}")]
+            if value > maximum:
+                return [("", f"must be at most {maximum}, got {value}")]
+            return NO_ERRORS
+
+        return validate
+
+    @staticmethod
+    def _string(schema: dict) -> Validator:
+        min_length = schema.get("minLength", 0)
+        max_length = schema.get("maxLength", float("inf"))
+        enum = frozenset(schema["enum"]) if "enum" in schema else None
+
+        def validate(value):
+            if not isinstance(value, str):
+                return [("", "must be a string")]
+            if len(value) < min_length:
+                return [("", "must not be empty" if min_length == 1 else f"must have at least {min_length} characters")]
+            if len(value) > max_length:
+                return [("", f"must have at most {max_length} characters")]
+            if enum is not None and value not in enum:
+                return [("", f"must be one of {sorted(enum)}, got {value!r}")]
+            return NO_ERRORS
+
+        return validate
+
+
+def _join(name: str, path: str) -> str:
+    if not path:
+        return name
+    return f"{name}{path}" if path.startswith("[") else f"{name}.{path}"
+
+
+def _check_steps(payload: dict) -> Errors:
+    """
+    Check the total number of steps and that steps are numbered 1, 2, 3... in the order they run.
+    """
+    errors = []
+    count = 0
+
+    def visit(steps, location):
+        nonlocal count
+        for index, step in enumerate(steps):
+            if not isinstance(step, dict):
+                continue
+            count += 1
+            order = step.get("stepOrder")
+            if isinstance(order, int) and order != count:
+                errors.append((f"{_step_path(location + (index,))}.stepOrder", f"must be {count}, got {order}"))
+            if step.get("type") == "RepeatGroupDTO" and isinstance(step.get("workoutSteps"), list):
+                visit(step["workoutSteps"], location + (index,))
+
+    for index, segment in enumerate(payload.get("workoutSegments") or []):
+        if isinstance(segment, dict) and isinstance(segment.get("workoutSteps"), list):
+            visit(segment["workoutSteps"], (index,))
+
+    if count > MAX_STEPS:
+        errors.append(("workoutSegments", f"must have at most {MAX_STEPS} steps, got {count}"))
+    return errors or NO_ERRORS
+
+
+def _step_path(location: Tuple[int, ...]) -> str:
+    segment, *steps = location
+    return f"workoutSegments[{segment}]" + "".join(f".workoutSteps[{index}]" for index in steps)
+
+
+def _check_target_range(step: dict) -> Errors:
+    """
+    Check that a step with a target has a valid range in targetValueOne and targetValueTwo.
+    """
+    target = step.get("targetType")
+    if not isinstance(target, dict) or target.get("workoutTargetTypeKey") == TargetType.NoTarget.key:
+        return NO_ERRORS
+
+    low, high = step.get("targetValueOne"), step.get("targetValueTwo")
+    for name, value in (("targetValueOne", low), ("targetValueTwo", high)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return [(name, "is required by the target and must be a number")]
+        if value <= 0:
+            return [(name, f"must be positive, got {value}")]
+    if low >= high:
+        return [("targetValueTwo", f"must be greater than targetValueOne ({low}), got {high}")]
+    return NO_ERRORS
+
+
+CHECKS: Dict[str, Validator] = {
+    "steps": _check_steps,
+    "target_range": _check_target_range,
+}
+
+
+payload_validator = PayloadValidator()
+
+
+def validate_payload(payload: dict) -> None:
+    """
+    Validate a workout payload with the shared validator, raising GarminPayloadValidationError.
+    """
+    payload_validator.validate(payload)
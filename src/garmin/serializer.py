@@ -1,18 +1,111 @@
-from typing import List
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Tuple, Union
 from models.step import RepeatedStep, Step
-from models.target import HeartRateZoneTarget
+from models.target import HeartRateZoneTarget, NoTarget, PaceTarget
 from models.workout import Workout
+from tracing import traced
+
+if TYPE_CHECKING:
+    # The pace table needs numpy, which serializing workouts without race-pace targets does not.
+    from analysis.race_pace import PaceTable
+
+
+class SerializedStepCache:
+    """
+    The SerializedStepCache keeps serialized steps and repeat groups by the structure of the step, so
+    blocks that recur across the workouts of a plan, such as "10' zr" or "2x (8' zm + 5' zr)", are built
+    once.
+
+    A block serialized at the same step order as before is returned as it is. At another order, the
+    cached block is copied with its stepId and stepOrder shifted, sharing every nested dict but the
+    steps themselves. Each block keeps at most max_variants orders, and the least recently used blocks
+    are dropped beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_variants: int = 16) -> None:
+        self.max_entries = max_entries
+        self.max_variants = max_variants
+        self._lock = threading.Lock()
+        self._blocks: "OrderedDict[Hashable, _CachedBlock]" = OrderedDict()
+
+    def get(self, key: Hashable, order: int) -> Optional[Tuple[dict, int, int]]:
+        """
+        Return the (payload, estimated duration, number of step orders used) of the block serialized
+        from the given step order, or None if the block is not cached.
+        """
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None:
+                return None
+            self._blocks.move_to_end(key)
+            payload = block.variants.get(order)
+            if payload is None:
+                base_order, base = next(iter(block.variants.items()))
+                payload = _renumber(base, order - base_order)
+                if len(block.variants) < self.max_variants:
+                    block.variants[order] = payload
+            return payload, block.duration, block.size
+
+    def put(self, key: Hashable, order: int, payload: dict, duration: int, size: int) -> None:
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None:
+                block = self._blocks[key] = _CachedBlock(duration, size)
+            if len(block.variants) < self.max_variants:
+                block.variants.setdefault(order, payload)
+            while len(self._blocks) > self.max_entries:
+                self._blocks.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+
+
+class _CachedBlock:
+    __slots__ = ("variants", "duration", "size")
+
+    def __init__(self, duration: int, size: int) -> None:
+        self.variants: Dict[int, dict] = {}
+        self.duration = duration
+        self.size = size
+
+
+def _renumber(payload: dict, offset: int) -> dict:
+    renumbered = dict(payload)
+    renumbered["stepId"] += offset
+    renumbered["stepOrder"] += offset
+    if "workoutSteps" in payload:
+        renumbered["workoutSteps"] = [_renumber(step, offset) for step in payload["workoutSteps"]]
+    return renumbered
+
+
+serialized_steps = SerializedStepCache()
 
 
 class GarminSerializer:
     """
     The GarminSerializer class serializes a Workout object into the JSON format required by Garmin Connect.
+
+    Race-pace targets take their speed range from the pace table of the athlete, looked up by race
+    distance. Without a pace table, steps whose pace target has no values are written without a target.
+
+    With a SerializedStepCache, such as the shared serialized_steps, steps and repeat groups identical
+    to a block serialized before are taken from the cache. Like the constant parts of WorkoutTemplate
+    payloads, they are then shared between payloads and must not be modified; the payload and segment
+    dicts are always new. Without a cache, every payload is built from scratch and owned by the caller.
     """
 
-    def __init__(self) -> None:
+    def __init__(self,
+                 pace_table: Optional["PaceTable"] = None,
+                 cache: Optional[SerializedStepCache] = None) -> None:
         self.step_order = 1
+        self.pace_table = pace_table
+        self.cache = cache
 
+    @traced("serialize")
     def serialize(self, workout: Workout) -> dict:
+        self.step_order = 1
         payload = {
             "sportType": {
                 "sportTypeId": workout.type.id,
@@ -39,14 +132,15 @@ class GarminSerializer:
             "workoutSteps": [],
         }
         
+        duration = 0
         for step in workout.steps:
-            if isinstance(step, RepeatedStep):
-                segment["workoutSteps"].append(self.serialize_repeat_step(step))
-            else:
-                segment["workoutSteps"].append(self.serialize_step(step))
+            step_payload, step_duration = self._serialize_block(step)
+            segment["workoutSteps"].append(step_payload)
+            duration += step_duration
 
         payload["workoutSegments"].append(segment)
-        payload["estimatedDurationInSecs"] = calculate_estimated_duration(payload["workoutSegments"])
+        # The sum of the durations of the blocks, as calculate_estimated_duration computes it.
+        payload["estimatedDurationInSecs"] = duration
         
         return payload
 
@@ -88,10 +182,83 @@ class GarminSerializer:
                     "targetValueTwo": step.target.values[1],
                 }
             )
+        elif isinstance(step.target, PaceTarget):
+            speeds = self._pace_speeds(step.target)
+            if speeds is not None:
+                payload.update(
+                    {
+                        "targetType": {
+                            "workoutTargetTypeId": step.target.type.id,
+                            "workoutTargetTypeKey": step.target.type.key,
+                            "displayOrder": step.target.type.id,
+                        },
+                        "targetValueOne": speeds[0],
+                        "targetValueTwo": speeds[1],
+                    }
+                )
 
         self.step_order += 1
         return payload
 
+    def _serialize_block(self, step: Union[Step, RepeatedStep]) -> Tuple[dict, int]:
+        order = self.step_order
+        key = self._block_key(step) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key, order)
+            if cached is not None:
+                payload, duration, size = cached
+                self.step_order += size
+                return payload, duration
+
+        if isinstance(step, RepeatedStep):
+            payload = self.serialize_repeat_step(step)
+        else:
+            payload = self.serialize_step(step)
+        duration = calculate_estimated_duration([{"workoutSteps": [payload]}])
+
+        if key is not None:
+            self.cache.put(key, order, payload, duration, self.step_order - order)
+        return payload, duration
+
+    def _block_key(self, step: Union[Step, RepeatedStep]) -> Optional[tuple]:
+        """
+        Return a key equal for steps that serialize to the same payload, or None if the step must not
+        be cached. Step names are not part of the payload, so they are not part of the key.
+        """
+        if isinstance(step, RepeatedStep):
+            children = tuple([self._block_key(s) for s in step.steps])
+            if None in children:
+                return None
+            return ("repeat", step.step_type.key, step.iterations, children)
+
+        # Targets are ABCs, whose isinstance checks are slow; match exact classes and leave others out.
+        target = step.target
+        target_class = target.__class__
+        if target is None or target_class is NoTarget:
+            target_key = None
+        elif target_class is HeartRateZoneTarget:
+            target_key = ("hr", *target.values)
+        elif target_class is PaceTarget:
+            speeds = self._pace_speeds(target)
+            target_key = ("pace", *speeds) if speeds is not None else None
+        else:
+            return None
+
+        condition = step.condition
+        # Enum members hash in Python, their string keys do not. 60 and 60.0 are equal keys but not the
+        # same JSON, so the type of the value is part of the key.
+        return (
+            "step", step.step_type.key, condition.type, condition.value, condition.value.__class__,
+            step.description, target_key,
+        )
+
+    def _pace_speeds(self, target: PaceTarget) -> Optional[List[float]]:
+        if target.values is not None:
+            return target.values
+        if self.pace_table is not None:
+            return list(self.pace_table.speed_range(target.race_distance))
+        return None
+
     def serialize_repeat_step(self, step: RepeatedStep) -> dict:
         """
         Convert the RepeatedStep object into a dictionary that represents a Garmin Connect workout step.
@@ -118,7 +285,7 @@ class GarminSerializer:
 
         self.step_order += 1
 
-        result = [self.serialize_step(s) for s in step.steps]
+        result = [self._serialize_block(s)[0] for s in step.steps]
         payload.update(
             {
                 "workoutSteps": result
@@ -0,0 +1,90 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Tuple, TypeVar
+
+from deadline import call_timeout
+
+
+T = TypeVar("T")
+
+GARMIN_CONNECT_TIMEOUT = float(os.getenv("GARMIN_CONNECT_TIMEOUT", "3.05"))
+GARMIN_READ_TIMEOUT = float(os.getenv("GARMIN_READ_TIMEOUT", "20"))
+GARMIN_HEDGED_READS = os.getenv("GARMIN_HEDGED_READS", "false").lower() in ("1", "true", "yes")
+
+# Hedged attempts run in their own small pool so they never wait behind the calls they back up.
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="garmin-hedge")
+
+
+def request_timeout() -> Tuple[float, float]:
+    """
+    Return the (connect, read) timeouts of a Garmin Connect call made now, bounded by the deadline of the
+    current request. Raise DeadlineExceeded when no time is left.
+    """
+    return call_timeout(GARMIN_CONNECT_TIMEOUT, GARMIN_READ_TIMEOUT)
+
+
+class LatencyTracker:
+    """
+    Thread-safe sliding window of call latencies, giving percentiles once enough calls were measured.
+    """
+
+    def __init__(self, window: int = 256, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: "deque[float]" = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+read_latency = LatencyTracker()
+
+
+def hedged_call(call: Callable[[], T], delay: Optional[float], second: Optional[Callable[[], T]] = None) -> T:
+    """
+    Call an idempotent function, and make a second attempt if the first one has not returned after delay
+    seconds, with second when given and call otherwise. The first attempt to succeed wins; the other one
+    is left to finish on its own, within its timeouts. If both fail, the error of the first to fail is
+    raised. Without a delay, the function is called once.
+    """
+    if delay is None:
+        return call()
+
+    # Each attempt runs in a copy of the caller's context, so it stays in the span of the request.
+    first = _hedge_executor.submit(contextvars.copy_context().run, call)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    attempts = {first, _hedge_executor.submit(contextvars.copy_context().run, second or call)}
+    error = None
+    while attempts:
+        done, attempts = wait(attempts, return_when=FIRST_COMPLETED)
+        for attempt in done:
+            if attempt.exception() is None:
+                return attempt.result()
+            error = error or attempt.exception()
+    raise error
+
+
+def timed_read(call: Callable[[], T], hedge: bool, second: Optional[Callable[[], T]] = None) -> T:
+    """
+    Make a Garmin Connect read, hedged with second past the 95th percentile of recent reads when hedge is
+    set, and record its latency.
+    """
+    started = time.monotonic()
+    result = hedged_call(call, read_latency.percentile(0.95) if hedge else None, second)
+    read_latency.record(time.monotonic() - started)
+    return result
@@ -0,0 +1,94 @@
+from typing import Union
+
+from models.condition import Distance, Duration
+from models.sport_type import SportType
+from models.step import RepeatedStep, Step
+from models.step_type import StepType
+from models.target import HeartRateZoneTarget, NoTarget, PaceTarget
+from models.target_type import TargetType
+from models.workout import Workout
+
+
+SPORT_TYPES = {sport.key: sport for sport in SportType}
+STEP_TYPES = {step_type.key: step_type for step_type in StepType}
+
+
+def workout_to_dict(workout: Workout) -> dict:
+    """
+    Convert a Workout tree into plain JSON-compatible values.
+    """
+    return {
+        "name": workout.name,
+        "type": workout.type.key,
+        "steps": [_step_to_dict(step) for step in workout.steps],
+    }
+
+
+def workout_from_dict(value: dict) -> Workout:
+    """
+    Rebuild a Workout tree from the output of workout_to_dict.
+    """
+    workout = Workout(value["name"], SPORT_TYPES[value["type"]])
+    for step in value["steps"]:
+        workout.add_step(_step_from_dict(step))
+    return workout
+
+
+def _step_to_dict(step: Union[Step, RepeatedStep]) -> dict:
+    if isinstance(step, RepeatedStep):
+        return {
+            "repeat": step.iterations,
+            "steps": [_step_to_dict(s) for s in step.steps],
+        }
+
+    result = {
+        "name": step.step_name,
+        "description": step.description,
+        "type": step.step_type.key,
+        "condition": {"type": step.condition.type, "value": step.condition.value},
+    }
+    if isinstance(step.target, HeartRateZoneTarget):
+        result["target"] = {"type": step.target.type.key, "values": list(step.target.values)}
+        if step.target.zone is not None:
+            result["target"]["zone"] = step.target.zone
+    elif isinstance(step.target, PaceTarget):
+        result["target"] = {
+            "type": step.target.type.key,
+            "race_distance": step.target.race_distance,
+            "values": list(step.target.values) if step.target.values is not None else None,
+        }
+    return result
+
+
+def _step_from_dict(value: dict) -> Union[Step, RepeatedStep]:
+    if "repeat" in value:
+        return RepeatedStep(
+            iterations=value["repeat"],
+            steps=[_step_from_dict(s) for s in value["steps"]],
+        )
+
+    condition = value["condition"]
+    if condition["type"] == "time":
+        end_condition = Duration.from_seconds(condition["value"])
+    elif condition["type"] == "distance":
+        end_condition = Distance.from_meters(condition["value"])
+    else:
+        raise ValueError(f"Unknown condition type: {condition['type']}")
+
+    target = value.get("target")
+    if target is None:
+        step_target = NoTarget()
+    elif target["type"] == TargetType.HeartRate.key:
+        step_target = HeartRateZoneTarget(target["values"], target.get("zone"))
+    elif target["type"] == TargetType.Pace.key:
+        step_target = PaceTarget(target["race_distance"], target.get("values"))
+    else:
+        raise ValueError(f"Unknown target type: {target['type']}")
+
+    return Step(
+        step_name=value["name"],
+        description=value["description"],
+        step_type=STEP_TYPES[value["type"]],
+        target=step_target,
+        condition=end_condition,
+    )
@@ -0,0 +1,262 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analysis.training_load import PlanLoad, TrainingLoadEstimator
+from garmin.serializer import GarminSerializer, serialized_steps
+from library.codec import workout_from_dict, workout_to_dict
+from models.condition import Distance
+from models.step import RepeatedStep
+from models.workout import Workout
+from parser.runfun_printer import RunFunPrinter
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workouts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    expression TEXT NOT NULL,
+    canonical TEXT NOT NULL,
+    tree TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    duration_secs INTEGER NOT NULL,
+    distance_meters REAL NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_workouts_duration ON workouts (duration_secs);
+CREATE INDEX IF NOT EXISTS idx_workouts_canonical ON workouts (canonical);
+
+CREATE TABLE IF NOT EXISTS workout_zones (
+    workout_id INTEGER NOT NULL REFERENCES workouts (id) ON DELETE CASCADE,
+    zone TEXT NOT NULL,
+    seconds INTEGER NOT NULL,
+    PRIMARY KEY (workout_id, zone)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_workout_zones_zone ON workout_zones (zone, workout_id, seconds);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS workouts_fts USING fts5 (name, content='workouts', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS workouts_fts_insert AFTER INSERT ON workouts BEGIN
+    INSERT INTO workouts_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS workouts_fts_delete AFTER DELETE ON workouts BEGIN
+    INSERT INTO workouts_fts (workouts_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS workouts_fts_update AFTER UPDATE OF name ON workouts BEGIN
+    INSERT INTO workouts_fts (workouts_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO workouts_fts (rowid, name) VALUES (new.id, new.name);
+END;
+"""
+
+SUMMARY_COLUMNS = "w.id, w.name, w.canonical, w.duration_secs, w.distance_meters, w.created_at"
+
+
+def total_distance(workout: Workout) -> float:
+    distance = 0.0
+    for step in workout.steps:
+        if isinstance(step, RepeatedStep):
+            distance += step.iterations * sum(
+                s.condition.value for s in step.steps if isinstance(s.condition, Distance)
+            )
+        elif isinstance(step.condition, Distance):
+            distance += step.condition.value
+    return distance
+
+
+class WorkoutLibrary:
+    """
+    The WorkoutLibrary stores parsed workouts in SQLite together with their expression, canonical form,
+    Garmin Connect payload and derived stats, so they can be searched without re-parsing.
+
+    Time in zone is kept in its own table indexed by zone in workout order, and names are indexed with
+    FTS5, so structural and text queries are answered from indexes. Imports are written in batches, one
+    transaction per batch.
+    """
+
+    def __init__(self, path: str = ":memory:", estimator: Optional[TrainingLoadEstimator] = None) -> None:
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._estimator = estimator if estimator else TrainingLoadEstimator()
+        self._printer = RunFunPrinter()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add(self, expression: str, workout: Workout) -> int:
+        return self.add_many([(expression, workout)])[0]
+
+    def add_many(self, items: Iterable[Tuple[str, Workout]], batch_size: int = 1000) -> List[int]:
+        """
+        Store (expression, workout) pairs and return their IDs. Stats of each batch are computed at
+        once and each batch is committed in a single transaction.
+        """
+        ids = []
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return ids
+            ids.extend(self._insert_batch(batch))
+
+    def get(self, workout_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM workouts WHERE id = ?", (workout_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            zones = self._connection.execute(
+                "SELECT zone, seconds FROM workout_zones WHERE workout_id = ?", (workout_id,)
+            ).fetchall()
+
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "expression": row["expression"],
+            "canonical": row["canonical"],
+            "payload": json.loads(row["payload"]),
+            "estimated_duration_in_secs": row["duration_secs"],
+            "estimated_distance_in_meters": row["distance_meters"],
+            "time_in_zone_in_secs": {zone["zone"]: zone["seconds"] for zone in zones},
+            "created_at": row["created_at"],
+        }
+
+    def get_workout(self, workout_id: int) -> Optional[Workout]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT tree FROM workouts WHERE id = ?", (workout_id,)
+            ).fetchone()
+        return workout_from_dict(json.loads(row["tree"])) if row else None
+
+    def delete(self, workout_id: int) -> bool:
+        with self._lock, self._connection:
+            cursor = self._connection.execute("DELETE FROM workouts WHERE id = ?", (workout_id,))
+        return cursor.rowcount > 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM workouts").fetchone()[0]
+
+    def search(self,
+               name: Optional[str] = None,
+               min_zone_secs: Optional[Dict[str, int]] = None,
+               max_zone_secs: Optional[Dict[str, int]] = None,
+               min_duration: Optional[int] = None,
+               max_duration: Optional[int] = None,
+               canonical: Optional[str] = None,
+               limit: int = 50,
+               offset: int = 0) -> List[dict]:
+        """
+        Find workouts by name, canonical expression, total duration and time in zone. For example, all
+        workouts with at least 20 minutes in ZS and at most 60 minutes in total:
+
+            library.search(min_zone_secs={"ZS": 1200}, max_duration=3600)
+        """
+        joins, conditions, parameters = [], [], []
+        # Results are ordered by the key of the most selective index used, so SQLite can walk that
+        # index in order and stop at the limit instead of sorting every match.
+        order = "w.id"
+
+        if name:
+            joins.append("JOIN workouts_fts f ON f.rowid = w.id")
+            conditions.append("workouts_fts MATCH ?")
+            parameters.append(self._match_expression(name))
+            order = "f.rowid"
+
+        for index, (zone, seconds) in enumerate((min_zone_secs or {}).items()):
+            joins.append(f"JOIN workout_zones z{index} ON z{index}.workout_id = w.id")
+            conditions.append(f"z{index}.zone = ? AND z{index}.seconds >= ?")
+            parameters.extend([zone.upper(), seconds])
+            order = "z0.workout_id"
+
+        for zone, seconds in (max_zone_secs or {}).items():
+            conditions.append(
+                "NOT EXISTS (SELECT 1 FROM workout_zones m WHERE m.workout_id = w.id AND m.zone = ? AND m.seconds > ?)"
+            )
+            parameters.extend([zone.upper(), seconds])
+
+        if min_duration is not None:
+            conditions.append("w.duration_secs >= ?")
+            parameters.append(min_duration)
+        if max_duration is not None:
+            conditions.append("w.duration_secs <= ?")
+            parameters.append(max_duration)
+        if canonical is not None:
+            conditions.append("w.canonical = ?")
+            parameters.append(canonical)
+
+        query = f"SELECT {SUMMARY_COLUMNS} FROM workouts w {' '.join(joins)}"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        query += f" ORDER BY {order} LIMIT ? OFFSET ?"
+        parameters.extend([limit, offset])
+
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "canonical": row["canonical"],
+                "estimated_duration_in_secs": row["duration_secs"],
+                "estimated_distance_in_meters": row["distance_meters"],
+                "created_at": row["created_at"],
+            }
+            for row in rows
+        ]
+
+    def _insert_batch(self, batch: List[Tuple[str, Workout]]) -> List[int]:
+        workouts = [workout for _, workout in batch]
+        load: PlanLoad = self._estimator.estimate(workouts)
+        created_at = datetime.now(timezone.utc).isoformat()
+
+        rows = []
+        for index, (expression, workout) in enumerate(batch):
+            zones = [
+                (zone.value, int(round(seconds)))
+                for zone, seconds in zip(PlanLoad.ZONES, load.time_in_zone[index])
+                if seconds > 0
+            ]
+            rows.append((
+                (
+                    workout.name,
+                    expression,
+                    self._printer.print(workout),
+                    json.dumps(workout_to_dict(workout), separators=(",", ":")),
+                    json.dumps(GarminSerializer(cache=serialized_steps).serialize(workout), separators=(",", ":")),
+                    int(round(load.duration[index])),
+                    total_distance(workout),
+                    created_at,
+                ),
+                zones,
+            ))
+
+        ids = []
+        with self._lock, self._connection:
+            for row, zones in rows:
+                cursor = self._connection.execute(
+                    "INSERT INTO workouts (name, expression, canonical, tree, payload, duration_secs, "
+                    "distance_meters, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                ids.append(cursor.lastrowid)
+                self._connection.executemany(
+                    "INSERT INTO workout_zones (workout_id, zone, seconds) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, zone, seconds) for zone, seconds in zones],
+                )
+        return ids
+
+    @staticmethod
+    def _match_expression(name: str) -> str:
+        # Quote every term so user input cannot use the FTS5 query syntax, and match on prefixes.
+        terms = [term.replace('"', '""') for term in name.split()]
+        return " ".join(f'"{term}"*' for term in terms)
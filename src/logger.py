@@ -0,0 +1,95 @@
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line, with the time, level, logger and message of the record
+    and the fields passed with log_event.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    # The queue stays in the process, so records keep their exception and fields. Only the message is
+    # merged now, in case its arguments change before the listener formats it.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_previous_level = logging.WARNING
+
+
+def configure_logging(level: str = LOG_LEVEL, handler: Optional[logging.Handler] = None) -> None:
+    """
+    Send the records of the root logger through a queue to a structured handler (stderr by default).
+
+    Logging from a request handler only puts the record on the queue. Formatting and writing happen in
+    the thread of a QueueListener, so a slow stream never blocks the event loop.
+    """
+    global _queue_handler, _listener, _previous_level
+    if _listener is not None:
+        return
+
+    handler = handler if handler else logging.StreamHandler(sys.stderr)
+    if handler.formatter is None:
+        handler.setFormatter(StructuredFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler = _StructuredQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    _previous_level = root.level
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Write the queued records and detach the queue from the root logger.
+    """
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    root.setLevel(_previous_level)
+    _listener.stop()
+    _queue_handler, _listener = None, None
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields) -> None:
+    """
+    Log an event with structured fields, which StructuredFormatter adds to the JSON record.
+    """
+    logger.log(level, event, extra={"fields": {"event": event, **fields}})
@@ -0,0 +1,160 @@
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from types import CodeType, FrameType
+from typing import Dict, Iterable, List, Optional
+
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
+
+from logger import log_event
+from metrics import MetricsRegistry, metrics
+
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.1"))
+EVENT_LOOP_BLOCK_THRESHOLD = float(os.getenv("EVENT_LOOP_BLOCK_THRESHOLD", "0.1"))
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MAX_STACK_FRAMES = 30
+
+logger = logging.getLogger(__name__)
+
+
+def route_callables(routes: Iterable) -> Dict[CodeType, str]:
+    """
+    Map the code of every endpoint and dependency of the routes to a label, such as
+    "POST /v1/workout/parse/create" or "dependency get_workout_parser".
+    """
+    labels: Dict[CodeType, str] = {}
+
+    def visit(dependant: Dependant) -> None:
+        for dependency in dependant.dependencies:
+            # Decorated dependencies share the code of their wrapper, label the function they wrap.
+            call = inspect.unwrap(dependency.call)
+            code = getattr(call, "__code__", None)
+            if code is not None:
+                labels.setdefault(code, f"dependency {call.__qualname__}")
+            visit(dependency)
+
+    for route in routes:
+        if not isinstance(route, APIRoute):
+            continue
+        code = getattr(route.endpoint, "__code__", None)
+        if code is not None:
+            labels[code] = f"{','.join(sorted(route.methods))} {route.path}"
+        visit(route.dependant)
+
+    return labels
+
+
+class EventLoopMonitor:
+    """
+    The EventLoopMonitor measures the lag of the event loop and reports the calls that block it.
+
+    A task on the loop sleeps for interval seconds at a time and records how late it wakes up, which is
+    how long other work kept the loop busy. It also leaves a heartbeat for a watchdog thread: when the
+    heartbeat is older than threshold seconds, the loop is stuck in a blocking call, so the watchdog
+    captures the stack of the loop thread while the call is still running. The innermost endpoint or
+    dependency on that stack is reported as the culprit, with a warning log record and a counter.
+    """
+
+    def __init__(self,
+                 interval: float = EVENT_LOOP_LAG_INTERVAL,
+                 threshold: float = EVENT_LOOP_BLOCK_THRESHOLD,
+                 registry: MetricsRegistry = metrics) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = registry.histogram(
+            "event_loop_lag_seconds", "Delay of the event loop in running a scheduled callback", LAG_BUCKETS
+        )
+        self.blocked = registry.counter(
+            "event_loop_blocked_total", "Calls that blocked the event loop for longer than the threshold"
+        )
+        self._callables: Dict[CodeType, str] = {}
+        self._heartbeat = 0.0
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self, routes: Iterable = ()) -> None:
+        """
+        Start monitoring the running event loop, attributing blocking calls to the given routes.
+        """
+        if self._task is not None:
+            return
+
+        self._callables = route_callables(routes)
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self._watchdog.join)
+        self._task, self._watchdog = None, None
+
+    async def _measure(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.lag.observe(max(0.0, now - expected))
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stopped.wait(min(self.interval, self.threshold) / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            if blocked_for < self.threshold or heartbeat == reported:
+                continue
+
+            # One report per stall: the heartbeat only moves once the loop runs again.
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._report(frame, blocked_for)
+
+    def _report(self, frame: FrameType, blocked_for: float) -> None:
+        culprit = self._culprit(frame)
+        self.blocked.inc(handler=culprit or "unknown")
+        log_event(
+            logger,
+            logging.WARNING,
+            "event_loop_blocked",
+            handler=culprit,
+            blocked_for=round(blocked_for, 3),
+            stack=_format_stack(frame),
+        )
+
+    def _culprit(self, frame: Optional[FrameType]) -> Optional[str]:
+        while frame is not None:
+            label = self._callables.get(frame.f_code)
+            if label is not None:
+                return label
+            frame = frame.f_back
+        return None
+
+
+def _format_stack(frame: FrameType) -> List[str]:
+    stack = traceback.extract_stack(frame)[-MAX_STACK_FRAMES:]
+    return [f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in stack]
+
+
+event_loop_monitor = EventLoopMonitor()
@@ -1,16 +1,30 @@
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from requests import Timeout
 
-from routes import workout_router 
+from deadline import DeadlineExceeded, DeadlineMiddleware
+from garmin.exceptions import GarminPayloadValidationError
+from logger import configure_logging, shutdown_logging
+from loop_monitor import event_loop_monitor
+from metrics import metrics
+from negotiation import NegotiatedResponse, negotiate, response_media_type
+from routes import calendar_router, library_router, workout_router
+from tracing import TracingMiddleware, tracer
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    configure_logging()
     logging.info("Starting up...")
+    event_loop_monitor.start(app.routes)
     yield
+    await event_loop_monitor.stop()
+    tracer.shutdown()
     logging.info("Shutting down...")
+    shutdown_logging()
 
 app = FastAPI(
     title="Garmin Workout API",
@@ -24,6 +38,46 @@ app.include_router(
     workout_router, prefix="/v1/workout", tags=["workout"]
 )
 
+app.include_router(
+    calendar_router, prefix="/v1/calendar", tags=["calendar"]
+)
+
+app.include_router(
+    library_router, prefix="/v1/library", tags=["library"]
+)
+
+@app.exception_handler(DeadlineExceeded)
+@app.exception_handler(Timeout)
+async def deadline_exceeded(request: Request, ex: Exception):
+    return JSONResponse(
+        status_code=504,
+        content={
+            "error": "deadline_exceeded",
+            "message": "Garmin Connect did not answer within the deadline of the request",
+            "detail": str(ex),
+        },
+    )
+
+@app.exception_handler(GarminPayloadValidationError)
+async def invalid_payload(request: Request, ex: GarminPayloadValidationError):
+    # The route has already reset the negotiated media type, negotiate again for the error response.
+    token = response_media_type.set(negotiate(request.headers.get("accept")))
+    try:
+        return NegotiatedResponse(
+            status_code=422,
+            content={
+                "error": "invalid_payload",
+                "message": "The workout would be rejected by Garmin Connect",
+                "errors": [{"path": path, "message": message} for path, message in ex.errors],
+            },
+        )
+    finally:
+        response_media_type.reset(token)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 allowed_origins = [
     "http://localhost",
     "http://localhost:8000",
@@ -38,6 +92,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(DeadlineMiddleware)
+
+app.add_middleware(TracingMiddleware)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -29,6 +29,12 @@ class Duration(Condition[int]):
         self.type = "time"
         self.value = int(duration) * 60
 
+    @staticmethod
+    def from_seconds(seconds: int) -> "Duration":
+        duration = Duration("0")
+        duration.value = int(seconds)
+        return duration
+
 
 class Distance(Condition[float]):
     """
@@ -37,7 +43,7 @@ class Distance(Condition[float]):
     Attributes:
         id (int): The identifier for the distance condition, set to 3.
         type (str): The type of condition, set to "distance".
-        value (float): The distance value in meters, converted from a string input in kilometers.
+        value (float): The distance value in meters, converted from a string input in kilometers or meters.
 
     Args:
         distance (str): The distance of the workout step as a string, which can include a comma or a dot as the decimal separator.
@@ -50,4 +56,10 @@ class Distance(Condition[float]):
         if type == DistanceType.KILOMETERS:
             self.value = float(distance.replace(",", ".")) * 1000
         elif type == DistanceType.METERS:
-            self.value = float(f"0.{distance.replace(',', '')}")
\ No newline at end of file
+            self.value = float(distance.replace(",", "."))
+
+    @staticmethod
+    def from_meters(meters: float) -> "Distance":
+        distance = Distance("0", DistanceType.KILOMETERS)
+        distance.value = float(meters)
+        return distance
\ No newline at end of file
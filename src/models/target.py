@@ -1,5 +1,5 @@
 from abc import ABC
-from typing import List
+from typing import List, Optional
 
 from models.target_type import TargetType
 
@@ -22,10 +22,15 @@ class Target(ABC):
 class HeartRateZoneTarget(Target):
     """
     The HeartRateZoneTarget class represents a target that is based on heart rate zones.
+
+    Attributes:
+        zone (str): The name of the zone the range was taken from, when known, such as "ZE". Zone ranges
+            can differ between requests, so the name is kept rather than looked up from the range.
     """
 
-    def __init__(self, values: List[int]) -> None:
+    def __init__(self, values: List[int], zone: Optional[str] = None) -> None:
         super().__init__(values)
+        self.zone = zone
         self.type = TargetType.HeartRate
         self.unit = "bpm"
 
@@ -37,3 +42,25 @@ class NoTarget(Target):
 
     def __init__(self) -> None:
         self.type = TargetType.NoTarget
+
+
+class PaceTarget(Target):
+    """
+    The PaceTarget class represents a target at the race pace of the athlete over a distance.
+
+    The speed range depends on the athlete, so a parsed workout only knows the race distance. The values
+    are set once resolved, as a [low, high] speed range in meters per second, the way Garmin Connect
+    stores pace targets.
+
+    Attributes:
+        race_distance (float): The race distance in meters whose pace is targeted.
+    """
+
+    def __init__(self, race_distance: float, values: Optional[List[float]] = None) -> None:
+        if values is not None:
+            super().__init__(values)
+        else:
+            self.values = None
+        self.race_distance = float(race_distance)
+        self.type = TargetType.Pace
+        self.unit = "m/s"
@@ -0,0 +1,115 @@
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Dict, Mapping, Optional
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = {MSGPACK, "application/x-msgpack", "application/vnd.msgpack"}
+
+# The media type negotiated for the response of the request being handled.
+response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON)
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Pick the response media type from an Accept header. MessagePack is only used when the client
+    prefers it to JSON, so JSON stays the default for browsers, tools and wildcards.
+    """
+    if not accept:
+        return JSON
+
+    qualities: Dict[str, float] = {}
+    for item in accept.split(","):
+        media_type, _, parameters = item.strip().partition(";")
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.strip().lower()] = quality
+
+    wildcard = max(qualities.get("*/*", 0.0), qualities.get("application/*", 0.0))
+    json_quality = qualities.get(JSON, wildcard)
+    msgpack_quality = max((qualities[t] for t in MSGPACK_TYPES if t in qualities), default=0.0)
+
+    return MSGPACK if msgpack_quality > json_quality else JSON
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.split(";")[0].strip().lower() in MSGPACK_TYPES
+
+
+class MessagePackRequest(Request):
+    """
+    A request whose MessagePack body is presented to FastAPI as already decoded JSON, so request models
+    are validated from the decoded values without a JSON round-trip.
+    """
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), raw=False)
+        return self._json
+
+    @staticmethod
+    def from_request(request: Request) -> "MessagePackRequest":
+        # FastAPI only decodes bodies declared as JSON, so the decoded request declares itself as JSON.
+        headers = [(name, value) for name, value in request.scope["headers"] if name != b"content-type"]
+        headers.append((b"content-type", JSON.encode("latin-1")))
+        return MessagePackRequest({**request.scope, "headers": headers}, request.receive)
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    A JSONResponse rendered as MessagePack when the client asked for it in its Accept header.
+    """
+
+    def __init__(self,
+                 content: Any,
+                 status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None,
+                 media_type: Optional[str] = None,
+                 background=None) -> None:
+        self.negotiated_media_type = response_media_type.get()
+        super().__init__(
+            content,
+            status_code=status_code,
+            headers={**(headers or {}), "Vary": "Accept"},
+            media_type=media_type or self.negotiated_media_type,
+            background=background,
+        )
+
+    def render(self, content: Any) -> bytes:
+        if self.negotiated_media_type == MSGPACK:
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route class adding MessagePack to the endpoints of a router. Request bodies sent with a MessagePack
+    Content-Type are decoded and validated like JSON bodies, and NegotiatedResponse follows the Accept
+    header. Requests that do not mention MessagePack are handled exactly as before.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get("content-type")):
+                request = MessagePackRequest.from_request(request)
+
+            token = response_media_type.set(negotiate(request.headers.get("accept")))
+            try:
+                return await handler(request)
+            finally:
+                response_media_type.reset(token)
+
+        return negotiated_handler
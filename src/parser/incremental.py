@@ -0,0 +1,254 @@
+import copy
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from models.condition import Distance, Duration
+from models.step import RepeatedStep, Step
+from models.step_type import StepType
+from models.workout import Workout
+from parser.runfun_parser import RunFunParser
+
+
+class ParsedSegment:
+    """
+    One top-level step of an expression, parsed independently of its position.
+
+    Attributes:
+        text (str): The source text of the segment, between two top-level "+".
+        normalized (str): The text with heart rate zones normalized as in workout names.
+        step: The parsed step, or None if the segment has an error.
+        error (str): The error message, if the segment could not be parsed.
+        duration (float): Seconds of the time-based steps, repeats included.
+        distance (float): Meters of the distance-based steps, repeats included.
+    """
+
+    def __init__(self,
+                 text: str,
+                 normalized: str,
+                 step: Optional[Union[Step, RepeatedStep]] = None,
+                 error: Optional[str] = None,
+                 duration: float = 0.0,
+                 distance: float = 0.0) -> None:
+        self.text = text
+        self.normalized = normalized
+        self.step = step
+        self.error = error
+        self.duration = duration
+        self.distance = distance
+
+
+# (offset in the expression, segment)
+Span = Tuple[int, ParsedSegment]
+
+
+class IncrementalParseResult:
+    """
+    The outcome of parsing one version of an expression in a session.
+    """
+
+    def __init__(self, workout: Workout, segments: List[Span], reused: int, default_pace: float) -> None:
+        self.workout = workout
+        self.segments = segments
+        self.reused = reused
+        self.default_pace = default_pace
+
+    @property
+    def errors(self) -> List[dict]:
+        errors = []
+        for offset, segment in self.segments:
+            if segment.error is not None:
+                start, end = _stripped_span(offset, segment)
+                errors.append({"start": start, "end": end, "message": segment.error})
+        return errors
+
+    def estimates(self) -> dict:
+        """
+        Return the time and distance of the valid steps. Distance steps are converted to time, and time
+        steps to distance, with the default pace so both totals cover the whole workout.
+        """
+        duration = sum(segment.duration for _, segment in self.segments)
+        distance = sum(segment.distance for _, segment in self.segments)
+        return {
+            "duration_in_secs": duration,
+            "distance_in_meters": distance,
+            "estimated_duration_in_secs": duration + distance * self.default_pace / 1000,
+            "estimated_distance_in_meters": distance + duration * 1000 / self.default_pace,
+        }
+
+    def timeline(self) -> List[dict]:
+        """
+        Return the span of each valid step with the estimated elapsed time and distance at its end.
+        """
+        elapsed, covered, steps = 0.0, 0.0, []
+        for offset, segment in self.segments:
+            if segment.step is None:
+                continue
+            elapsed += segment.duration + segment.distance * self.default_pace / 1000
+            covered += segment.distance + segment.duration * 1000 / self.default_pace
+            start, end = _stripped_span(offset, segment)
+            steps.append({"start": start, "end": end, "elapsed_secs": elapsed, "elapsed_meters": covered})
+        return steps
+
+
+class IncrementalParser:
+    """
+    The IncrementalParser parses successive versions of a RunFun expression, as typed in an editor.
+
+    An expression is a list of top-level steps separated by "+". Each step is parsed on its own, without
+    its step type, which only depends on its position and is set when the workout is assembled. Steps of
+    the unchanged prefix of the previous version are reused as they are, and edited or moved steps are
+    looked up by text before being parsed, so an edit only parses the steps it touched.
+
+    Unlike RunFunParser.parse, which skips text it does not recognize, every segment must be a single
+    step. Invalid segments are reported as error spans and left out of the partial workout.
+    """
+
+    # Splits on "+" outside parentheses. An unclosed parenthesis runs to the end of the expression.
+    PATTERN_SEGMENT = re.compile(r"(?:[^+(]+|\([^)]*\)?)+|(?<=\+)(?=\+|$)|^(?=\+)")
+
+    MAX_MEMO_ENTRIES = 512
+
+    def __init__(self, parser: Optional[RunFunParser] = None, default_pace: float = 300.0) -> None:
+        self.parser = parser if parser else RunFunParser()
+        self.default_pace = default_pace
+        self.expression = ""
+        self._segments: List[Span] = []
+        self._memo: Dict[str, ParsedSegment] = {}
+        self._lock = threading.Lock()
+
+    def update(self, expression: str, parser: Optional[RunFunParser] = None) -> IncrementalParseResult:
+        """
+        Parse the new text of the expression. A parser given with other zones than the one of the session
+        replaces it.
+        """
+        with self._lock:
+            if parser is not None and parser.zones != self.parser.zones:
+                # Parsed steps hold the heart rates of their zone, they are stale once zones change.
+                self.parser = parser
+                self._memo.clear()
+                self._segments = []
+
+            previous = self._segments
+            segments: List[Span] = []
+            reused = 0
+
+            for match in self.PATTERN_SEGMENT.finditer(expression):
+                text, start = match.group(), match.start()
+                if reused == len(segments) < len(previous) and previous[reused][0] == start \
+                        and previous[reused][1].text == text:
+                    segments.append(previous[reused])
+                    reused += 1
+                    continue
+
+                segment = self._memo.get(text)
+                if segment is None:
+                    segment = self._parse_segment(text)
+                    if len(self._memo) >= self.MAX_MEMO_ENTRIES:
+                        self._memo.clear()
+                    self._memo[text] = segment
+                segments.append((start, segment))
+
+            self.expression = expression
+            self._segments = segments
+
+        return IncrementalParseResult(self._assemble(segments), segments, reused, self.default_pace)
+
+    def _assemble(self, segments: List[Span]) -> Workout:
+        # Segments cover the expression between the top-level "+", so joining them gives the same name
+        # as normalizing the whole expression.
+        workout = Workout("+".join(segment.normalized for _, segment in segments))
+        workout.steps = [segment.step for _, segment in segments if segment.step is not None]
+
+        # Cached steps are parsed as intervals, which is the type of every step but the first and last.
+        last = len(workout.steps) - 1
+        for position in {0, last} if last >= 0 else ():
+            step = workout.steps[position]
+            if isinstance(step, Step):
+                step = workout.steps[position] = copy.copy(step)
+                step.step_type = self.parser.get_step_type(position, last + 1)
+
+        return workout
+
+    def _parse_segment(self, text: str) -> ParsedSegment:
+        normalized = self.parser.normalize_heart_rate_zones(text)
+        token = normalized.replace(" ", "")
+        if not token.strip():
+            return ParsedSegment(text, normalized, error="Expected a step")
+        if not re.fullmatch(self.parser.PATTERN_TOKEN, token):
+            return ParsedSegment(text, normalized, error=f"The step '{text.strip()}' could not be recognized")
+
+        try:
+            step = self.parser._parse_single_token(token, StepType.Interval)
+        except ValueError as ex:
+            return ParsedSegment(text, normalized, error=str(ex))
+
+        duration, distance = _measure(step)
+        return ParsedSegment(text, normalized, step=step, duration=duration, distance=distance)
+
+
+class IncrementalParseSessions:
+    """
+    Thread-safe registry of incremental parsing sessions. The least recently used sessions are dropped
+    when there are more than max_sessions, and sessions idle for longer than ttl seconds expire.
+    """
+
+    def __init__(self, max_sessions: int = 1024, ttl: float = 900) -> None:
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[IncrementalParser, float]]" = OrderedDict()
+
+    def get(self, session_id: Optional[str] = None) -> Tuple[str, IncrementalParser]:
+        """
+        Return the session with the given ID, or a new session if it does not exist or has expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id) if session_id else None
+            if entry is None:
+                session_id = uuid.uuid4().hex
+                entry = (IncrementalParser(), now)
+
+            self._sessions[session_id] = (entry[0], now)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session_id, entry[0]
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.ttl:
+                return
+            del self._sessions[session_id]
+
+
+def _measure(step: Union[Step, RepeatedStep]) -> Tuple[float, float]:
+    if isinstance(step, RepeatedStep):
+        inner = [_measure(s) for s in step.steps]
+        return (
+            step.iterations * sum(duration for duration, _ in inner),
+            step.iterations * sum(distance for _, distance in inner),
+        )
+    if isinstance(step.condition, Duration):
+        return float(step.condition.value), 0.0
+    if isinstance(step.condition, Distance):
+        return 0.0, float(step.condition.value)
+    return 0.0, 0.0
+
+
+def _stripped_span(offset: int, segment: ParsedSegment) -> Tuple[int, int]:
+    leading = len(segment.text) - len(segment.text.lstrip())
+    trailing = len(segment.text.rstrip())
+    if trailing <= leading:
+        return offset, offset + len(segment.text)
+    return offset + leading, offset + trailing
@@ -1,13 +1,14 @@
 import re
-from typing import List, Union
+from typing import List, Mapping, Optional, Sequence, Union
 
 from models.condition import Distance, Duration
 from models.distance_type import DistanceType
 from models.sport_type import SportType
 from models.step import RepeatedStep, Step, StepType
-from models.target import HeartRateZoneTarget
+from models.target import HeartRateZoneTarget, PaceTarget
 from parser.parser import Parser
 from models.workout import Workout
+from tracing import traced
 
 from enum import Enum
 from typing import Dict, List, Tuple
@@ -55,14 +56,31 @@ class HeartRateZoneConfig:
 class RunFunParser(Parser):
     """
     The RunFunParser class is a concrete implementation of the Parser interface for advisor RunFun.
+
+    Heart rate zones use the ranges of HeartRateZoneConfig, except for the zones given by name in zones,
+    such as {"ZE": (185, 195)}.
     """
 
-    PATTERN_TOKEN = r"\d+x\([^\)]+\)|\d+(?:,\d+)?km(?:ritmodeprova\d+km)?|\d+\'[a-zA-Z]+"
-    PATTERN_DISTANCE = r"(\d+(?:,\d+)?)(km|m)\s*(?:ritmo\s*de\s*prova\s*(\d+)(km|m))?"
+    PATTERN_TOKEN = r"\d+x\([^\)]+\)|\d+(?:,\d+)?km(?:ritmodeprova\d+(?:,\d+)?k?m)?|\d+\'[a-zA-Z]+"
+    PATTERN_DISTANCE = r"(\d+(?:,\d+)?)(km|m)\s*(?:ritmo\s*de\s*prova\s*(\d+(?:,\d+)?)(km|m))?"
     PATTERN_DURATION = r"(\d+)'([a-zA-Z]+)"
     PATTERN_REPEAT = r"(\d+)x\(([^\)]+)\)"
     PATTERN_HEART_RATE_ZONE = r"\b(zr|zm|zs|ze|zt)\b"
 
+    # Names and descriptions of the steps, formatted with the text of the token they are parsed from.
+    FORMAT_DISTANCE_NAME = "{distance}{unit}"
+    FORMAT_DISTANCE_DESCRIPTION = "Run {distance} {unit}"
+    FORMAT_RACE_PACE_NAME = "{distance}{unit} ritmo de prova {race}{race_unit}"
+    FORMAT_RACE_PACE_DESCRIPTION = "Run {distance} {unit} at {race} {race_unit} race pace"
+    FORMAT_DURATION_NAME = "{duration}' {zone}"
+    FORMAT_DURATION_DESCRIPTION = "Run for {duration} minutes in {zone} zone"
+
+    def __init__(self, zones: Optional[Mapping[str, Sequence[int]]] = None) -> None:
+        self.zones: Dict[HeartRateZone, Tuple[int, int]] = dict(HeartRateZoneConfig.ZONES)
+        for zone, values in (zones or {}).items():
+            self.zones[HeartRateZone[zone.upper()]] = (values[0], values[1])
+
+    @traced("parse")
     def parse(self, value: str) -> Workout:
         value = self.normalize_heart_rate_zones(value)
         workout = Workout(value)
@@ -104,21 +122,33 @@ class RunFunParser(Parser):
 
     def _create_distance_step(self, token: str, step_type: StepType) -> Step:
         m = re.match(self.PATTERN_DISTANCE, token)
-        distance, unit = m.groups()[:2]
+        distance, unit, race, race_unit = m.groups()
         
-        distance_type = {
+        distance_types = {
             "km": DistanceType.KILOMETERS,
             "m": DistanceType.METERS
-        }.get(unit, None)
+        }
+        distance_type = distance_types.get(unit, None)
 
         if not distance_type:
             raise ValueError(f"Invalid unit: {unit}")
 
+        if race is None:
+            return Step(
+                step_name=self.FORMAT_DISTANCE_NAME.format(distance=distance, unit=unit),
+                description=self.FORMAT_DISTANCE_DESCRIPTION.format(distance=distance, unit=unit),
+                condition=Distance(distance, distance_type),
+                step_type=step_type
+            )
+
+        # "1km ritmo de prova 10km": run the distance at the race pace of the athlete over 10km.
+        fields = {"distance": distance, "unit": unit, "race": race, "race_unit": race_unit}
         return Step(
-            step_name=f"{distance}{unit}",
-            description=f"Run {distance} {unit}",
+            step_name=self.FORMAT_RACE_PACE_NAME.format(**fields),
+            description=self.FORMAT_RACE_PACE_DESCRIPTION.format(**fields),
             condition=Distance(distance, distance_type),
-            step_type=step_type
+            step_type=step_type,
+            target=PaceTarget(Distance(race, distance_types[race_unit]).value)
         )
 
     def _create_duration_step(self, token: str, step_type: StepType) -> Step:
@@ -129,11 +159,11 @@ class RunFunParser(Parser):
             raise ValueError(f"Invalid heart rate zone: {zone}")
 
         return Step(
-            step_name=f"{duration}' {zone}",
-            description=f"Run for {duration} minutes in {zone} zone",
+            step_name=self.FORMAT_DURATION_NAME.format(duration=duration, zone=zone),
+            description=self.FORMAT_DURATION_DESCRIPTION.format(duration=duration, zone=zone),
             condition=Duration(duration),
             step_type=step_type,
-            target=HeartRateZoneTarget(HeartRateZoneConfig.get_zone_range(zone.upper()))
+            target=HeartRateZoneTarget(self.zones[HeartRateZone[zone.upper()]], zone.upper())
         )
 
     def _create_repeated_step(self, token: str) -> RepeatedStep:
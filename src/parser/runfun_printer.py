@@ -0,0 +1,62 @@
+from typing import Dict, Tuple, Union
+
+from models.condition import Distance, Duration
+from models.step import RepeatedStep, Step
+from models.target import HeartRateZoneTarget, PaceTarget
+from models.workout import Workout
+from parser.runfun_parser import HeartRateZone, HeartRateZoneConfig
+
+
+class RunFunPrinter:
+    """
+    The RunFunPrinter renders a Workout object back into a RunFun expression.
+
+    The output is canonical: the same workout always prints the same way, with single spaces around
+    "+" and lowercase zones, so it can be used to compare or index workouts written differently.
+    Printing the result of RunFunParser.parse and parsing it again yields the same steps.
+    """
+
+    def print(self, workout: Workout) -> str:
+        zones = self._zones()
+        return " + ".join(self._print_step(step, zones) for step in workout.steps)
+
+    def _print_step(self, step: Union[Step, RepeatedStep], zones: Dict[Tuple[int, int], HeartRateZone]) -> str:
+        if isinstance(step, RepeatedStep):
+            inner = " + ".join(self._print_step(s, zones) for s in step.steps)
+            return f"{step.iterations}x ({inner})"
+
+        if isinstance(step.condition, Duration):
+            if step.condition.value % 60:
+                raise ValueError(f"Duration of {step.condition.value} seconds is not a whole number of minutes")
+            return f"{step.condition.value // 60}' {self._print_zone(step, zones)}"
+
+        if isinstance(step.condition, Distance):
+            if isinstance(step.target, PaceTarget):
+                race = self._print_distance(step.target.race_distance)
+                return f"{self._print_distance(step.condition.value)} ritmo de prova {race}"
+            return self._print_distance(step.condition.value)
+
+        raise ValueError(f"Step {step.step_name} has no end condition supported by RunFun")
+
+    @staticmethod
+    def _print_zone(step: Step, zones: Dict[Tuple[int, int], HeartRateZone]) -> str:
+        if not isinstance(step.target, HeartRateZoneTarget):
+            raise ValueError(f"Step {step.step_name} has no heart rate zone")
+
+        if step.target.zone is not None:
+            return step.target.zone.lower()
+        zone = zones.get(tuple(step.target.values))
+        if zone is None:
+            raise ValueError(f"Heart rate range {step.target.values} does not match any zone")
+        return zone.value.lower()
+
+    @staticmethod
+    def _print_distance(meters: float) -> str:
+        if meters < 1000:
+            return f"{meters:g}m"
+        kilometers = f"{meters / 1000:g}".replace(".", ",")
+        return f"{kilometers}km"
+
+    @staticmethod
+    def _zones() -> Dict[Tuple[int, int], HeartRateZone]:
+        return {tuple(values): zone for zone, values in HeartRateZoneConfig.ZONES.items()}
@@ -0,0 +1,347 @@
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from garmin.serializer import GarminSerializer, calculate_estimated_duration
+from models.condition import Condition, Distance, Duration
+from models.distance_type import DistanceType
+from models.step import RepeatedStep, Step, StepType
+from models.target import Target
+from models.workout import Workout
+from parser.runfun_parser import HeartRateZone, HeartRateZoneConfig, RunFunParser
+
+
+Number = Union[int, float]
+
+PATTERN_PARAMETER = r"\{([a-zA-Z_][a-zA-Z0-9_]*)\}"
+
+
+def _with_parameters(pattern: str) -> str:
+    """
+    Return a pattern of the RunFun grammar where every number may also be a {name} placeholder.
+    """
+    number = r"(?:\d+(?:,\d+)?|\{[a-zA-Z_][a-zA-Z0-9_]*\})"
+    return re.sub(r"\\d\+(?:\(\?:,\\d\+\)\?)?", lambda _: number, pattern)
+
+
+def _format(text: str) -> str:
+    """
+    Return a text with {name} placeholders as a format string whose only fields are the placeholders.
+    """
+    parts = re.split(PATTERN_PARAMETER, text)
+    return "".join(
+        f"{{{part}}}" if index % 2 else part.replace("{", "{{").replace("}", "}}")
+        for index, part in enumerate(parts)
+    )
+
+
+class TemplateStep:
+    """
+    A step of a compiled template: its token, with placeholders, and what its parameters change.
+
+    Steps without parameters are parsed and serialized once, when the template is compiled. A step with
+    a parameter keeps its target and serialized payload, and an instance only writes the value of the
+    parameter into a copy: the condition and its endConditionValue, the name and the description. A
+    repeat keeps its inner steps and writes its numberOfIterations.
+
+    Attributes:
+        token (str): The token of the step in the normalized template, such as "{rep}'ze".
+        step_type (StepType): The type the parser gives the step at its position.
+        bindings (Dict[str, str]): The kind of each parameter of the token itself: "minutes",
+            "kilometers", "meters" or "count".
+        inner (List[TemplateStep]): The steps of a repeat, None for other steps.
+        step (Step): The parsed step when neither the token nor its inner steps have parameters.
+        payload (dict): The serialized step, shared by instances when the step has no parameters.
+        duration (int): The estimated duration of a step without parameters.
+        written (Dict[str, Tuple]): The endConditionValue and description of the step by the text of
+            its parameter, so the condition is built once per value.
+    """
+
+    def __init__(self,
+                 token: str,
+                 step_type: StepType,
+                 bindings: Dict[str, str],
+                 inner: Optional[List["TemplateStep"]] = None,
+                 step: Optional[Union[Step, RepeatedStep]] = None) -> None:
+        self.token = token
+        self.step_type = step_type
+        self.bindings = bindings
+        self.inner = inner
+        self.step = step
+        self.payload: Optional[dict] = None
+        self.duration: Number = 0
+
+        # The number of the step, its parameter or literal text, and what it is written into.
+        self.number: Optional[str] = None
+        self.parameter: Optional[str] = None
+        self.condition: Optional[Callable[[str], Condition]] = None
+        self.target: Optional[Target] = None
+        self.name = ""
+        self.description = ""
+        self.written: Dict[str, Tuple[Number, str]] = {}
+
+
+class WorkoutTemplate:
+    """
+    The WorkoutTemplate compiles a parameterized RunFun expression once and instantiates it many times.
+
+    Parameters are written as {name} wherever the expression expects a number, for example
+    "{warm}' zr + {n}x ({rep}' ze + {rec}' zr) + {cool}' zr". To compile, the expression is split into
+    steps with the token patterns of RunFunParser, where a placeholder may stand for any number, and the
+    kind of each parameter is read from where it is written: before ' it is minutes, before km or m a
+    distance, before x a repeat count. Every step is then built and serialized once. An instance copies
+    the steps with parameters and writes the values into them, without parsing or serializing.
+
+    Steps without parameters, and the constant parts of the payload, are shared between instances and
+    must not be modified. The top-level payload dict and the workout are always new.
+    """
+
+    PATTERN_PARAMETER = PATTERN_PARAMETER
+
+    # Values written into a step, kept by the text of its parameter.
+    MAX_WRITTEN_VALUES = 1024
+
+    def __init__(self, expression: str, parser: Optional[RunFunParser] = None) -> None:
+        self.parser = parser if parser else RunFunParser()
+        self.expression = expression
+        self.parameters: List[str] = list(dict.fromkeys(re.findall(PATTERN_PARAMETER, expression)))
+        self.kinds: Dict[str, str] = {}
+
+        zones = [name for name in self.parameters if name.upper() in HeartRateZone.__members__]
+        if zones:
+            raise ValueError(f"Template parameters {zones} are named like heart rate zones")
+
+        self._token = re.compile(_with_parameters(self.parser.PATTERN_TOKEN))
+        self._distance = re.compile(_with_parameters(self.parser.PATTERN_DISTANCE))
+        self._duration = re.compile(_with_parameters(self.parser.PATTERN_DURATION))
+        self._repeat = re.compile(_with_parameters(self.parser.PATTERN_REPEAT))
+
+        # The name of a parsed workout is its normalized expression.
+        normalized = self.parser.normalize_heart_rate_zones(expression)
+        self._name = _format(normalized)
+        self._steps = self._compile_tokens(self._token.findall(normalized.replace(" ", "")), False)
+
+        unbound = [name for name in self.parameters if name not in self.kinds]
+        if unbound:
+            raise ValueError(f"Template parameters {unbound} must stand for a duration, distance or repeat count")
+        self._kilometers = [(name, self.kinds[name] == "kilometers") for name in self.parameters]
+
+        # Serialize one instance, whose steps give the payload of every step at its step order.
+        payload = GarminSerializer().serialize(self.instantiate({name: 1 for name in self.parameters}))
+        segment = payload["workoutSegments"][0]
+        for template, step_payload in zip(self._steps, segment["workoutSteps"]):
+            self._attach_payload(template, step_payload)
+        self._payload = payload
+        self._segment = segment
+
+    def instantiate_payload(self, parameters: Dict[str, Number]) -> dict:
+        """
+        Build the Garmin Connect payload of the template for the given parameters.
+        """
+        texts = self._texts(parameters)
+        steps, duration = self._build_payloads(self._steps, texts)
+
+        segment = dict(self._segment)
+        segment["workoutSteps"] = steps
+        payload = dict(self._payload)
+        payload["workoutName"] = self._name.format_map(texts)
+        payload["workoutSegments"] = [segment]
+        payload["estimatedDurationInSecs"] = duration
+        return payload
+
+    def instantiate(self, parameters: Dict[str, Number]) -> Workout:
+        """
+        Build the Workout of the template for the given parameters.
+        """
+        texts = self._texts(parameters)
+        workout = Workout(self._name.format_map(texts))
+        for step in self._steps:
+            workout.add_step(self._build(step, texts))
+        return workout
+
+    def _compile_tokens(self, tokens: List[str], repeated: bool) -> List[TemplateStep]:
+        return [
+            self._compile_token(token, self.parser.get_step_type(position, len(tokens), repeated))
+            for position, token in enumerate(tokens)
+        ]
+
+    def _compile_token(self, token: str, step_type: StepType) -> TemplateStep:
+        bindings: Dict[str, str] = {}
+        inner = None
+        formats: Tuple[str, str] = ("", "")
+        fields: Dict[str, str] = {}
+        condition = None
+
+        distance = self._distance.match(token)
+        duration = self._duration.match(token)
+        repeat = self._repeat.match(token)
+        if distance:
+            number, unit, race, race_unit = distance.groups()
+            if _parameter(race):
+                raise ValueError(f"Template parameter {_parameter(race)} cannot be a race distance")
+            self._bind(bindings, number, "kilometers" if unit == "km" else "meters")
+            fields = {"distance": number, "unit": unit, "race": race, "race_unit": race_unit}
+            if race is None:
+                formats = (self.parser.FORMAT_DISTANCE_NAME, self.parser.FORMAT_DISTANCE_DESCRIPTION)
+            else:
+                formats = (self.parser.FORMAT_RACE_PACE_NAME, self.parser.FORMAT_RACE_PACE_DESCRIPTION)
+            distance_type = DistanceType.KILOMETERS if unit == "km" else DistanceType.METERS
+            condition = lambda text: Distance(text, distance_type)  # noqa: E731
+        elif duration:
+            number = duration.group(1)
+            self._bind(bindings, number, "minutes")
+            fields = {"duration": number, "zone": duration.group(2)}
+            formats = (self.parser.FORMAT_DURATION_NAME, self.parser.FORMAT_DURATION_DESCRIPTION)
+            condition = Duration
+        elif repeat:
+            number = repeat.group(1)
+            self._bind(bindings, number, "count")
+            inner = self._compile_tokens(re.split(r"\s*\+\s*", repeat.group(2)), True)
+        else:
+            number = None
+
+        if re.search(PATTERN_PARAMETER, token) is None:
+            return TemplateStep(token, step_type, bindings, inner, self.parser._parse_single_token(token, step_type))
+
+        template = TemplateStep(token, step_type, bindings, inner)
+        template.number = number
+        template.parameter = _parameter(number)
+        if inner is None:
+            # The target does not depend on the number, take it from the step parsed with a probe value.
+            probe = self.parser._parse_single_token(self._fill(token, {name: "1" for name in bindings}), step_type)
+            template.target = probe.target
+            template.condition = condition
+            template.name = _format(formats[0].format(**fields))
+            template.description = _format(formats[1].format(**fields))
+        return template
+
+    def _bind(self, bindings: Dict[str, str], number: str, kind: str) -> None:
+        name = _parameter(number)
+        if name is None:
+            return
+        if self.kinds.setdefault(name, kind) != kind:
+            raise ValueError(f"Template parameter {name} stands for both {self.kinds[name]} and {kind}")
+        bindings[name] = kind
+
+    def _attach_payload(self, template: TemplateStep, payload: dict) -> None:
+        template.payload = payload
+        if template.step is not None:
+            template.duration = calculate_estimated_duration([{"workoutSteps": [payload]}])
+        elif template.inner is not None:
+            for inner, inner_payload in zip(template.inner, payload["workoutSteps"]):
+                self._attach_payload(inner, inner_payload)
+
+    def _build(self, template: TemplateStep, texts: Dict[str, str]) -> Union[Step, RepeatedStep]:
+        if template.step is not None:
+            return template.step
+        if template.inner is None:
+            return Step(
+                step_name=template.name.format_map(texts),
+                description=template.description.format_map(texts),
+                step_type=template.step_type,
+                target=template.target,
+                condition=template.condition(texts[template.parameter]),
+            )
+        return RepeatedStep(
+            iterations=self._iterations(template, texts),
+            steps=[self._build(step, texts) for step in template.inner],
+        )
+
+    def _build_payloads(self, templates: List[TemplateStep], texts: Dict[str, str]) -> Tuple[List[dict], Number]:
+        """
+        Return the payloads of steps for the given parameters and their estimated duration, summed the
+        way calculate_estimated_duration sums it.
+        """
+        payloads = []
+        duration = 0
+        for template in templates:
+            if template.step is not None:
+                payloads.append(template.payload)
+                duration += template.duration
+                continue
+
+            payload = dict(template.payload)
+            if template.inner is None:
+                text = texts[template.parameter]
+                value, description = template.written.get(text) or self._write(template, text)
+                payload["endConditionValue"] = value
+                payload["description"] = description
+                duration += value
+            else:
+                steps, inner_duration = self._build_payloads(template.inner, texts)
+                iterations = int(texts[template.parameter]) if template.parameter else int(template.number)
+                payload["numberOfIterations"] = iterations
+                payload["workoutSteps"] = steps
+                duration += iterations * inner_duration
+            payloads.append(payload)
+        return payloads, duration
+
+    def _write(self, template: TemplateStep, text: str) -> Tuple[Number, str]:
+        """
+        Return the endConditionValue and description of a step with its parameter written as text.
+        """
+        if len(template.written) >= self.MAX_WRITTEN_VALUES:
+            template.written.clear()
+        written = template.written[text] = (
+            template.condition(text).value,
+            template.description.format_map({template.parameter: text}),
+        )
+        return written
+
+    @staticmethod
+    def _iterations(template: TemplateStep, texts: Dict[str, str]) -> int:
+        return int(texts[template.parameter] if template.parameter else template.number)
+
+    def _texts(self, parameters: Dict[str, Number]) -> Dict[str, str]:
+        """
+        Check the values of the parameters and return how each is written in a RunFun expression.
+        """
+        texts = {}
+        for name, kilometers in self._kilometers:
+            try:
+                value = parameters[name]
+            except KeyError:
+                raise ValueError(f"Missing template parameter: {name!r}") from None
+            if kilometers:
+                # Kilometers are written with a decimal comma.
+                texts[name] = f"{_number(name, value):g}".replace(".", ",")
+            elif value.__class__ is int and value > 0:
+                texts[name] = str(value)
+            else:
+                texts[name] = str(_whole(name, value))
+        return texts
+
+    @staticmethod
+    def _fill(text: str, texts: Dict[str, str]) -> str:
+        return re.sub(PATTERN_PARAMETER, lambda m: texts[m.group(1)], text)
+
+
+def _parameter(number: Optional[str]) -> Optional[str]:
+    match = re.fullmatch(PATTERN_PARAMETER, number) if number else None
+    return match.group(1) if match else None
+
+
+def _number(name: str, value) -> Number:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(f"Template parameter {name} must be a positive number")
+    return value
+
+
+def _whole(name: str, value) -> int:
+    value = _number(name, value)
+    if value != int(value):
+        raise ValueError(f"Template parameter {name} must be a whole number")
+    return int(value)
+
+
+def compile_template(expression: str, parser: Optional[RunFunParser] = None) -> WorkoutTemplate:
+    """
+    Compile a template once and reuse it for every later call with the same expression and zones.
+    """
+    zones = parser.zones if parser else HeartRateZoneConfig.ZONES
+    return _compile_template(expression, tuple(sorted((zone.value, values) for zone, values in zones.items())))
+
+
+@lru_cache(maxsize=256)
+def _compile_template(expression: str, zones: Tuple[Tuple[str, Tuple[int, int]], ...]) -> WorkoutTemplate:
+    return WorkoutTemplate(expression, RunFunParser(zones=dict(zones)))
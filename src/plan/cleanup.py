@@ -0,0 +1,90 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List, Optional
+
+from garmin.concurrency import iter_concurrently
+from garmin.connect import GarminConnectClient
+
+
+logger = logging.getLogger(__name__)
+
+
+def _created_date(workout: dict) -> Optional[datetime]:
+    created = workout.get("createdDate")
+    if not created:
+        return None
+    # Garmin Connect sends e.g. 2024-10-10T12:34:56.0, keep the part every Python version can parse.
+    return datetime.fromisoformat(created[:19])
+
+
+def resolve_workouts(
+    client: GarminConnectClient,
+    workout_ids: Optional[List[int]] = None,
+    name_prefix: Optional[str] = None,
+    created_before: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Find the workouts matching every given criterion. At least one criterion is required so a request
+    can never match a whole account by accident. When only IDs are given they are used as they are,
+    without listing the account.
+    """
+    if not workout_ids and not name_prefix and created_before is None:
+        raise ValueError("Workout IDs, a name prefix or a creation date is required")
+
+    if workout_ids and not name_prefix and created_before is None:
+        return [{"workoutId": workout_id} for workout_id in dict.fromkeys(workout_ids)]
+
+    if created_before is not None and created_before.tzinfo is not None:
+        created_before = created_before.astimezone(timezone.utc).replace(tzinfo=None)
+
+    ids = set(workout_ids or [])
+    matches = []
+    for workout in client.iter_workouts():
+        if ids and workout.get("workoutId") not in ids:
+            continue
+        if name_prefix and not (workout.get("workoutName") or "").startswith(name_prefix):
+            continue
+        if created_before is not None:
+            created = _created_date(workout)
+            if created is None or created >= created_before:
+                continue
+        matches.append(workout)
+    return matches
+
+
+def describe(workout: dict) -> dict:
+    return {
+        "workout_id": workout["workoutId"],
+        "workout_name": workout.get("workoutName"),
+        "created_date": workout.get("createdDate"),
+    }
+
+
+async def delete_workouts(
+    client: GarminConnectClient,
+    workouts: Iterable[dict],
+    limit: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Delete workouts concurrently and yield one NDJSON progress line per deletion as it completes,
+    followed by a summary line.
+    """
+    workouts = list(workouts)
+    total = len(workouts)
+    deleted = failed = 0
+
+    calls = [lambda workout_id=w["workoutId"]: client.delete_workout(workout_id) for w in workouts]
+    async for index, result in iter_concurrently(calls, limit):
+        event = {**describe(workouts[index]), "done": deleted + failed + 1, "total": total}
+        if isinstance(result, Exception):
+            failed += 1
+            event.update({"status": "failed", "error": str(result)})
+        else:
+            deleted += 1
+            event["status"] = "deleted"
+
+        logger.info("Deleted %s of %s workouts (%s failed)", deleted, total, failed)
+        yield json.dumps(event) + "\n"
+
+    yield json.dumps({"summary": {"total": total, "deleted": deleted, "failed": failed}}) + "\n"
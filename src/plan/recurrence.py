@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from typing import List, Optional
+
+
+MAX_OCCURRENCES = 366
+
+
+def expand_recurrence(start: date,
+                      frequency: str = "weekly",
+                      interval: int = 1,
+                      weekdays: Optional[List[int]] = None,
+                      until: Optional[date] = None,
+                      count: Optional[int] = None) -> List[date]:
+    """
+    Expand a recurrence rule into the list of dates it produces, in the spirit of an iCalendar RRULE.
+
+    Args:
+        start (date): First date the rule can produce.
+        frequency (str): "daily" or "weekly".
+        interval (int): Number of days or weeks between occurrences.
+        weekdays (List[int]): For weekly rules, the days of the week to use, 0 being Monday.
+            Defaults to the weekday of the start date.
+        until (date): Last date the rule can produce, inclusive.
+        count (int): Maximum number of dates to produce.
+
+    At least one of until and count is required, and no rule can produce more than MAX_OCCURRENCES dates.
+    """
+    if frequency not in ("daily", "weekly"):
+        raise ValueError(f"Unsupported recurrence frequency: {frequency}")
+    if interval < 1:
+        raise ValueError("Recurrence interval must be positive")
+    if until is None and count is None:
+        raise ValueError("Recurrence needs an end date or a number of occurrences")
+    if count is not None and count < 1:
+        raise ValueError("Recurrence count must be positive")
+    if count is not None and count > MAX_OCCURRENCES:
+        raise ValueError(f"Recurrence count cannot be more than {MAX_OCCURRENCES}")
+    if weekdays is not None and any(day not in range(7) for day in weekdays):
+        raise ValueError("Weekdays must be between 0 (Monday) and 6 (Sunday)")
+
+    limit = count if count is not None else MAX_OCCURRENCES
+    dates = []
+
+    if frequency == "daily":
+        current = start
+        while len(dates) < limit and (until is None or current <= until):
+            dates.append(current)
+            current += timedelta(days=interval)
+    else:
+        days = sorted(set(weekdays)) if weekdays else [start.weekday()]
+        week = start - timedelta(days=start.weekday())
+        while len(dates) < limit and (until is None or week <= until):
+            for day in days:
+                current = week + timedelta(days=day)
+                if current < start or (until is not None and current > until):
+                    continue
+                dates.append(current)
+                if len(dates) == limit:
+                    break
+            week += timedelta(weeks=interval)
+
+    if until is not None and count is None and len(dates) == MAX_OCCURRENCES and dates[-1] < until:
+        raise ValueError(f"Recurrence produces more than {MAX_OCCURRENCES} dates")
+
+    return dates
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import date, timedelta
+from typing import List, Optional
+
+from garmin.concurrency import run_concurrently
+from garmin.connect import GarminConnectClient
+
+
+async def schedule_dates(
+    client: GarminConnectClient,
+    workout_id: int,
+    dates: List[date],
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """
+    Schedule one workout on many dates concurrently and report the outcome of each date.
+    """
+    results = await run_concurrently(
+        [lambda day=day: client.schedule_workout(workout_id, day) for day in dates],
+        limit,
+    )
+
+    outcomes = []
+    for day, result in zip(dates, results):
+        if isinstance(result, Exception):
+            outcomes.append({"date": day.isoformat(), "status": "failed", "error": str(result)})
+        else:
+            outcomes.append({"date": day.isoformat(), "status": "ok", "schedule_id": result})
+    return outcomes
+
+
+async def shift_schedule(
+    client: GarminConnectClient,
+    start: date,
+    end: date,
+    days: int,
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """
+    Move every workout scheduled between start and end, inclusive, by a number of days.
+
+    Each move schedules the workout on its new date and then removes the old entry. Moves run
+    concurrently, and the outcome of each one is reported so partial failures can be retried.
+    """
+    if end < start:
+        raise ValueError("The end of the range must not be before its start")
+
+    entries = await asyncio.to_thread(client.get_scheduled_workouts, start, end)
+
+    moves = [
+        {
+            "schedule_id": entry["id"],
+            "workout_id": entry["workoutId"],
+            "title": entry.get("title"),
+            "from_date": entry["date"],
+            "to_date": (date.fromisoformat(entry["date"]) + timedelta(days=days)).isoformat(),
+        }
+        for entry in entries
+    ]
+
+    if dry_run or days == 0:
+        return [{**move, "status": "planned" if days else "unchanged"} for move in moves]
+
+    results = await run_concurrently(
+        [
+            lambda move=move: client.reschedule_workout(
+                move["schedule_id"], move["workout_id"], date.fromisoformat(move["to_date"])
+            )
+            for move in moves
+        ],
+        limit,
+    )
+
+    outcomes = []
+    for move, result in zip(moves, results):
+        if isinstance(result, Exception):
+            outcomes.append({**move, "status": "failed", "error": str(result)})
+        else:
+            outcomes.append({**move, "status": "ok", "new_schedule_id": result})
+    return outcomes
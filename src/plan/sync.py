@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from garmin.concurrency import run_concurrently
+from garmin.connect import GarminConnectClient
+from garmin.exceptions import GarminPayloadValidationError
+from garmin.schema import payload_validator
+from garmin.serializer import GarminSerializer, serialized_steps
+from models.step import RepeatedStep
+from models.target import HeartRateZoneTarget
+from models.workout import Workout
+from parser.parser import Parser
+from parser.runfun_parser import HeartRateZoneConfig
+
+
+def hash_expression(expression: str) -> str:
+    return hashlib.sha256(expression.strip().encode("utf-8")).hexdigest()
+
+
+def hash_payload(payload: dict) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def workout_zones(workout: Workout) -> List[str]:
+    """
+    Return the heart rate zones targeted by the steps of a workout, in the order they are first used.
+    """
+    ranges = {tuple(values): zone.value for zone, values in HeartRateZoneConfig.ZONES.items()}
+    zones = {}
+
+    def visit(steps) -> None:
+        for step in steps:
+            if isinstance(step, RepeatedStep):
+                visit(step.steps)
+            elif isinstance(step.target, HeartRateZoneTarget):
+                zone = step.target.zone or ranges.get(tuple(step.target.values))
+                if zone:
+                    zones[zone] = True
+
+    visit(workout.steps)
+    return list(zones)
+
+
+class PlanSyncEntry:
+    """
+    The PlanSyncEntry records what was pushed to Garmin Connect for one date of a plan.
+
+    Attributes:
+        date (date): The date the workout is scheduled on.
+        expression_hash (str): Hash of the workout expression that was pushed.
+        payload_hash (str): Hash of the serialized payload that was pushed.
+        workout_id (int): The Garmin Connect workout ID.
+        schedule_id (int): The Garmin Connect schedule ID of the calendar entry.
+        expression (str): The workout expression that was pushed, so it can be serialized again.
+        zones (List[str]): The heart rate zones targeted by the workout.
+    """
+
+    def __init__(self,
+                 date: date,
+                 expression_hash: str,
+                 payload_hash: str,
+                 workout_id: int,
+                 schedule_id: Optional[int] = None,
+                 expression: Optional[str] = None,
+                 zones: Optional[List[str]] = None) -> None:
+        self.date = date
+        self.expression_hash = expression_hash
+        self.payload_hash = payload_hash
+        self.workout_id = workout_id
+        self.schedule_id = schedule_id
+        self.expression = expression
+        self.zones = zones or []
+
+    def to_dict(self) -> dict:
+        return {
+            "date": self.date.isoformat(),
+            "expression_hash": self.expression_hash,
+            "payload_hash": self.payload_hash,
+            "workout_id": self.workout_id,
+            "schedule_id": self.schedule_id,
+            "expression": self.expression,
+            "zones": self.zones,
+        }
+
+    @staticmethod
+    def from_dict(value: dict) -> PlanSyncEntry:
+        return PlanSyncEntry(
+            date=date.fromisoformat(value["date"]),
+            expression_hash=value["expression_hash"],
+            payload_hash=value["payload_hash"],
+            workout_id=value["workout_id"],
+            schedule_id=value.get("schedule_id"),
+            expression=value.get("expression"),
+            zones=value.get("zones"),
+        )
+
+
+class PlanSyncStore:
+    """
+    Thread-safe store of the sync state of every plan. When a path is given the state is persisted
+    to a JSON file after each change, so it survives restarts.
+
+    The store also keeps a reverse index from heart rate zones to the entries whose workouts target
+    them, so the workouts affected by a zone change are found without parsing every plan, and the heart
+    rate ranges that replace the default ones of HeartRateZoneConfig.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._plans: Dict[str, Dict[date, PlanSyncEntry]] = {}
+        self._zone_index: Dict[str, Set[Tuple[str, date]]] = {}
+        self._zones: Dict[str, Tuple[int, int]] = {}
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+            # Files written before zones were stored hold the plans alone.
+            if content.get("version") == 2:
+                self._zones = {zone: (values[0], values[1]) for zone, values in content["zones"].items()}
+                content = content["plans"]
+            for plan_id, entries in content.items():
+                self._plans[plan_id] = {}
+                for entry in map(PlanSyncEntry.from_dict, entries):
+                    self._plans[plan_id][entry.date] = entry
+                    self._index(plan_id, entry)
+
+    def get(self, plan_id: str) -> Dict[date, PlanSyncEntry]:
+        with self._lock:
+            return dict(self._plans.get(plan_id, {}))
+
+    def put(self, plan_id: str, entry: PlanSyncEntry) -> None:
+        with self._lock:
+            self._unindex(plan_id, self._plans.get(plan_id, {}).get(entry.date))
+            self._plans.setdefault(plan_id, {})[entry.date] = entry
+            self._index(plan_id, entry)
+            self._persist()
+
+    def remove(self, plan_id: str, day: date) -> None:
+        with self._lock:
+            self._unindex(plan_id, self._plans.get(plan_id, {}).pop(day, None))
+            self._persist()
+
+    def zones(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Return the heart rate ranges set by name, such as {"ZE": (185, 195)}.
+        """
+        with self._lock:
+            return dict(self._zones)
+
+    def set_zones(self, zones: Mapping[str, Sequence[int]]) -> None:
+        """
+        Set the heart rate ranges of the given zones, keeping those of the others.
+        """
+        with self._lock:
+            self._zones.update({zone: (values[0], values[1]) for zone, values in zones.items()})
+            self._persist()
+
+    def find_by_zones(self, zones: Iterable[str], start: Optional[date] = None) -> List[Tuple[str, PlanSyncEntry]]:
+        """
+        Return the (plan_id, entry) pairs whose workouts target any of the zones, on or after start.
+        """
+        with self._lock:
+            keys = set()
+            for zone in zones:
+                keys.update(self._zone_index.get(zone, ()))
+            return [
+                (plan_id, self._plans[plan_id][day])
+                for plan_id, day in sorted(keys)
+                if start is None or day >= start
+            ]
+
+    def _index(self, plan_id: str, entry: PlanSyncEntry) -> None:
+        for zone in entry.zones:
+            self._zone_index.setdefault(zone, set()).add((plan_id, entry.date))
+
+    def _unindex(self, plan_id: str, entry: Optional[PlanSyncEntry]) -> None:
+        if entry is None:
+            return
+        for zone in entry.zones:
+            self._zone_index.get(zone, set()).discard((plan_id, entry.date))
+
+    def _persist(self) -> None:
+        if not self._path:
+            return
+
+        content = {
+            "version": 2,
+            "plans": {
+                plan_id: [entry.to_dict() for entry in entries.values()]
+                for plan_id, entries in self._plans.items()
+            },
+            "zones": {zone: list(values) for zone, values in self._zones.items()},
+        }
+        temporary = f"{self._path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(content, f)
+        os.replace(temporary, self._path)
+
+
+class PlannedWorkout:
+    """
+    A workout of the submitted plan, parsed and serialized once so it can be hashed and pushed.
+    """
+
+    def __init__(self, date: date, expression: str, workout: Workout) -> None:
+        self.date = date
+        self.expression = expression
+        self.workout = workout
+        self.payload = GarminSerializer(cache=serialized_steps).serialize(workout)
+        self.expression_hash = hash_expression(expression)
+        self.payload_hash = hash_payload(self.payload)
+        self.zones = workout_zones(workout)
+
+
+class PlanChange:
+    """
+    A single change needed to bring Garmin Connect in line with the submitted plan.
+
+    Actions:
+        create: The date is new, the workout is created and scheduled.
+        update: The date exists but its payload changed, the workout is updated in place.
+        move: An identical workout exists on a date that left the plan, it is rescheduled.
+        unschedule: The date left the plan, its calendar entry is removed.
+        unchanged: Nothing to do.
+    """
+
+    CALLS = {"create": 2, "update": 1, "move": 2, "unschedule": 1, "unchanged": 0}
+
+    def __init__(self,
+                 action: str,
+                 date: date,
+                 planned: Optional[PlannedWorkout] = None,
+                 previous: Optional[PlanSyncEntry] = None) -> None:
+        self.action = action
+        self.date = date
+        self.planned = planned
+        self.previous = previous
+
+    @property
+    def calls(self) -> int:
+        return self.CALLS[self.action]
+
+    def to_dict(self) -> dict:
+        result = {"date": self.date.isoformat(), "action": self.action}
+        if self.previous is not None:
+            result["workout_id"] = self.previous.workout_id
+            if self.action == "move":
+                result["from_date"] = self.previous.date.isoformat()
+        return result
+
+
+class PlanDiff:
+    """
+    The list of changes between the sync state of a plan and its submitted version.
+    """
+
+    def __init__(self, changes: List[PlanChange]) -> None:
+        self.changes = sorted(changes, key=lambda c: c.date)
+
+    @property
+    def calls(self) -> int:
+        return sum(change.calls for change in self.changes)
+
+    @property
+    def pending(self) -> List[PlanChange]:
+        return [change for change in self.changes if change.action != "unchanged"]
+
+    def to_dict(self) -> dict:
+        return {
+            "changes": [change.to_dict() for change in self.changes],
+            "calls": self.calls,
+        }
+
+
+def diff_plan(planned: List[PlannedWorkout], state: Dict[date, PlanSyncEntry]) -> PlanDiff:
+    """
+    Compare the submitted plan with the recorded state. Workouts are matched by date and compared
+    by payload hash, so only edits that change what Garmin Connect receives trigger an update. New dates whose
+    payload matches a date that left the plan reuse that workout instead of creating a new one.
+    """
+    changes = []
+    added: List[PlannedWorkout] = []
+    removed: Dict[str, List[PlanSyncEntry]] = {}
+
+    planned_dates = {p.date for p in planned}
+    for entry in state.values():
+        if entry.date not in planned_dates:
+            removed.setdefault(entry.payload_hash, []).append(entry)
+
+    for p in planned:
+        entry = state.get(p.date)
+        if entry is None:
+            added.append(p)
+        elif entry.payload_hash == p.payload_hash:
+            changes.append(PlanChange("unchanged", p.date, p, entry))
+        else:
+            changes.append(PlanChange("update", p.date, p, entry))
+
+    for p in added:
+        candidates = removed.get(p.payload_hash)
+        if candidates:
+            changes.append(PlanChange("move", p.date, p, candidates.pop()))
+        else:
+            changes.append(PlanChange("create", p.date, p))
+
+    for entries in removed.values():
+        for entry in entries:
+            changes.append(PlanChange("unschedule", entry.date, previous=entry))
+
+    return PlanDiff(changes)
+
+
+class PlanSynchronizer:
+    """
+    The PlanSynchronizer pushes only what changed in a plan since its last sync.
+    """
+
+    def __init__(self, plan_id: str, parser: Parser, store: PlanSyncStore) -> None:
+        self.plan_id = plan_id
+        self.parser = parser
+        self.store = store
+
+    def diff(self, items: List[Tuple[str, date]]) -> PlanDiff:
+        """
+        Parse the (expression, date) items of the plan and compare them with the recorded state. Every
+        payload is validated first, so an invalid workout rejects the plan before any call is made.
+        """
+        dates = [day for _, day in items]
+        if len(set(dates)) != len(dates):
+            raise ValueError("A plan can only have one workout per date")
+
+        planned = [PlannedWorkout(day, expression, self.parser.parse(expression)) for expression, day in items]
+
+        errors = [
+            (f"{p.date.isoformat()}.{path}" if path else p.date.isoformat(), message)
+            for p in planned
+            for path, message in payload_validator.errors(p.payload)
+        ]
+        if errors:
+            raise GarminPayloadValidationError(errors)
+
+        return diff_plan(planned, self.store.get(self.plan_id))
+
+    async def apply(self, diff: PlanDiff, client: GarminConnectClient) -> List[dict]:
+        changes = diff.pending
+        results = await run_concurrently(
+            [lambda change=change: self._apply_change(change, client) for change in changes]
+        )
+
+        outcomes = []
+        for change, result in zip(changes, results):
+            outcome = change.to_dict()
+            if isinstance(result, Exception):
+                outcome.update({"status": "failed", "error": str(result)})
+            else:
+                outcome["status"] = "ok"
+            outcomes.append(outcome)
+
+        return outcomes
+
+    def _apply_change(self, change: PlanChange, client: GarminConnectClient) -> None:
+        planned, previous = change.planned, change.previous
+
+        if change.action == "create":
+            # A sync of the same plan running concurrently, such as a retry, creates the workout once.
+            workout_id = client.create_workout(
+                planned.workout, idempotency_key=f"plan:{self.plan_id}:{planned.date.isoformat()}"
+            )
+            schedule_id = client.schedule_workout(workout_id, planned.date)
+            self._record(planned, workout_id, schedule_id)
+        elif change.action == "update":
+            client.update_workout(previous.workout_id, planned.workout)
+            self._record(planned, previous.workout_id, previous.schedule_id)
+        elif change.action == "move":
+            schedule_id = client.schedule_workout(previous.workout_id, planned.date)
+            self._record(planned, previous.workout_id, schedule_id)
+            client.unschedule_workout(previous.schedule_id)
+            self.store.remove(self.plan_id, previous.date)
+        elif change.action == "unschedule":
+            client.unschedule_workout(previous.schedule_id)
+            self.store.remove(self.plan_id, previous.date)
+
+    def _record(self, planned: PlannedWorkout, workout_id: int, schedule_id: Optional[int]) -> None:
+        self.store.put(
+            self.plan_id,
+            PlanSyncEntry(
+                date=planned.date,
+                expression_hash=planned.expression_hash,
+                payload_hash=planned.payload_hash,
+                workout_id=workout_id,
+                schedule_id=schedule_id,
+                expression=planned.expression,
+                zones=planned.zones,
+            ),
+        )
@@ -0,0 +1,116 @@
+from datetime import date
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from garmin.concurrency import run_concurrently
+from garmin.connect import GarminConnectClient
+from parser.runfun_parser import HeartRateZone, HeartRateZoneConfig, RunFunParser
+from plan.sync import PlanSyncEntry, PlanSyncStore, PlannedWorkout
+
+
+def changed_zones(zones: Dict[str, Sequence[int]], current: Mapping[HeartRateZone, Tuple[int, int]]) -> List[str]:
+    """
+    Validate new heart rate ranges and return the zones whose range differs from the current one.
+    """
+    return [
+        zone.value
+        for zone, values in _normalize(zones).items()
+        if values != tuple(current[zone])
+    ]
+
+
+async def propagate_zone_change(
+    store: PlanSyncStore,
+    client: Optional[GarminConnectClient],
+    zones: Dict[str, Sequence[int]],
+    start: Optional[date] = None,
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+) -> dict:
+    """
+    Apply new heart rate zone ranges and update the pushed workouts that use them.
+
+    The ranges are kept in the sync store, which parsers of later requests take their zones from. A dry
+    run only reads the store, so it needs no client.
+
+    The affected workouts are looked up in the zone index of the sync store, so only workouts
+    scheduled on or after start (today by default) that target a changed zone are serialized again
+    and updated in Garmin Connect, concurrently. Every outcome is reported, and only successful
+    updates are recorded, so failed ones can be retried with a plan sync.
+    """
+    start = start if start else date.today()
+    changed = changed_zones(zones, RunFunParser(zones=store.zones()).zones)
+    affected = store.find_by_zones(changed, start)
+
+    if dry_run:
+        return {
+            "changed_zones": changed,
+            "workouts": [
+                {**_describe(plan_id, entry), "status": "planned"} for plan_id, entry in affected
+            ],
+            "failed": 0,
+        }
+
+    store.set_zones({zone.value: values for zone, values in _normalize(zones).items()})
+    parser = RunFunParser(zones=store.zones())
+
+    outcomes, updates = [], []
+    for plan_id, entry in affected:
+        planned = PlannedWorkout(entry.date, entry.expression, parser.parse(entry.expression))
+        if planned.payload_hash == entry.payload_hash:
+            outcomes.append({**_describe(plan_id, entry), "status": "unchanged"})
+        else:
+            updates.append((plan_id, entry, planned))
+
+    results = await run_concurrently(
+        [
+            lambda entry=entry, planned=planned: client.update_workout(entry.workout_id, planned.workout)
+            for _, entry, planned in updates
+        ],
+        limit,
+    )
+
+    for (plan_id, entry, planned), result in zip(updates, results):
+        if isinstance(result, Exception):
+            outcomes.append({**_describe(plan_id, entry), "status": "failed", "error": str(result)})
+            continue
+
+        store.put(
+            plan_id,
+            PlanSyncEntry(
+                date=entry.date,
+                expression_hash=planned.expression_hash,
+                payload_hash=planned.payload_hash,
+                workout_id=entry.workout_id,
+                schedule_id=entry.schedule_id,
+                expression=planned.expression,
+                zones=planned.zones,
+            ),
+        )
+        outcomes.append({**_describe(plan_id, entry), "status": "ok"})
+
+    outcomes.sort(key=lambda outcome: (outcome["date"], outcome["plan_id"]))
+    return {
+        "changed_zones": changed,
+        "workouts": outcomes,
+        "failed": sum(1 for outcome in outcomes if outcome["status"] == "failed"),
+    }
+
+
+def _normalize(zones: Dict[str, Sequence[int]]) -> Dict[HeartRateZone, Tuple[int, int]]:
+    normalized = {}
+    for key, values in zones.items():
+        if not HeartRateZoneConfig.validate_zone(key.upper()):
+            raise ValueError(f"Invalid heart rate zone: {key}")
+        if len(values) != 2 or not 0 < values[0] < values[1]:
+            raise ValueError(f"Invalid heart rate range for zone {key}: {list(values)}")
+        normalized[HeartRateZone[key.upper()]] = (values[0], values[1])
+    return normalized
+
+
+def _describe(plan_id: str, entry: PlanSyncEntry) -> dict:
+    return {
+        "plan_id": plan_id,
+        "date": entry.date.isoformat(),
+        "workout_id": entry.workout_id,
+        "zones": entry.zones,
+    }
@@ -1 +1,3 @@
-from routes.v1.workout.route import router as workout_router
\ No newline at end of file
+from routes.v1.calendar.route import router as calendar_router
+from routes.v1.library.route import router as library_router
+from routes.v1.workout.route import router as workout_router
@@ -0,0 +1,97 @@
+from datetime import date
+from typing import Annotated
+
+from fastapi import APIRouter, Body, Depends, Path, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from requests import HTTPError
+
+from dependencies import get_garmin_connect_client
+from garmin.connect import GarminConnectClient
+from plan.schedule import shift_schedule
+
+
+router = APIRouter()
+
+
+class ShiftScheduleRequest(BaseModel):
+    """
+    Request model for moving every scheduled workout of a date range.
+
+    Attributes:
+        start: First date of the range, inclusive.
+        end: Last date of the range, inclusive.
+        days: Number of days to move the workouts by, negative to move them earlier.
+    """
+    start: date
+    end: date
+    days: int
+
+
+@router.get(
+    "/{year}/{month}",
+    description="Fetches the calendar of a month from Garmin Connect, including the scheduled workouts.",
+)
+def get_calendar(
+    year: int = Path(ge=1900, le=9999),
+    month: int = Path(ge=1, le=12),
+    client: GarminConnectClient = Depends(get_garmin_connect_client),
+) -> Response:
+    try:
+        return JSONResponse(status_code=200, content=client.get_calendar(year, month))
+    except HTTPError as err:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "garmin_service_error",
+                "message": "Unable to fetch the calendar from Garmin Connect",
+                "detail": str(err)
+            },
+        )
+
+
+@router.post(
+    "/shift",
+    description="Moves every workout scheduled in a date range by a number of days.",
+)
+async def shift_calendar(
+    request: Annotated[
+        ShiftScheduleRequest,
+        Body(
+            description="Request body containing the date range and the number of days to move",
+            examples=[
+                {"start": "2024-10-07", "end": "2024-11-03", "days": 7},
+            ],
+        ),
+    ],
+    dry_run: bool = False,
+    client: GarminConnectClient = Depends(get_garmin_connect_client),
+) -> Response:
+    try:
+        outcomes = await shift_schedule(client, request.start, request.end, request.days, dry_run=dry_run)
+        failed = sum(1 for outcome in outcomes if outcome["status"] == "failed")
+
+        return JSONResponse(
+            status_code=207 if failed else 200,
+            content={
+                "moves": outcomes,
+                "failed": failed,
+            },
+        )
+    except ValueError as ve:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "error": "invalid_range",
+                "message": str(ve)
+            },
+        )
+    except HTTPError as err:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "garmin_service_error",
+                "message": "Unable to fetch the calendar from Garmin Connect",
+                "detail": str(err)
+            },
+        )
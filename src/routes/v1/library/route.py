@@ -0,0 +1,165 @@
+from typing import Annotated, Dict, List, Optional
+
+from fastapi import APIRouter, Body, Depends, Query, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from dependencies import get_workout_library, get_workout_parser
+from library.store import WorkoutLibrary
+from parser.parser import Parser
+from parser.runfun_parser import HeartRateZoneConfig
+
+
+router = APIRouter()
+
+
+class LibraryWorkout(BaseModel):
+    """
+    A workout to store in the library.
+
+    Attributes:
+        workout_expr: A string expression defining the workout structure.
+        name: Optional name of the workout, defaults to the expression.
+    """
+    workout_expr: str
+    name: Optional[str] = None
+
+
+class AddWorkoutsRequest(BaseModel):
+    """
+    Request model for storing workouts in the library.
+
+    Attributes:
+        workouts: The workouts to store. Either all of them are stored, in one transaction, or none is.
+    """
+    workouts: List[LibraryWorkout]
+
+
+def parse_zone_filters(values: List[str]) -> Dict[str, int]:
+    """
+    Parse zone filters written as ZONE:MINUTES, e.g. ZS:20, into seconds per zone.
+    """
+    filters = {}
+    for value in values:
+        zone, _, minutes = value.partition(":")
+        if not HeartRateZoneConfig.validate_zone(zone.upper()) or not minutes.isdigit():
+            raise ValueError(f"Invalid zone filter: {value}")
+        filters[zone.upper()] = int(minutes) * 60
+    return filters
+
+
+@router.post(
+    "",
+    description="Parses workout expressions and stores them in the local workout library.",
+)
+def add_workouts(
+    workout_parser: str,
+    request: Annotated[
+        AddWorkoutsRequest,
+        Body(
+            description="Request body containing the workouts to store",
+            examples=[
+                {
+                    "workouts": [
+                        {"workout_expr": "15' zr + 2x (8' zm + 5' zr) + 10' zr", "name": "Tempo"},
+                    ],
+                },
+            ],
+        ),
+    ],
+    parser: Parser = Depends(get_workout_parser),
+    library: WorkoutLibrary = Depends(get_workout_library),
+) -> Response:
+    try:
+        def parse(item: LibraryWorkout):
+            workout = parser.parse(item.workout_expr)
+            if item.name:
+                workout.name = item.name
+            return item.workout_expr, workout
+
+        # Every workout is parsed before any is stored, so an invalid one leaves the library unchanged.
+        items = [parse(item) for item in request.workouts]
+        ids = library.add_many(items, batch_size=max(len(items), 1))
+        return JSONResponse(status_code=201, content={"ids": ids})
+    except ValueError as ve:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "error": "invalid_workout",
+                "message": f"Invalid workout format: {str(ve)}"
+            },
+        )
+
+
+@router.get(
+    "/search",
+    description="Searches the library by name, total duration and time in zone.",
+)
+def search_workouts(
+    name: Optional[str] = None,
+    zone_min: List[str] = Query(default=[], description="Minimum time in zone as ZONE:MINUTES, e.g. ZS:20"),
+    zone_max: List[str] = Query(default=[], description="Maximum time in zone as ZONE:MINUTES, e.g. ZE:0"),
+    min_duration: Optional[int] = Query(default=None, ge=0, description="Minimum total duration in minutes"),
+    max_duration: Optional[int] = Query(default=None, ge=0, description="Maximum total duration in minutes"),
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+    library: WorkoutLibrary = Depends(get_workout_library),
+) -> Response:
+    try:
+        results = library.search(
+            name=name,
+            min_zone_secs=parse_zone_filters(zone_min),
+            max_zone_secs=parse_zone_filters(zone_max),
+            min_duration=min_duration * 60 if min_duration is not None else None,
+            max_duration=max_duration * 60 if max_duration is not None else None,
+            limit=limit,
+            offset=offset,
+        )
+        return JSONResponse(status_code=200, content=results)
+    except ValueError as ve:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "error": "invalid_filter",
+                "message": str(ve)
+            },
+        )
+
+
+@router.get(
+    "/{workout_id}",
+    description="Fetches a workout stored in the library.",
+)
+def get_library_workout(
+    workout_id: int,
+    library: WorkoutLibrary = Depends(get_workout_library),
+) -> Response:
+    workout = library.get(workout_id)
+    if workout is None:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "error": "workout_not_found",
+                "message": f"Workout {workout_id} was not found in the library"
+            },
+        )
+    return JSONResponse(status_code=200, content=workout)
+
+
+@router.delete(
+    "/{workout_id}",
+    description="Removes a workout from the library.",
+)
+def delete_library_workout(
+    workout_id: int,
+    library: WorkoutLibrary = Depends(get_workout_library),
+) -> Response:
+    if not library.delete(workout_id):
+        return JSONResponse(
+            status_code=404,
+            content={
+                "error": "workout_not_found",
+                "message": f"Workout {workout_id} was not found in the library"
+            },
+        )
+    return Response(status_code=204)
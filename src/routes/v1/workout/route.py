@@ -1,16 +1,55 @@
-from datetime import date
-from typing import Annotated, Optional
-from fastapi import APIRouter, Body, Depends, Response
-from fastapi.responses import JSONResponse
+import asyncio
+from datetime import date, datetime
+from typing import Annotated, Callable, Dict, List, Literal, Optional, Union
+from fastapi import APIRouter, Body, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from requests import HTTPError, Timeout
 
-from dependencies import get_garmin_connect_client, get_workout_parser
+from admission import AdmittedRoute
+from analysis.training_load import TrainingLoadConfig, TrainingLoadEstimator
+from deadline import DeadlineExceeded
+from dependencies import (
+    WORKOUT_REJECT_STATUS,
+    get_garmin_connect_client,
+    get_garmin_connect_client_factory,
+    get_parse_sessions,
+    get_plan_sync_store,
+    get_workout_admission,
+    get_workout_library,
+    get_workout_parser,
+)
 from garmin.connect import GarminConnectClient
-from garmin.exceptions import GarminWorkoutIdError
+from garmin.exceptions import GarminPayloadValidationError, GarminWorkoutIdError
+from garmin.export import AccountExporter
+from garmin.fit_archive import iter_fit_archive
+from garmin.schema import payload_validator
+from library.codec import workout_to_dict
+from library.store import WorkoutLibrary
+from parser.incremental import IncrementalParseSessions
 from parser.parser import Parser
+from parser.runfun_parser import RunFunParser
+from parser.template import compile_template
+from plan.cleanup import delete_workouts, describe, resolve_workouts
+from plan.recurrence import expand_recurrence
+from plan.schedule import schedule_dates
+from plan.sync import PlanSynchronizer, PlanSyncStore
+from plan.zones import propagate_zone_change
+from negotiation import NegotiatedResponse, NegotiatedRoute
+
+
+class WorkoutRoute(NegotiatedRoute, AdmittedRoute):
+    """
+    Workout endpoints negotiate MessagePack and go through admission control, where endpoints calling
+    Garmin Connect wait behind the parse-only ones.
+    """
+
+    admission = get_workout_admission()
+    low_priority_dependencies = (get_garmin_connect_client, get_garmin_connect_client_factory)
+    reject_status_code = WORKOUT_REJECT_STATUS
 
 
-router = APIRouter()
+router = APIRouter(route_class=WorkoutRoute)
 
 
 class CreateWorkoutRequest(BaseModel):
@@ -27,6 +66,151 @@ class CreateWorkoutRequest(BaseModel):
     workout_schedule: Optional[date] = None
 
 
+class RecurrenceRule(BaseModel):
+    """
+    Recurrence rule for scheduling the same workout on many dates.
+
+    Attributes:
+        start: First date the rule can produce.
+        frequency: "daily" or "weekly".
+        interval: Number of days or weeks between occurrences.
+        weekdays: For weekly rules, the days of the week to use, 0 being Monday.
+            Defaults to the weekday of the start date.
+        until: Last date the rule can produce, inclusive.
+        count: Maximum number of dates to produce.
+    """
+    start: date
+    frequency: Literal["daily", "weekly"] = "weekly"
+    interval: int = 1
+    weekdays: Optional[List[int]] = None
+    until: Optional[date] = None
+    count: Optional[int] = None
+
+    def dates(self) -> List[date]:
+        return expand_recurrence(
+            start=self.start,
+            frequency=self.frequency,
+            interval=self.interval,
+            weekdays=self.weekdays,
+            until=self.until,
+            count=self.count,
+        )
+
+
+class ParseAndCreateWorkoutRequest(CreateWorkoutRequest):
+    """
+    Request model for creating a workout in Garmin Connect and scheduling it on one or many dates.
+
+    Attributes:
+        workout_schedule_dates: Optional list of additional dates when the workout should be scheduled.
+        workout_recurrence: Optional recurrence rule producing additional dates.
+
+    The workout is created once and scheduled on the union of workout_schedule, workout_schedule_dates
+    and the dates of workout_recurrence.
+    """
+    workout_schedule_dates: Optional[List[date]] = None
+    workout_recurrence: Optional[RecurrenceRule] = None
+
+    def schedule_dates(self) -> List[date]:
+        dates = set(self.workout_schedule_dates or [])
+        if self.workout_schedule is not None:
+            dates.add(self.workout_schedule)
+        if self.workout_recurrence is not None:
+            dates.update(self.workout_recurrence.dates())
+        return sorted(dates)
+
+
+class AnalyzePlanRequest(BaseModel):
+    """
+    Request model for estimating the training load of a plan.
+
+    Attributes:
+        workouts: The workouts of the plan, each with an optional schedule date.
+            Only scheduled workouts are aggregated into weeks.
+        resting_hr: Resting heart rate of the athlete in bpm.
+        max_hr: Maximum heart rate of the athlete in bpm.
+        threshold_hr: Lactate threshold heart rate of the athlete in bpm.
+    """
+    workouts: List[CreateWorkoutRequest]
+    resting_hr: int = 50
+    max_hr: int = 216
+    threshold_hr: int = 186
+
+
+class SyncPlanRequest(BaseModel):
+    """
+    Request model for synchronizing a plan with Garmin Connect.
+
+    Attributes:
+        plan_id: Identifier of the plan, used to look up what was pushed on previous syncs.
+        workouts: The complete current version of the plan. Every workout must be scheduled
+            and there can only be one workout per date.
+    """
+    plan_id: str
+    workouts: List[CreateWorkoutRequest]
+
+
+class UpdateZonesRequest(BaseModel):
+    """
+    Request model for changing heart rate zones.
+
+    Attributes:
+        zones: The new [min, max] heart rate of each changed zone, in bpm.
+        start: Only workouts scheduled on or after this date are updated. Defaults to today.
+    """
+    zones: Dict[str, List[int]]
+    start: Optional[date] = None
+
+
+class DeleteWorkoutsRequest(BaseModel):
+    """
+    Request model for deleting workouts from Garmin Connect. Workouts must match every given criterion.
+
+    Attributes:
+        workout_ids: Optional list of workout IDs.
+        name_prefix: Optional prefix of the workout names.
+        created_before: Optional date and time, only workouts created before it are deleted.
+    """
+    workout_ids: Optional[List[int]] = None
+    name_prefix: Optional[str] = None
+    created_before: Optional[datetime] = None
+
+
+class ExportFitRequest(BaseModel):
+    """
+    Request model for exporting workouts as FIT files.
+
+    Attributes:
+        workouts: The workouts to export. The schedule date, when present, is added to the file name.
+    """
+    workouts: List[CreateWorkoutRequest]
+
+
+class IncrementalParseRequest(BaseModel):
+    """
+    Request model for parsing the current text of a workout editor.
+
+    Attributes:
+        workout_expr: The whole expression as currently typed, complete or not.
+        session_id: The session returned by the previous call. Omit it to start a new session.
+    """
+    workout_expr: str
+    session_id: Optional[str] = None
+
+
+class InstantiateTemplateRequest(BaseModel):
+    """
+    Request model for building many workouts from one parameterized expression.
+
+    Attributes:
+        template: A workout expression with {name} placeholders for durations, distances and repeat counts.
+            Example: "{warm}' zr + {n}x ({rep}' ze + 2' zr) + {cool}' zr"
+        parameters: One set of values per workout to build.
+    """
+    template: str
+    parameters: List[Dict[str, Union[int, float]]]
+
+
 @router.post(
     "/parse/create",
     description="Parses a workout expression and creates a workout in Garmin Connect.",
@@ -34,7 +218,7 @@ class CreateWorkoutRequest(BaseModel):
 async def parse_and_create_workout(
     workout_parser: str,
     request: Annotated[
-        CreateWorkoutRequest,
+        ParseAndCreateWorkoutRequest,
         Body(
             description="Request body containing the workout expression and parser type",
             examples=[
@@ -42,30 +226,62 @@ async def parse_and_create_workout(
                     "workout_expr": "10' zr + 5x (400m ze + 1' ra) + 15' zr",
                     "workout_schedule": "2024-10-10",
                 },
+                {
+                    "workout_expr": "15' zr + 2x (8' zm + 5' zr) + 10' zr",
+                    "workout_recurrence": {
+                        "start": "2024-10-07",
+                        "frequency": "weekly",
+                        "weekdays": [1, 3],
+                        "until": "2024-12-31",
+                    },
+                },
             ],
         ),
     ],
     parser: Parser = Depends(get_workout_parser),
     client: GarminConnectClient = Depends(get_garmin_connect_client),
+    idempotency_key: Optional[str] = Header(
+        default=None,
+        description="Retries of a request sent with the same key while it is in flight create the workout once",
+    ),
 ) -> Response:
     try:
         workout = parser.parse(request.workout_expr)
-        workout_id = client.create_workout(workout)
+        dates = request.schedule_dates()
+        # Garmin Connect calls wait for the rate limit and for uploads with the same key, off the loop.
+        workout_id = await asyncio.to_thread(
+            client.create_workout, workout, f"request:{idempotency_key}" if idempotency_key else None
+        )
+
+        if request.workout_schedule_dates is None and request.workout_recurrence is None:
+            if request.workout_schedule is not None:
+                await asyncio.to_thread(client.schedule_workout, workout_id, request.workout_schedule)
 
-        if request.workout_schedule is not None:
-            client.schedule_workout(workout_id, request.workout_schedule)
+            return Response(status_code=201)
 
-        return Response(status_code=201)
+        outcomes = await schedule_dates(client, workout_id, dates)
+        failed = sum(1 for outcome in outcomes if outcome["status"] == "failed")
+
+        return NegotiatedResponse(
+            status_code=207 if failed else 201,
+            content={
+                "workout_id": workout_id,
+                "schedules": outcomes,
+                "failed": failed,
+            },
+        )
     except NotImplementedError:
-        return JSONResponse(
+        return NegotiatedResponse(
             status_code=400,
             content={
                 "error": "invalid_parser",
                 "message": f"Parser type '{workout_parser}' is not supported"
             },
         )
+    except GarminPayloadValidationError:
+        raise
     except ValueError as ve:
-        return JSONResponse(
+        return NegotiatedResponse(
             status_code=400,
             content={
                 "error": "invalid_workout",
@@ -73,15 +289,17 @@ async def parse_and_create_workout(
             },
         )
     except GarminWorkoutIdError:
-        return JSONResponse(
+        return NegotiatedResponse(
             status_code=503,
             content={
                 "error": "garmin_service_error",
                 "message": "Unable to create workout in Garmin Connect"
             },
         )
+    except (DeadlineExceeded, Timeout):
+        raise
     except Exception as ex:
-        return JSONResponse(
+        return NegotiatedResponse(
             status_code=500,
             content={
                 "error": "internal_error",
@@ -89,3 +307,524 @@ async def parse_and_create_workout(
                 "detail": str(ex)
             },
         )
+
+
+@router.post(
+    "/plan/analyze",
+    description="Estimates time in zone, TRIMP and hrTSS per workout and per week for a plan.",
+)
+async def analyze_plan(
+    workout_parser: str,
+    request: Annotated[
+        AnalyzePlanRequest,
+        Body(
+            description="Request body containing the workouts of the plan and the athlete heart rates",
+            examples=[
+                {
+                    "workouts": [
+                        {"workout_expr": "15' zr + 2x (8' zm + 5' zr) + 10' zr", "workout_schedule": "2024-10-07"},
+                        {"workout_expr": "50' zr", "workout_schedule": "2024-10-09"},
+                    ],
+                    "resting_hr": 50,
+                    "max_hr": 216,
+                    "threshold_hr": 186,
+                },
+            ],
+        ),
+    ],
+    parser: Parser = Depends(get_workout_parser),
+) -> Response:
+    try:
+        config = TrainingLoadConfig(
+            resting_hr=request.resting_hr,
+            max_hr=request.max_hr,
+            threshold_hr=request.threshold_hr,
+        )
+        workouts = [parser.parse(item.workout_expr) for item in request.workouts]
+        dates = [item.workout_schedule for item in request.workouts]
+
+        load = TrainingLoadEstimator(config).estimate(workouts, dates)
+
+        return NegotiatedResponse(
+            status_code=200,
+            content={
+                "workouts": load.per_workout(),
+                "weeks": load.per_week(),
+            },
+        )
+    except ValueError as ve:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_workout",
+                "message": f"Invalid workout format: {str(ve)}"
+            },
+        )
+    except (DeadlineExceeded, Timeout):
+        raise
+    except Exception as ex:
+        return NegotiatedResponse(
+            status_code=500,
+            content={
+                "error": "internal_error",
+                "message": "An unexpected error occurred while processing the request",
+                "detail": str(ex)
+            },
+        )
+
+
+@router.post(
+    "/parse/incremental",
+    description="Parses the current text of a workout editor, reusing the steps parsed by previous calls of the session.",
+)
+async def parse_incremental(
+    workout_parser: str,
+    request: Annotated[
+        IncrementalParseRequest,
+        Body(
+            description="Request body containing the expression and the session of the editor",
+            examples=[
+                {"workout_expr": "15' zr + 2x (8' zm + 5' zr) + 1"},
+                {"workout_expr": "15' zr + 2x (8' zm + 5' zr) + 10' zr", "session_id": "3f2b9c..."},
+            ],
+        ),
+    ],
+    parser: Parser = Depends(get_workout_parser),
+    sessions: IncrementalParseSessions = Depends(get_parse_sessions),
+) -> Response:
+    try:
+        if not isinstance(parser, RunFunParser):
+            raise NotImplementedError(f"Parser type '{workout_parser}' does not support incremental parsing")
+
+        session_id, session = sessions.get(request.session_id)
+        result = session.update(request.workout_expr, parser)
+
+        return NegotiatedResponse(
+            status_code=200,
+            content={
+                "session_id": session_id,
+                "workout": workout_to_dict(result.workout),
+                "estimates": result.estimates(),
+                "steps": result.timeline(),
+                "errors": result.errors,
+                "reused": result.reused,
+            },
+        )
+    except NotImplementedError:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_parser",
+                "message": f"Parser type '{workout_parser}' is not supported"
+            },
+        )
+    except (DeadlineExceeded, Timeout):
+        raise
+    except Exception as ex:
+        return NegotiatedResponse(
+            status_code=500,
+            content={
+                "error": "internal_error",
+                "message": "An unexpected error occurred while processing the request",
+                "detail": str(ex)
+            },
+        )
+
+
+@router.delete(
+    "/parse/incremental/{session_id}",
+    description="Ends an incremental parsing session.",
+)
+def close_incremental_session(
+    session_id: str,
+    sessions: IncrementalParseSessions = Depends(get_parse_sessions),
+) -> Response:
+    return Response(status_code=204 if sessions.close(session_id) else 404)
+
+
+@router.post(
+    "/template/instantiate",
+    description="Builds the Garmin Connect payloads of a parameterized workout expression for many sets of values.",
+)
+async def instantiate_template(
+    workout_parser: str,
+    request: Annotated[
+        InstantiateTemplateRequest,
+        Body(
+            description="Request body containing the workout template and the values of its parameters",
+            examples=[
+                {
+                    "template": "{warm}' zr + {n}x ({rep}' ze + 2' zr) + {cool}' zr",
+                    "parameters": [
+                        {"warm": 15, "n": 5, "rep": 3, "cool": 10},
+                        {"warm": 15, "n": 6, "rep": 4, "cool": 10},
+                    ],
+                },
+            ],
+        ),
+    ],
+    parser: Parser = Depends(get_workout_parser),
+) -> Response:
+    try:
+        if not isinstance(parser, RunFunParser):
+            raise NotImplementedError(f"Parser type '{workout_parser}' does not support templates")
+
+        template = compile_template(request.template, parser)
+        payloads = [template.instantiate_payload(parameters) for parameters in request.parameters]
+
+        errors = [
+            (f"[{index}].{path}" if path else f"[{index}]", message)
+            for index, payload in enumerate(payloads)
+            for path, message in payload_validator.errors(payload)
+        ]
+        if errors:
+            raise GarminPayloadValidationError(errors)
+
+        return NegotiatedResponse(
+            status_code=200,
+            content={
+                "parameters": template.parameters,
+                "workouts": payloads,
+            },
+        )
+    except NotImplementedError:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_parser",
+                "message": f"Parser type '{workout_parser}' is not supported"
+            },
+        )
+    except GarminPayloadValidationError:
+        raise
+    except ValueError as ve:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_workout",
+                "message": f"Invalid workout template: {str(ve)}"
+            },
+        )
+    except (DeadlineExceeded, Timeout):
+        raise
+    except Exception as ex:
+        return NegotiatedResponse(
+            status_code=500,
+            content={
+                "error": "internal_error",
+                "message": "An unexpected error occurred while processing the request",
+                "detail": str(ex)
+            },
+        )
+
+
+@router.post(
+    "/plan/sync",
+    description="Pushes only the workouts of a plan that changed since its last sync to Garmin Connect.",
+)
+async def sync_plan(
+    workout_parser: str,
+    request: Annotated[
+        SyncPlanRequest,
+        Body(
+            description="Request body containing the plan identifier and its workouts",
+            examples=[
+                {
+                    "plan_id": "marathon-2024",
+                    "workouts": [
+                        {"workout_expr": "15' zr + 2x (8' zm + 5' zr) + 10' zr", "workout_schedule": "2024-10-07"},
+                        {"workout_expr": "50' zr", "workout_schedule": "2024-10-09"},
+                    ],
+                },
+            ],
+        ),
+    ],
+    dry_run: bool = False,
+    parser: Parser = Depends(get_workout_parser),
+    store: PlanSyncStore = Depends(get_plan_sync_store),
+    client_factory: Callable[[], GarminConnectClient] = Depends(get_garmin_connect_client_factory),
+) -> Response:
+    try:
+        if any(item.workout_schedule is None for item in request.workouts):
+            raise ValueError("Every workout of a plan must have a schedule date")
+
+        synchronizer = PlanSynchronizer(request.plan_id, parser, store)
+        diff = synchronizer.diff([(item.workout_expr, item.workout_schedule) for item in request.workouts])
+
+        if dry_run:
+            return NegotiatedResponse(status_code=200, content=diff.to_dict())
+
+        # A dry run only compares with the store, so the login is made on the apply path alone.
+        client = await asyncio.to_thread(client_factory)
+        outcomes = await synchronizer.apply(diff, client)
+        failed = sum(1 for outcome in outcomes if outcome["status"] == "failed")
+
+        return NegotiatedResponse(
+            status_code=207 if failed else 200,
+            content={
+                "changes": outcomes,
+                "calls": diff.calls,
+                "failed": failed,
+            },
+        )
+    except GarminPayloadValidationError:
+        raise
+    except ValueError as ve:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_workout",
+                "message": f"Invalid workout format: {str(ve)}"
+            },
+        )
+    except (DeadlineExceeded, Timeout):
+        raise
+    except Exception as ex:
+        return NegotiatedResponse(
+            status_code=500,
+            content={
+                "error": "internal_error",
+                "message": "An unexpected error occurred while processing the request",
+                "detail": str(ex)
+            },
+        )
+
+
+@router.post(
+    "/plan/zones",
+    description="Changes heart rate zones and updates the future pushed workouts that target them.",
+)
+async def update_zones(
+    workout_parser: str,
+    request: Annotated[
+        UpdateZonesRequest,
+        Body(
+            description="Request body containing the new heart rate ranges",
+            examples=[
+                {
+                    "zones": {"ZE": [184, 194], "ZT": [194, 214]},
+                },
+            ],
+        ),
+    ],
+    dry_run: bool = False,
+    parser: Parser = Depends(get_workout_parser),
+    store: PlanSyncStore = Depends(get_plan_sync_store),
+    client_factory: Callable[[], GarminConnectClient] = Depends(get_garmin_connect_client_factory),
+) -> Response:
+    try:
+        # A dry run only reads the sync store, so Garmin Connect is logged in to on the apply path alone.
+        client = None if dry_run else await asyncio.to_thread(client_factory)
+        result = await propagate_zone_change(store, client, request.zones, request.start, dry_run)
+
+        return NegotiatedResponse(status_code=207 if result["failed"] else 200, content=result)
+    except ValueError as ve:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_zones",
+                "message": str(ve)
+            },
+        )
+    except (DeadlineExceeded, Timeout):
+        raise
+    except Exception as ex:
+        return NegotiatedResponse(
+            status_code=500,
+            content={
+                "error": "internal_error",
+                "message": "An unexpected error occurred while processing the request",
+                "detail": str(ex)
+            },
+        )
+
+
+@router.post(
+    "/export/fit",
+    description="Parses workout expressions and streams a ZIP archive with one FIT workout file each.",
+    response_class=StreamingResponse,
+)
+async def export_fit(
+    workout_parser: str,
+    request: Annotated[
+        ExportFitRequest,
+        Body(
+            description="Request body containing the workouts to export",
+            examples=[
+                {
+                    "workouts": [
+                        {"workout_expr": "15' zr + 2x (8' zm + 5' zr) + 10' zr", "workout_schedule": "2024-10-07"},
+                        {"workout_expr": "50' zr"},
+                    ],
+                },
+            ],
+        ),
+    ],
+    parser: Parser = Depends(get_workout_parser),
+) -> Response:
+    try:
+        workouts = [parser.parse(item.workout_expr) for item in request.workouts]
+    except ValueError as ve:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_workout",
+                "message": f"Invalid workout format: {str(ve)}"
+            },
+        )
+
+    def file_name(index: int, item: CreateWorkoutRequest) -> str:
+        suffix = f"_{item.workout_schedule.isoformat()}" if item.workout_schedule else ""
+        return f"{index + 1:05d}{suffix}.fit"
+
+    files = (
+        (file_name(index, item), workout)
+        for index, (item, workout) in enumerate(zip(request.workouts, workouts))
+    )
+
+    return StreamingResponse(
+        iter_fit_archive(files),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="workouts.zip"'},
+    )
+
+
+@router.post(
+    "/delete",
+    description="Deletes the workouts matching IDs or filters from Garmin Connect, streaming progress as NDJSON.",
+)
+async def bulk_delete_workouts(
+    request: Annotated[
+        DeleteWorkoutsRequest,
+        Body(
+            description="Request body containing the workout IDs or filters",
+            examples=[
+                {"name_prefix": "test-", "created_before": "2024-10-01T00:00:00"},
+                {"workout_ids": [123456, 123457]},
+            ],
+        ),
+    ],
+    dry_run: bool = False,
+    client: GarminConnectClient = Depends(get_garmin_connect_client),
+) -> Response:
+    try:
+        workouts = await asyncio.to_thread(
+            resolve_workouts,
+            client,
+            workout_ids=request.workout_ids,
+            name_prefix=request.name_prefix,
+            created_before=request.created_before,
+        )
+    except ValueError as ve:
+        return NegotiatedResponse(
+            status_code=400,
+            content={
+                "error": "invalid_filter",
+                "message": str(ve)
+            },
+        )
+    except HTTPError as err:
+        return NegotiatedResponse(
+            status_code=503,
+            content={
+                "error": "garmin_service_error",
+                "message": "Unable to list workouts from Garmin Connect",
+                "detail": str(err)
+            },
+        )
+
+    if dry_run:
+        return NegotiatedResponse(
+            status_code=200,
+            content={"workouts": [describe(workout) for workout in workouts], "total": len(workouts)},
+        )
+
+    return StreamingResponse(delete_workouts(client, workouts), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/export/account",
+    description=(
+        "Downloads every workout of the Garmin Connect account with its steps, streamed as NDJSON with the "
+        "Garmin Connect payload, workout tree and RunFun expression of each, or stored in the workout library. "
+        "Each Garmin Connect call has a budget of its own, so the export is not bound by X-Request-Timeout."
+    ),
+)
+async def export_account(
+    destination: Literal["ndjson", "library"] = "ndjson",
+    page_size: int = Query(default=100, ge=1, le=1000),
+    limit: Optional[int] = Query(default=None, ge=1, le=32),
+    client: GarminConnectClient = Depends(get_garmin_connect_client),
+    library: WorkoutLibrary = Depends(get_workout_library),
+) -> Response:
+    exporter = AccountExporter(client, page_size=page_size, limit=limit)
+    if destination == "ndjson":
+        return StreamingResponse(
+            exporter.ndjson(),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": 'attachment; filename="workouts.ndjson"'},
+        )
+
+    try:
+        result = await exporter.to_library(library)
+        return NegotiatedResponse(status_code=207 if result["failed"] else 200, content=result)
+    except HTTPError as err:
+        return NegotiatedResponse(
+            status_code=503,
+            content={
+                "error": "garmin_service_error",
+                "message": "Unable to list workouts from Garmin Connect",
+                "detail": str(err)
+            },
+        )
+
+
+@router.get(
+    "",
+    description="Lists the workouts of the Garmin Connect account.",
+)
+def list_workouts(
+    start: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    client: GarminConnectClient = Depends(get_garmin_connect_client),
+) -> Response:
+    try:
+        return NegotiatedResponse(status_code=200, content=client.list_workouts(start=start, limit=limit))
+    except HTTPError as err:
+        return NegotiatedResponse(
+            status_code=503,
+            content={
+                "error": "garmin_service_error",
+                "message": "Unable to list workouts from Garmin Connect",
+                "detail": str(err)
+            },
+        )
+
+
+@router.get(
+    "/{workout_id}",
+    description="Fetches a workout and its steps from Garmin Connect.",
+)
+def get_workout(
+    workout_id: int,
+    client: GarminConnectClient = Depends(get_garmin_connect_client),
+) -> Response:
+    try:
+        return NegotiatedResponse(status_code=200, content=client.get_workout(workout_id))
+    except HTTPError as err:
+        if err.response is not None and err.response.status_code == 404:
+            return NegotiatedResponse(
+                status_code=404,
+                content={
+                    "error": "workout_not_found",
+                    "message": f"Workout {workout_id} was not found in Garmin Connect"
+                },
+            )
+        return NegotiatedResponse(
+            status_code=503,
+            content={
+                "error": "garmin_service_error",
+                "message": "Unable to fetch workout from Garmin Connect",
+                "detail": str(err)
+            },
+        )
@@ -0,0 +1,466 @@
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import requests
+
+from logger import log_event
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.1"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "garmin-workout-api")
+
+# Span kinds and status codes of the OpenTelemetry protocol.
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+TRACEPARENT_PATTERN = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+INVALID_TRACE_ID = "0" * 32
+INVALID_SPAN_ID = "0" * 16
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Return the (trace id, parent span id, sampled) of a W3C traceparent header, or None when the header
+    is missing or invalid.
+    """
+    if not value:
+        return None
+    match = TRACEPARENT_PATTERN.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == INVALID_TRACE_ID or span_id == INVALID_SPAN_ID:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+class _NoopSpan:
+    """
+    The span returned when the request is not sampled. Every method does nothing, so unsampled code
+    paths only pay for a context variable lookup.
+    """
+
+    __slots__ = ()
+
+    sampled = False
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def set_status(self, code: int, message: Optional[str] = None) -> None:
+        pass
+
+    def update_name(self, name: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    A timed operation of a sampled trace. Entering the span makes it the parent of the spans started
+    in the block; leaving it ends the span, with an error status if the block raised.
+    """
+
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_id", "tracestate", "kind",
+        "attributes", "start_time", "end_time", "status", "status_message", "_token",
+    )
+
+    sampled = True
+
+    def __init__(self,
+                 tracer: "Tracer",
+                 name: str,
+                 trace_id: str,
+                 parent_id: Optional[str] = None,
+                 kind: int = INTERNAL,
+                 attributes: Optional[dict] = None,
+                 tracestate: Optional[str] = None) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64) or 1:016x}"
+        self.parent_id = parent_id
+        self.tracestate = tracestate
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.status = STATUS_UNSET
+        self.status_message: Optional[str] = None
+        self._token = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.set_attribute("exception.type", exc_type.__name__)
+            self.set_status(STATUS_ERROR, str(exc))
+        self.end()
+        _current_span.reset(self._token)
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def set_status(self, code: int, message: Optional[str] = None) -> None:
+        self.status = code
+        self.status_message = message
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            self.tracer.export(self)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def span(name: str, attributes: Optional[dict] = None, kind: int = INTERNAL):
+    """
+    Start a child span of the current span, to be used as a context manager. Outside a sampled trace
+    the shared no-op span is returned.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.tracer, name, parent.trace_id, parent.span_id, kind, attributes, parent.tracestate)
+
+
+def traced(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorate a function so every call runs in a span. The signature of the function is kept, so
+    decorated FastAPI dependencies resolve their own parameters.
+    """
+    def decorate(function: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs) -> T:
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_requests(session: requests.Session) -> requests.Session:
+    """
+    Record every request made with the session as a client span with its method, URL without query
+    string, status code and body sizes.
+    """
+    send = session.request
+
+    def request(method, url, *args, **kwargs):
+        parent = _current_span.get()
+        if parent is None:
+            return send(method, url, *args, **kwargs)
+
+        method = method.upper()
+        attributes = {"http.request.method": method, "url.full": url.split("?", 1)[0]}
+        with span(f"HTTP {method}", attributes, CLIENT) as client_span:
+            response = send(method, url, *args, **kwargs)
+            client_span.set_attribute("http.response.status_code", response.status_code)
+            client_span.set_attribute("http.request.body.size", len(response.request.body or b""))
+            client_span.set_attribute("http.response.body.size", len(response.content))
+            if response.status_code >= 400:
+                client_span.set_status(STATUS_ERROR, f"HTTP {response.status_code}")
+            return response
+
+    session.request = request
+    return session
+
+
+class SpanExporter(ABC):
+    """
+    The SpanExporter batches ended spans on a background thread and writes them as OTLP/JSON
+    ExportTraceServiceRequest documents, so request handling never waits for the export.
+
+    Batches are written every flush_interval seconds or once max_batch spans are waiting. Spans are
+    dropped, and counted, when more than max_queue are waiting.
+    """
+
+    def __init__(self,
+                 service_name: str = TRACE_SERVICE_NAME,
+                 max_batch: int = 512,
+                 max_queue: int = 8192,
+                 flush_interval: float = 1.0) -> None:
+        self.service_name = service_name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self) -> None:
+        """
+        Write the waiting spans and stop the background thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def encode(self, spans: List[Span]) -> dict:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "workout-parser"},
+                    "spans": [_encode_span(s) for s in spans],
+                }],
+            }],
+        }
+
+    @abstractmethod
+    def write(self, payload: bytes) -> None:
+        pass
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            batch: List[Span] = []
+            flush_at = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, flush_at - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            if batch:
+                try:
+                    self.write(json.dumps(self.encode(batch), separators=(",", ":")).encode("utf-8"))
+                except Exception as ex:
+                    log_event(logger, logging.WARNING, "trace_export_failed", spans=len(batch), error=str(ex))
+
+
+class FileExporter(SpanExporter):
+    """
+    Append batches of spans to a file, one OTLP/JSON document per line, the format read by the
+    OpenTelemetry Collector otlpjsonfile receiver. Works without any collector running.
+    """
+
+    def __init__(self, path: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+
+    def write(self, payload: bytes) -> None:
+        with open(self.path, "ab") as f:
+            f.write(payload + b"\n")
+
+
+class OtlpHttpExporter(SpanExporter):
+    """
+    Send batches of spans to an OTLP/HTTP collector endpoint, such as http://localhost:4318/v1/traces.
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 5, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def write(self, payload: bytes) -> None:
+        r = requests.post(
+            self.endpoint, data=payload, headers={"Content-Type": "application/json"}, timeout=self.timeout
+        )
+        r.raise_for_status()
+
+
+class Tracer:
+    """
+    The Tracer starts the root span of each request and hands ended spans to the exporter.
+
+    Requests with a valid W3C traceparent header join the trace of the caller and follow its sampling
+    decision. Other requests start a new trace, sampled with probability sample_ratio from the trace
+    id, so every service sampling by ratio keeps the same traces. Without an exporter nothing is
+    sampled.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_ratio: float = TRACE_SAMPLE_RATIO) -> None:
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self._threshold = int(max(0.0, min(1.0, sample_ratio)) * (1 << 64))
+
+    def start_trace(self,
+                    name: str,
+                    traceparent: Optional[str] = None,
+                    tracestate: Optional[str] = None,
+                    kind: int = SERVER,
+                    attributes: Optional[dict] = None):
+        """
+        Start the root span of a request, or return the no-op span when the request is not sampled.
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, tracestate = f"{random.getrandbits(128) or 1:032x}", None, None
+            sampled = int(trace_id[16:], 16) < self._threshold
+
+        if not sampled:
+            return NOOP_SPAN
+        return Span(self, name, trace_id, parent_id, kind, attributes, tracestate)
+
+    def export(self, span: Span) -> None:
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def _default_exporter() -> Optional[SpanExporter]:
+    if TRACE_OTLP_ENDPOINT:
+        return OtlpHttpExporter(TRACE_OTLP_ENDPOINT)
+    if TRACE_EXPORT_PATH:
+        return FileExporter(TRACE_EXPORT_PATH)
+    return None
+
+
+tracer = Tracer(_default_exporter())
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware running every HTTP request in a server span named after its route, with the method,
+    route and status code. Sampled responses carry a traceresponse header with the trace id.
+    """
+
+    def __init__(self, app, tracer: Tracer = tracer) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k: v for k, v in scope["headers"] if k in (b"traceparent", b"tracestate")}
+        traceparent, tracestate = headers.get(b"traceparent"), headers.get(b"tracestate")
+        method = scope["method"]
+        server_span = self.tracer.start_trace(
+            f"{method} {scope['path']}",
+            traceparent.decode("latin-1") if traceparent else None,
+            tracestate.decode("latin-1") if tracestate else None,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        )
+        if not server_span.sampled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_traced(message) -> None:
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                server_span.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    server_span.set_status(STATUS_ERROR, f"HTTP {status}")
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"traceresponse", server_span.traceparent.encode("latin-1"))
+                ]
+            await send(message)
+
+        with server_span:
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    server_span.update_name(f"{method} {route}")
+                    server_span.set_attribute("http.route", route)
+
+
+def _encode_span(span: Span) -> dict:
+    encoded = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+        "attributes": _attributes(span.attributes),
+        "status": {"code": span.status},
+    }
+    if span.parent_id is not None:
+        encoded["parentSpanId"] = span.parent_id
+    if span.tracestate:
+        encoded["traceState"] = span.tracestate
+    if span.status_message:
+        encoded["status"]["message"] = span.status_message
+    return encoded
+
+
+def _attributes(values: Dict[str, object]) -> List[dict]:
+    attributes = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        attributes.append({"key": key, "value": encoded})
+    return attributes
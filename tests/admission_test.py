@@ -0,0 +1,203 @@
+import asyncio
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from admission import AdmissionController, AdmissionRejected, AdmittedRoute, Priority, depends_on
+from metrics import MetricsRegistry
+
+
+def controller(limit=1, queue_size=2, queue_timeout=1.0):
+    return AdmissionController(limit, queue_size, queue_timeout, name="test", registry=MetricsRegistry())
+
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_limit_and_queue_order():
+    """Test requests beyond the limit wait and are admitted by priority, then in arrival order"""
+    admission = controller(limit=1, queue_size=3)
+    admitted = []
+
+    async def request(name, priority):
+        await admission.acquire(priority)
+        admitted.append(name)
+
+    async def scenario():
+        await admission.acquire()
+        tasks = [
+            asyncio.create_task(request("garmin 1", Priority.LOW)),
+            asyncio.create_task(request("parse", Priority.HIGH)),
+            asyncio.create_task(request("garmin 2", Priority.LOW)),
+        ]
+        await asyncio.sleep(0)
+        assert admission.queued == 3 and admitted == []
+
+        for _ in tasks:
+            admission.release()
+            await asyncio.sleep(0)
+        admission.release()
+        await asyncio.gather(*tasks)
+        assert admission.in_flight == 0
+
+    run(scenario)
+
+    assert admitted == ["parse", "garmin 1", "garmin 2"]
+
+
+def test_queue_full_is_shed():
+    """Test requests are shed at once when the queue is full"""
+    admission = controller(limit=1, queue_size=1)
+
+    async def scenario():
+        await admission.acquire()
+        waiting = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as ex:
+            await admission.acquire()
+        assert ex.value.reason == "queue_full"
+        assert ex.value.retry_after >= 1
+
+        admission.release()
+        await waiting
+
+    run(scenario)
+
+    assert admission._shed.value(controller="test", priority="high", reason="queue_full") == 1
+
+
+def test_high_priority_evicts_low_priority():
+    """Test a parse-only request takes the place of a queued Garmin-bound request"""
+    admission = controller(limit=1, queue_size=1)
+
+    async def scenario():
+        await admission.acquire()
+        low = asyncio.create_task(admission.acquire(Priority.LOW))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(admission.acquire(Priority.HIGH))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as ex:
+            await low
+        assert ex.value.reason == "evicted"
+
+        admission.release()
+        await high
+
+    run(scenario)
+
+    assert admission._shed.value(controller="test", priority="low", reason="evicted") == 1
+
+
+def test_queue_timeout():
+    """Test a request waiting longer than the queue timeout is shed and leaves the queue"""
+    admission = controller(limit=1, queue_timeout=0.01)
+
+    async def scenario():
+        await admission.acquire()
+        with pytest.raises(AdmissionRejected) as ex:
+            await admission.acquire()
+        assert ex.value.reason == "queue_timeout"
+        assert admission.queued == 0
+
+        admission.release()
+        assert admission.in_flight == 0
+
+    run(scenario)
+
+
+def test_cancelled_waiter_leaves_queue():
+    """Test a cancelled request does not keep a place or a slot"""
+    admission = controller(limit=1)
+
+    async def scenario():
+        await admission.acquire()
+        waiting = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        assert admission.queued == 0
+        admission.release()
+        assert admission.in_flight == 0
+
+    run(scenario)
+
+
+def get_remote():
+    return "remote"
+
+
+def test_admitted_route():
+    """Test saturated routes answer with the reject status and Retry-After"""
+    admission = controller(limit=1, queue_size=0)
+
+    class Route(AdmittedRoute):
+        low_priority_dependencies = (get_remote,)
+        reject_status_code = 429
+
+    Route.admission = admission
+    router = APIRouter(route_class=Route)
+
+    @router.get("/parse")
+    async def parse():
+        return {"ok": True}
+
+    @router.get("/remote")
+    async def remote(value: str = Depends(get_remote)):
+        return {"value": value}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    routes = {route.path: route for route in router.routes}
+    assert depends_on(routes["/remote"].dependant, Route.low_priority_dependencies)
+    assert not depends_on(routes["/parse"].dependant, Route.low_priority_dependencies)
+
+    assert client.get("/remote").json() == {"value": "remote"}
+    assert admission.in_flight == 0
+
+    async def hold():
+        await admission.acquire()
+
+    asyncio.run(hold())
+    response = client.get("/parse")
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["detail"] == "queue_full"
+    assert admission._shed.value(controller="test", priority="high", reason="queue_full") == 1
+
+
+def test_streaming_route_holds_slot_until_body_is_sent():
+    """Test the slot of a streaming endpoint is released once its body is sent, not when it returns"""
+    admission = controller(limit=1, queue_size=0)
+
+    class Route(AdmittedRoute):
+        pass
+
+    Route.admission = admission
+    router = APIRouter(route_class=Route)
+    in_flight = []
+
+    @router.get("/stream")
+    async def stream():
+        async def body():
+            for chunk in ("a", "b"):
+                in_flight.append(admission.in_flight)
+                yield chunk
+
+        return StreamingResponse(body())
+
+    app = FastAPI()
+    app.include_router(router)
+
+    assert TestClient(app).get("/stream").text == "ab"
+    assert in_flight == [1, 1]
+    assert admission.in_flight == 0
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from analysis.race_pace import (
+    PaceTableCache,
+    build_pace_tables,
+    predict_race_times,
+    race_distances,
+    read_race_times,
+)
+from parser.runfun_parser import RunFunParser
+
+
+def test_predict_race_times_uses_closest_reference():
+    """Test each distance is predicted with the Riegel model from the closest reference race"""
+    reference_distances = np.array([[5000.0, 42195.0], [10000.0, np.nan]])
+    reference_times = np.array([[1200.0, 10800.0], [2400.0, np.nan]])
+
+    times = predict_race_times(reference_distances, reference_times, np.array([5000.0, 10000.0, 21097.5]))
+
+    assert times[0, 0] == pytest.approx(1200.0)
+    assert times[0, 1] == pytest.approx(1200.0 * 2 ** 1.06)
+    assert times[0, 2] == pytest.approx(10800.0 * (21097.5 / 42195.0) ** 1.06)
+    assert times[1, 1] == pytest.approx(2400.0)
+    assert times[1, 0] == pytest.approx(2400.0 * 0.5 ** 1.06)
+
+
+def test_pace_table_speed_range():
+    """Test the speed range of a race pace spans the tolerance around the race speed"""
+    table = build_pace_tables({"ana": {10000: 2400}})["ana"]
+
+    low, high = table.speed_range(10000)
+    assert table.pace(10000) == pytest.approx(240.0)
+    assert low < 10000 / 2400 < high
+    assert low == round(10000 / (2400 * 1.02), 3)
+    assert table.speed_range(10000) is table.speed_range(10000)
+
+
+def test_pace_table_predicts_non_standard_distances():
+    """Test distances outside the table are predicted from the closest table distance"""
+    table = build_pace_tables({"ana": {5000: 1200}})["ana"]
+
+    assert table.race_time(2000) == pytest.approx(table.race_time(1609.344) * (2000 / 1609.344) ** 1.06)
+
+
+def test_build_pace_tables_rejects_invalid_race_times():
+    """Test athletes without valid reference race times are rejected"""
+    with pytest.raises(ValueError, match="no reference race time"):
+        build_pace_tables({"ana": {}})
+    with pytest.raises(ValueError, match="Invalid race time"):
+        build_pace_tables({"ana": {5000: 0}})
+
+
+def test_cache_reuses_tables_until_race_times_change():
+    """Test cached tables are kept per athlete, rebuilt when race times change and evicted when unused"""
+    cache = PaceTableCache(max_entries=2)
+
+    tables = cache.get_many({"ana": {5000: 1200}, "bia": {10000: 2700}})
+    assert cache.get("ana", {5000: 1200}) is tables["ana"]
+    assert cache.get("ana", {5000: 1150}) is not tables["ana"]
+    assert cache.get("ana", {5000: 1200}) is tables["ana"]
+    assert cache.get("bia", {10000: 2700}) is not tables["bia"]
+
+
+def test_race_distances_of_workout():
+    """Test the race distances targeted by a workout are listed once in order"""
+    workout = RunFunParser().parse("3x (2km ritmo de prova 10km + 2' zr) + 1km ritmo de prova 1500m + 1km ritmo de prova 10km")
+
+    assert race_distances(workout) == [10000.0, 1500.0]
+
+
+def test_read_race_times():
+    """Test race times are read in meters and seconds"""
+    rows = [{"athlete": "ana", "distance": "5km", "time": "19:30"},
+            {"athlete": "ana", "distance": "1500m", "time": "4:50"},
+            {"athlete": "bia", "distance": "21,0975km", "time": "1:25:00"}]
+
+    assert read_race_times(rows) == {
+        "ana": {5000.0: 1170.0, 1500.0: 290.0},
+        "bia": {21097.5: 5100.0},
+    }
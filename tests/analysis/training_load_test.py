@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+from analysis.training_load import TrainingLoadConfig, TrainingLoadEstimator
+from parser.runfun_parser import RunFunParser
+
+
+@pytest.fixture
+def parser():
+    return RunFunParser()
+
+
+@pytest.fixture
+def estimator():
+    return TrainingLoadEstimator(TrainingLoadConfig(resting_hr=50, max_hr=216, threshold_hr=186))
+
+
+def test_time_in_zone_with_repetitions(parser, estimator):
+    """Test time in zone of 15' zr + 2x (8' zm + 5' zr) + 10' zr"""
+    workout = parser.parse("15' zr + 2x (8' zm + 5' zr) + 10' zr")
+    load = estimator.estimate([workout])
+
+    summary = load.per_workout()[0]
+    assert summary["estimated_duration_in_secs"] == 3060
+    assert summary["time_in_zone_in_secs"]["ZR"] == 2100
+    assert summary["time_in_zone_in_secs"]["ZM"] == 960
+    assert summary["untargeted_in_secs"] == 0
+    assert summary["trimp"] > 0
+    assert summary["hr_tss"] > 0
+
+
+def test_distance_steps_use_default_pace(parser):
+    """Test distance steps are estimated from the default pace and carry no load"""
+    estimator = TrainingLoadEstimator(TrainingLoadConfig(default_pace=300))
+    load = estimator.estimate([parser.parse("20' zr + 2km + 10' zr")])
+
+    summary = load.per_workout()[0]
+    assert summary["estimated_duration_in_secs"] == 1800 + 600
+    assert summary["untargeted_in_secs"] == 600
+
+
+def test_higher_zones_produce_more_load(parser, estimator):
+    """Test TRIMP grows with intensity for the same duration"""
+    load = estimator.estimate([parser.parse("30' zr"), parser.parse("30' ze")])
+
+    assert load.trimp[1] > load.trimp[0]
+    assert load.hr_tss[1] > load.hr_tss[0]
+
+
+def test_weekly_aggregates(parser, estimator):
+    """Test workouts are grouped into weeks starting on Monday"""
+    workouts = [parser.parse("50' zr"), parser.parse("30' zm"), parser.parse("40' zr"), parser.parse("10' zr")]
+    dates = [date(2024, 10, 7), date(2024, 10, 13), date(2024, 10, 14), None]
+
+    weeks = estimator.estimate(workouts, dates).per_week()
+
+    assert [w["week_start"] for w in weeks] == ["2024-10-07", "2024-10-14"]
+    assert weeks[0]["workouts"] == 2
+    assert weeks[0]["estimated_duration_in_secs"] == 4800
+    assert weeks[0]["time_in_zone_in_secs"]["ZM"] == 1800
+    assert weeks[1]["estimated_duration_in_secs"] == 2400
+
+
+def test_dates_must_match_workouts(parser, estimator):
+    """Test a mismatched number of dates is rejected"""
+    with pytest.raises(ValueError):
+        estimator.estimate([parser.parse("50' zr")], [])
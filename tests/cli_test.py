@@ -0,0 +1,25 @@
+import json
+
+from cli import main
+
+
+def test_compile_csv(tmp_path, capsys):
+    """Test a CSV file is compiled with the expressions of the given column"""
+    source = tmp_path / "plan.csv"
+    source.write_text("athlete,workout\nana,50' zr\n", encoding="utf-8")
+
+    assert main(["compile", str(source), "--expression-column", "workout", "--workers", "1"]) == 0
+
+    assert json.loads(capsys.readouterr().out)["athlete"] == "ana"
+
+
+def test_compile_missing_expression_column(tmp_path, capsys):
+    """Test a CSV file without the expression column fails with a message and writes no output"""
+    source = tmp_path / "plan.csv"
+    source.write_text("athlete,expression\nana,50' zr\n", encoding="utf-8")
+    output = tmp_path / "payloads.ndjson"
+
+    assert main(["compile", str(source), "--expression-column", "workout", "-o", str(output)]) == 2
+
+    assert "must have a 'workout' column" in capsys.readouterr().err
+    assert not output.exists()
@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+from compiler.batch import BatchCompiler, read_csv, read_lines
+
+
+EXPRESSIONS = "50' zr\n\n15' zr + 2x (8' zm + 5' zr) + 10' zr\n# comment\n10' zr + 2x (1' zx + 1' zr)\n"
+
+
+def run(compiler, records):
+    output = io.StringIO()
+    report = compiler.run(records, output)
+    return report, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_read_lines_skips_blank_lines_and_comments():
+    """Test line numbers are kept when blank lines and comments are skipped"""
+    records = list(read_lines(io.StringIO(EXPRESSIONS)))
+
+    assert [number for number, _, _, _ in records] == [1, 3, 5]
+
+
+def test_read_csv_keeps_athlete_and_date():
+    """Test CSV records carry the athlete and date columns"""
+    f = io.StringIO("athlete,date,expression\nana,2024-10-07,50' zr\nbia,2024-10-08,30' zm\n")
+
+    assert list(read_csv(f)) == [
+        (2, "ana", "2024-10-07", "50' zr"),
+        (3, "bia", "2024-10-08", "30' zm"),
+    ]
+
+
+def test_read_csv_requires_expression_column():
+    """Test a CSV file without the expression column is rejected"""
+    with pytest.raises(ValueError):
+        list(read_csv(io.StringIO("athlete,date\nana,2024-10-07\n")))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compile_keeps_order_and_reports_errors(workers):
+    """Test payloads are written in input order and failing lines are reported"""
+    compiler = BatchCompiler(workers=workers, chunk_size=2)
+    records = list(read_lines(io.StringIO(EXPRESSIONS * 5)))
+
+    report, results = run(compiler, records)
+
+    assert [r["line"] for r in results] == [number for number, _, _, _ in records]
+    assert report.compiled == 10
+    assert report.failed == 5
+    assert "error" in results[2]
+    assert results[1]["payload"]["estimatedDurationInSecs"] == 3060
+
+
+def test_compile_rejects_invalid_payloads():
+    """Test payloads Garmin Connect would reject are reported with the path of the problem"""
+    output = io.StringIO()
+    report = BatchCompiler(workers=1).run(read_lines(io.StringIO("10' zr + 200x (3' ze + 2' zr)\n50' zr\n")), output)
+
+    first, second = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert report.failed == 1
+    assert first["errors"] == [
+        {"path": "workoutSegments[0].workoutSteps[1].numberOfIterations", "message": "must be at most 99, got 200"}
+    ]
+    assert "payload" in second
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compile_race_pace_per_athlete(workers):
+    """Test race pace targets come from the race times of the athlete of each record"""
+    compiler = BatchCompiler(workers=workers, chunk_size=1, race_times={"ana": {10000: 2400}, "bia": {10000: 3000}})
+    f = io.StringIO("athlete,expression\nana,2km ritmo de prova 10km\nbia,2km ritmo de prova 10km\ncaio,2km ritmo de prova 10km\n")
+
+    report, results = run(compiler, read_csv(f))
+
+    ana, bia = (r["payload"]["workoutSegments"][0]["workoutSteps"][0] for r in results[:2])
+    assert ana["targetValueOne"] > bia["targetValueOne"]
+    assert report.failed == 1
+    assert results[2]["error"] == "No race times for athlete caio"
@@ -0,0 +1,104 @@
+import json
+
+import msgpack
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from negotiation import JSON, MSGPACK, NegotiatedResponse, NegotiatedRoute, negotiate
+
+
+class EchoRequest(BaseModel):
+    workout_expr: str
+    repeat: int = 1
+
+
+@pytest.fixture
+def client():
+    router = APIRouter(route_class=NegotiatedRoute)
+
+    @router.post("/echo")
+    def echo(request: EchoRequest):
+        return NegotiatedResponse(status_code=200, content={"workouts": [request.workout_expr] * request.repeat})
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON),
+    ("", JSON),
+    ("*/*", JSON),
+    ("application/json", JSON),
+    ("application/msgpack", MSGPACK),
+    ("application/x-msgpack", MSGPACK),
+    ("application/json, application/msgpack", JSON),
+    ("application/msgpack, application/json;q=0.9", MSGPACK),
+    ("application/msgpack;q=0.5, */*", JSON),
+    ("application/msgpack;q=0, application/json;q=0.1", JSON),
+    ("text/html, application/msgpack", MSGPACK),
+])
+def test_negotiate(accept, expected):
+    """Test MessagePack is only chosen when the client prefers it to JSON"""
+    assert negotiate(accept) == expected
+
+
+def test_json_is_the_default(client):
+    """Test requests that do not mention MessagePack are answered in JSON"""
+    response = client.post("/echo", json={"workout_expr": "10' zr", "repeat": 2})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"workouts": ["10' zr", "10' zr"]}
+
+
+def test_msgpack_request_and_response(client):
+    """Test a MessagePack body is validated like JSON and the response follows the Accept header"""
+    response = client.post(
+        "/echo",
+        content=msgpack.packb({"workout_expr": "10' zr", "repeat": 2}),
+        headers={"Content-Type": MSGPACK, "Accept": MSGPACK},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK
+    assert response.headers["vary"] == "Accept"
+    assert msgpack.unpackb(response.content) == {"workouts": ["10' zr", "10' zr"]}
+
+
+def test_encodings_are_independent(client):
+    """Test the request and response encodings are negotiated separately"""
+    response = client.post(
+        "/echo",
+        content=msgpack.packb({"workout_expr": "10' zr"}),
+        headers={"Content-Type": MSGPACK},
+    )
+    assert response.json() == {"workouts": ["10' zr"]}
+
+    response = client.post(
+        "/echo",
+        content=json.dumps({"workout_expr": "10' zr"}),
+        headers={"Content-Type": JSON, "Accept": MSGPACK},
+    )
+    assert msgpack.unpackb(response.content) == {"workouts": ["10' zr"]}
+
+
+def test_invalid_msgpack_body(client):
+    """Test a body that is not MessagePack is rejected with 400"""
+    response = client.post("/echo", content=b"\xc1", headers={"Content-Type": MSGPACK})
+
+    assert response.status_code == 400
+
+
+def test_msgpack_body_is_validated(client):
+    """Test a MessagePack body failing the request model is rejected with 422"""
+    response = client.post(
+        "/echo",
+        content=msgpack.packb({"repeat": "many"}),
+        headers={"Content-Type": MSGPACK},
+    )
+
+    assert response.status_code == 422
+    assert {error["loc"][-1] for error in response.json()["detail"]} == {"workout_expr", "repeat"}
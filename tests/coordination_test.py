@@ -0,0 +1,93 @@
+import sys
+
+import pytest
+
+from coordination import CoordinationUnavailable, FailoverBackend, LocalBackend, create_backend
+from metrics import MetricsRegistry
+
+
+class UnavailableBackend(LocalBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        raise CoordinationUnavailable("connection refused")
+
+
+def test_values_expire():
+    """Test values are dropped once their time to live has passed"""
+    backend = LocalBackend()
+    backend.set("key", b"value", ttl=10)
+    assert backend.get("key") == b"value"
+
+    backend.set("key", b"value", ttl=0)
+    assert backend.get("key") is None
+
+
+def test_token_bucket_allows_bursts_then_waits():
+    """Test the bucket allows a burst and then asks to wait for the next token"""
+    backend = LocalBackend()
+
+    assert [backend.take_tokens("rate", rate=2, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert 0 < backend.take_tokens("rate", rate=2, burst=3) <= 0.5
+    assert backend.take_tokens("other", rate=2, burst=3) == 0
+
+
+def test_lock_is_released_only_by_its_owner():
+    """Test a held lock cannot be taken and is only released by its owner"""
+    backend = LocalBackend()
+    owner = backend.acquire_lock("lock", ttl=10)
+
+    assert owner is not None
+    assert backend.acquire_lock("lock", ttl=10) is None
+    backend.release_lock("lock", "someone else")
+    assert backend.acquire_lock("lock", ttl=10) is None
+    backend.release_lock("lock", owner)
+    assert backend.acquire_lock("lock", ttl=10) is not None
+
+
+def test_expired_lock_can_be_taken():
+    """Test the lock of a crashed owner is free once its time to live has passed"""
+    backend = LocalBackend()
+    backend.acquire_lock("lock", ttl=0)
+
+    assert backend.acquire_lock("lock", ttl=10) is not None
+
+
+def test_failover_uses_local_state_while_store_is_down():
+    """Test calls fall back to the local backend and the store is not retried immediately"""
+    registry = MetricsRegistry()
+    primary = UnavailableBackend()
+    backend = FailoverBackend(primary, retry_after=60, registry=registry)
+
+    backend.fallback.set("key", b"value", ttl=10)
+    assert backend.get("key") == b"value"
+    assert backend.get("key") == b"value"
+    assert primary.calls == 1
+    assert registry.counter("coordination_fallback_total", "").value() == 2
+
+
+def test_create_backend():
+    """Test the in-process backend is used without a store URL"""
+    assert isinstance(create_backend(None), LocalBackend)
+    with pytest.raises(ValueError):
+        create_backend("memcached://localhost")
+
+
+def test_create_backend_without_redis_package(monkeypatch):
+    """Test a Redis URL falls back to the in-process backend when the redis package is missing"""
+    monkeypatch.setitem(sys.modules, "redis", None)
+
+    assert isinstance(create_backend("redis://localhost:6379/0"), LocalBackend)
+
+
+def test_create_backend_with_unreachable_store():
+    """Test a Redis store that cannot be reached at startup is replaced by the local state"""
+    pytest.importorskip("redis")
+    backend = create_backend("redis://127.0.0.1:1/0")
+
+    backend.set("key", b"value", ttl=10)
+    assert backend.get("key") == b"value"
+    assert isinstance(backend, FailoverBackend) and backend.fallback.get("key") == b"value"
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from deadline import (
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    call_timeout,
+    current_deadline,
+    deadline_scope,
+    requested_budget,
+)
+
+
+def test_call_timeout_without_deadline():
+    """Test the configured timeouts are used outside of a request"""
+    assert current_deadline() is None
+    assert call_timeout(3, 20) == (3, 20)
+
+
+def test_call_timeout_is_bounded_by_deadline():
+    """Test timeouts shrink to the remaining budget and calls fail once it is spent"""
+    with deadline_scope(1):
+        connect, read = call_timeout(3, 20)
+        assert connect <= 1 and read <= 1
+        assert connect > 0.9
+
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            call_timeout(3, 20)
+
+
+def test_nested_scope_never_extends_deadline():
+    """Test a nested scope keeps the earlier deadline of its enclosing scope"""
+    with deadline_scope(1) as outer:
+        with deadline_scope(10) as inner:
+            assert inner is outer
+        with deadline_scope(0.5) as inner:
+            assert inner.expires_at < outer.expires_at
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def test_detached_scope_has_its_own_budget():
+    """Test a detached scope replaces the deadline of its enclosing scope"""
+    with deadline_scope(0.5) as outer:
+        with deadline_scope(10, detached=True) as inner:
+            assert inner.expires_at > outer.expires_at
+            assert current_deadline() is inner
+        assert current_deadline() is outer
+
+
+def test_deadline_reaches_worker_threads():
+    """Test blocking calls run with asyncio.to_thread see the deadline of their request"""
+    async def scenario():
+        with deadline_scope(5) as deadline:
+            return deadline, await asyncio.to_thread(current_deadline)
+
+    deadline, seen = asyncio.run(scenario())
+    assert seen is deadline
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 30),
+    ("5", 5),
+    ("2.5", 2.5),
+    ("600", 120),
+    ("0", 30),
+    ("-1", 30),
+    ("soon", 30),
+    ("nan", 30),
+])
+def test_requested_budget(value, expected):
+    """Test the header budget falls back to the default and is clamped to the maximum"""
+    assert requested_budget(value, default=30, maximum=120) == expected
+
+
+def test_middleware_sets_deadline_for_dependencies():
+    """Test the header deadline is seen by sync dependencies and async endpoints"""
+    def remaining_in_dependency():
+        return current_deadline().remaining()
+
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware, default=30, maximum=120)
+
+    @app.get("/remaining")
+    async def remaining(in_dependency: float = Depends(remaining_in_dependency)):
+        return {"dependency": in_dependency, "endpoint": current_deadline().remaining()}
+
+    client = TestClient(app)
+
+    limited = client.get("/remaining", headers={"X-Request-Timeout": "2"}).json()
+    assert 1.5 < limited["endpoint"] <= limited["dependency"] <= 2
+
+    default = client.get("/remaining").json()
+    assert 29 < default["endpoint"] <= 30
@@ -0,0 +1,97 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from garmin.cache import NOT_MODIFIED, CacheEntry, ReadThroughCache
+from garmin.connect import GarminConnectClient
+
+
+def response(status_code=200, body=None, headers=None):
+    r = MagicMock()
+    r.status_code = status_code
+    r.json.return_value = body
+    r.headers = headers or {}
+    return r
+
+
+@pytest.fixture
+def cache():
+    return ReadThroughCache(ttl=60)
+
+
+@pytest.fixture
+def client(cache):
+    with patch("garmin.connect.cloudscraper.CloudScraper"):
+        client = GarminConnectClient(MagicMock(token="token", cookies={}), cache=cache.for_account("athlete"))
+    return client
+
+
+def test_cache_hit_skips_fetch(cache):
+    """Test a fresh entry is served without fetching"""
+    fetch = MagicMock(return_value=CacheEntry({"workouts": []}))
+
+    assert cache.get("athlete", ("workouts",), fetch) == {"workouts": []}
+    assert cache.get("athlete", ("workouts",), fetch) == {"workouts": []}
+    fetch.assert_called_once_with(None)
+
+
+def test_expired_entry_is_revalidated(cache):
+    """Test an expired entry with an ETag is revalidated and kept when not modified"""
+    cache.ttl = 0
+    cache.get("athlete", ("workout", 1), lambda entry: CacheEntry({"workoutId": 1}, etag='"v1"'))
+
+    fetch = MagicMock(return_value=NOT_MODIFIED)
+    assert cache.get("athlete", ("workout", 1), fetch) == {"workoutId": 1}
+    assert fetch.call_args[0][0].etag == '"v1"'
+
+
+def test_invalidate_is_scoped_to_account_and_kind(cache):
+    """Test invalidation only drops the matching account and kinds"""
+    cache.get("athlete", ("workouts",), lambda entry: CacheEntry(1))
+    cache.get("athlete", ("calendar", 2024, 10), lambda entry: CacheEntry(2))
+    cache.get("coach", ("workouts",), lambda entry: CacheEntry(3))
+
+    cache.invalidate("athlete", "workouts")
+
+    fetch = MagicMock(return_value=CacheEntry(4))
+    assert cache.get("athlete", ("workouts",), fetch) == 4
+    assert cache.get("athlete", ("calendar", 2024, 10), fetch) == 2
+    assert cache.get("coach", ("workouts",), fetch) == 3
+    fetch.assert_called_once()
+
+
+def test_fetch_racing_an_invalidation_is_not_stored(cache):
+    """Test a read started before a write's invalidation does not cache the data from before the write"""
+    def fetch_before_write(entry):
+        cache.invalidate("athlete", "workouts")
+        return CacheEntry(["old"])
+
+    assert cache.get("athlete", ("workouts",), fetch_before_write) == ["old"]
+
+    fetch = MagicMock(return_value=CacheEntry(["old", "new"]))
+    assert cache.get("athlete", ("workouts",), fetch) == ["old", "new"]
+    fetch.assert_called_once()
+
+
+def test_client_sends_conditional_request(client, cache):
+    """Test the client revalidates with If-None-Match and reuses the cached body on 304"""
+    cache.ttl = 0
+    client.session.get.return_value = response(body=[{"workoutId": 1}], headers={"ETag": '"v1"'})
+    assert client.list_workouts() == [{"workoutId": 1}]
+
+    client.session.get.return_value = response(status_code=304)
+    assert client.list_workouts() == [{"workoutId": 1}]
+    assert client.session.get.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+
+
+def test_schedule_invalidates_calendar(client):
+    """Test scheduling a workout drops the cached calendar"""
+    client.session.get.return_value = response(body={"calendarItems": []})
+    client.get_calendar(2024, 10)
+    assert client.session.get.call_args.args[0].endswith("/year/2024/month/9")
+
+    client.session.post.return_value = response(body={"workoutScheduleId": 7})
+    client.schedule_workout(1, MagicMock(strftime=lambda fmt: "2024-10-10"))
+
+    client.get_calendar(2024, 10)
+    assert client.session.get.call_count == 2
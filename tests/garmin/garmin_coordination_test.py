@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import count
+from unittest.mock import MagicMock, patch
+
+import pytest
+from requests.cookies import RequestsCookieJar, create_cookie
+
+from coordination import LocalBackend
+from deadline import DeadlineExceeded, deadline_scope
+from garmin.authorization import GarminAuthorization
+from garmin.connect import GarminConnectClient
+from garmin.coordination import AccountCoordinator
+from metrics import MetricsRegistry
+from parser.runfun_parser import RunFunParser
+from plan.sync import PlanSynchronizer, PlanSyncStore
+
+
+def authorization(token="token", expires_in=3600, logged_in=None):
+    cookies = RequestsCookieJar()
+    cookies.set_cookie(create_cookie("SESSIONID", "abc", domain="connect.garmin.com"))
+    return GarminAuthorization(token, expires_in, "refresh", 7200, cookies, logged_in=logged_in)
+
+
+def coordinator(backend, **kwargs):
+    return AccountCoordinator("athlete@example.com", backend, registry=MetricsRegistry(), poll_interval=0.01, **kwargs)
+
+
+def test_authorization_round_trip():
+    """Test the tokens, cookies and login time survive serialization"""
+    original = authorization()
+    restored = GarminAuthorization.from_dict(original.to_dict())
+
+    assert restored.token == "token"
+    assert restored.cookies.get("SESSIONID") == "abc"
+    assert restored.expires_in() == pytest.approx(original.expires_in(), abs=1)
+
+
+def test_login_is_shared_between_replicas():
+    """Test concurrent replicas log in once and share the authorization"""
+    backend = LocalBackend()
+    replicas = [coordinator(backend) for _ in range(4)]
+    logins = []
+
+    def authenticate():
+        logins.append(1)
+        time.sleep(0.05)
+        return authorization()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        tokens = list(pool.map(lambda i: replicas[i % 4].authorization(authenticate).token, range(8)))
+
+    assert tokens == ["token"] * 8
+    assert len(logins) == 1
+
+
+def test_login_again_before_the_token_expires():
+    """Test a token close to its expiry is not reused"""
+    backend = LocalBackend()
+    first = coordinator(backend)
+    first.authorization(lambda: authorization("old", logged_in=datetime.now() - timedelta(seconds=3570)))
+
+    assert coordinator(backend).authorization(lambda: authorization("new")).token == "new"
+
+
+def test_rejected_token_is_dropped():
+    """Test invalidating the shared authorization makes the next request log in again"""
+    backend = LocalBackend()
+    account = coordinator(backend)
+    old = account.authorization(lambda: authorization("old"))
+
+    account.invalidate_authorization(authorization("other"))
+    assert account.authorization(lambda: authorization("new")).token == "old"
+
+    account.invalidate_authorization(old)
+    assert account.authorization(lambda: authorization("new")).token == "new"
+
+
+def test_throttle_shares_the_rate_between_replicas():
+    """Test calls beyond the burst wait for the shared bucket to refill"""
+    backend = LocalBackend()
+    replicas = [coordinator(backend, rate=20, burst=2) for _ in range(2)]
+
+    start = time.monotonic()
+    for i in range(6):
+        replicas[i % 2].throttle()
+
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+
+
+def test_throttle_respects_the_deadline():
+    """Test waiting for the rate limit past the deadline raises DeadlineExceeded"""
+    account = coordinator(LocalBackend(), rate=0.1, burst=1)
+    account.throttle()
+
+    with deadline_scope(0.5), pytest.raises(DeadlineExceeded):
+        account.throttle()
+
+
+def test_uploads_with_the_same_key_run_once():
+    """Test concurrent uploads with the same idempotency key share the result of the first one"""
+    backend = LocalBackend()
+    replicas = [coordinator(backend) for _ in range(2)]
+    calls = []
+    started = threading.Event()
+
+    def upload():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda i: replicas[i % 2].upload("plan:a:2024-10-07", upload), range(4)))
+
+    assert results == [42] * 4
+    assert len(calls) == 1
+    assert replicas[0].upload("plan:a:2024-10-08", lambda: 43) == 43
+
+
+def test_completed_upload_is_not_reused():
+    """Test an identical upload made after the first one completed is made again"""
+    account = coordinator(LocalBackend())
+    ids = iter([42, 43])
+
+    assert account.upload("request:1", lambda: next(ids)) == 42
+    assert account.upload("request:1", lambda: next(ids)) == 43
+
+
+def test_failed_upload_is_retried_by_the_next_caller():
+    """Test a failed upload stores no result so the next identical upload is made"""
+    account = coordinator(LocalBackend())
+
+    def fail():
+        raise RuntimeError("Garmin Connect is down")
+
+    with pytest.raises(RuntimeError):
+        account.upload("request:1", fail)
+    assert account.upload("request:1", lambda: 42) == 42
+
+
+def test_identical_workouts_for_different_dates_are_distinct():
+    """Test a plan with the same workout on several dates creates one workout per date"""
+    ids = count(1000)
+    lock = threading.Lock()
+
+    def post(url, **kwargs):
+        time.sleep(0.02)
+        with lock:
+            value = next(ids)
+        return MagicMock(status_code=200, json=lambda: {"workoutId": value, "workoutScheduleId": value})
+
+    with patch("garmin.connect.cloudscraper.CloudScraper"):
+        client = GarminConnectClient(authorization(), coordinator=coordinator(LocalBackend()))
+        client.session.post.side_effect = post
+        synchronizer = PlanSynchronizer("plan", RunFunParser(), PlanSyncStore())
+        days = [date(2024, 10, 7), date(2024, 10, 9), date(2024, 10, 11)]
+        diff = synchronizer.diff([("50' zr", day) for day in days])
+        outcomes = asyncio.run(synchronizer.apply(diff, client))
+
+    assert [outcome["status"] for outcome in outcomes] == ["ok"] * 3
+    workout_ids = {entry.workout_id for entry in synchronizer.store.get("plan").values()}
+    assert len(workout_ids) == 3
@@ -0,0 +1,82 @@
+import pytest
+
+from analysis.race_pace import PaceTable
+from garmin.deserializer import GarminDeserializer
+from garmin.serializer import GarminSerializer
+from library.codec import workout_to_dict
+from models.step import RepeatedStep
+from parser.runfun_parser import RunFunParser
+from parser.runfun_printer import RunFunPrinter
+
+
+@pytest.fixture
+def deserializer():
+    return GarminDeserializer()
+
+
+@pytest.mark.parametrize("expression", [
+    "50' zr",
+    "15' zr + 2x (8' zm + 5' zr) + 10' zr",
+    "10' zr + 5x (400m + 1' zr) + 1,5km + 15' zr",
+])
+def test_round_trip(deserializer, expression):
+    """Test deserializing a serialized workout gives back the parsed workout and expression"""
+    workout = RunFunParser().parse(expression)
+
+    result = deserializer.deserialize(GarminSerializer().serialize(workout))
+
+    assert workout_to_dict(result) == workout_to_dict(workout)
+    assert RunFunPrinter().print(result) == expression
+
+
+@pytest.mark.parametrize("pace_table", [None, PaceTable([5000, 10000], [1200, 2500])])
+def test_race_pace_round_trip(deserializer, pace_table):
+    """Test race-pace steps keep their race distance, and their speed range when one was serialized"""
+    expression = "10' zr + 4x (1km ritmo de prova 5km + 2' zr) + 3km ritmo de prova 10km"
+    workout = RunFunParser().parse(expression)
+
+    result = deserializer.deserialize(GarminSerializer(pace_table=pace_table).serialize(workout))
+
+    assert RunFunPrinter().print(result) == expression
+    target = result.steps[2].target
+    assert target.race_distance == 10000
+    assert target.values == (list(pace_table.speed_range(10000)) if pace_table else None)
+
+
+def test_steps_follow_step_order(deserializer):
+    """Test steps are read in stepOrder rather than list order"""
+    payload = GarminSerializer().serialize(RunFunParser().parse("10' zr + 3x (1km + 2' zr) + 5' zr"))
+    payload["workoutSegments"][0]["workoutSteps"].reverse()
+    payload["workoutSegments"][0]["workoutSteps"][1]["workoutSteps"].reverse()
+
+    workout = deserializer.deserialize(payload)
+
+    assert RunFunPrinter().print(workout) == "10' zr + 3x (1km + 2' zr) + 5' zr"
+    assert isinstance(workout.steps[1], RepeatedStep)
+
+
+def test_garmin_connect_fields(deserializer):
+    """Test fields only sent by Garmin Connect, such as float values and extra keys, are accepted"""
+    payload = GarminSerializer().serialize(RunFunParser().parse("10' zr + 2km + 5' zr"))
+    for step in payload["workoutSegments"][0]["workoutSteps"]:
+        step["endConditionValue"] = float(step["endConditionValue"])
+        step["stepAudioNote"] = None
+    payload["workoutId"] = 123
+
+    assert RunFunPrinter().print(deserializer.deserialize(payload)) == "10' zr + 2km + 5' zr"
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"endCondition": {"conditionTypeKey": "lap.button"}}, "Unsupported end condition"),
+    ({"targetType": {"workoutTargetTypeKey": "pace.zone"}}, "race-pace steps"),
+    ({"targetType": {"workoutTargetTypeKey": "power.zone"}}, "Unsupported target type"),
+    ({"targetValueOne": None}, "custom range"),
+    ({"stepType": {"stepTypeKey": "other"}}, "Unsupported step type"),
+])
+def test_unsupported_steps(deserializer, change, message):
+    """Test steps that cannot be modeled raise a ValueError"""
+    payload = GarminSerializer().serialize(RunFunParser().parse("10' zr"))
+    payload["workoutSegments"][0]["workoutSteps"][0].update(change)
+
+    with pytest.raises(ValueError, match=message):
+        deserializer.deserialize(payload)
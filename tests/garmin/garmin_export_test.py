@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock
+
+from deadline import current_deadline, deadline_scope
+from garmin.export import AccountExporter
+from garmin.serializer import GarminSerializer
+from library.store import WorkoutLibrary
+from parser.runfun_parser import RunFunParser
+
+
+def account(count, unsupported=(), missing=()):
+    """
+    A client for an account with `count` workouts, some of which cannot be modeled or downloaded.
+    """
+    workouts = {}
+    for workout_id in range(1, count + 1):
+        payload = GarminSerializer().serialize(RunFunParser().parse(f"{workout_id}' zr + 1km"))
+        payload.update({"workoutId": workout_id, "workoutName": f"Workout {workout_id}"})
+        if workout_id in unsupported:
+            payload["workoutSegments"][0]["workoutSteps"][0]["endCondition"] = {"conditionTypeKey": "lap.button"}
+        workouts[workout_id] = payload
+
+    def get_workout(workout_id):
+        if workout_id in missing:
+            raise ValueError("Not found")
+        return workouts[workout_id]
+
+    client = MagicMock()
+    client.list_workouts.side_effect = lambda start, limit: [
+        {"workoutId": w["workoutId"], "workoutName": w["workoutName"]}
+        for w in list(workouts.values())[start:start + limit]
+    ]
+    client.get_workout.side_effect = get_workout
+    return client
+
+
+def collect(iterator):
+    async def run():
+        return [item async for item in iterator]
+
+    return asyncio.run(run())
+
+
+def test_export_every_workout():
+    """Test every workout of the account is exported once with its expression"""
+    client = account(23)
+
+    records = collect(AccountExporter(client, page_size=5, limit=2).records())
+
+    assert sorted(record["workout_id"] for record in records) == list(range(1, 24))
+    record = next(record for record in records if record["workout_id"] == 7)
+    assert record["expression"] == "7' zr + 1km"
+    assert record["workout_name"] == "Workout 7"
+    assert record["payload"]["workoutId"] == 7
+    assert "error" not in record
+    # 5 pages of 5, requested 2 at a time, the last window ending on the short page.
+    assert client.list_workouts.call_count == 6
+
+
+def test_export_reports_failures_as_ndjson():
+    """Test workouts that cannot be modeled or downloaded are reported and counted in the summary"""
+    client = account(6, unsupported={2}, missing={5})
+
+    lines = [json.loads(line) for line in collect(AccountExporter(client, page_size=4).ndjson())]
+
+    assert lines[-1] == {"summary": {"exported": 6, "failed": 2, "complete": True}}
+    records = {line["workout_id"]: line for line in lines[:-1]}
+    assert "Unsupported end condition" in records[2]["error"]
+    assert records[2]["payload"] is not None and records[2]["expression"] is None
+    assert records[5]["error"].startswith("Download failed")
+
+
+def test_export_to_library():
+    """Test modeled workouts are stored in the library in batches"""
+    client = account(7, unsupported={3})
+    library = WorkoutLibrary()
+
+    result = asyncio.run(AccountExporter(client, page_size=3).to_library(library, batch_size=2))
+
+    assert result["exported"] == 7
+    assert result["stored"] == 6
+    assert [failure["workout_id"] for failure in result["failed"]] == [3]
+    assert library.count() == 6
+
+
+def test_listing_failure_ends_the_stream_with_an_error_and_summary():
+    """Test a listing failure mid-export is streamed as an error line followed by the summary"""
+    client = account(6)
+    list_workouts = client.list_workouts.side_effect
+
+    def failing_list_workouts(start, limit):
+        if start >= 4:
+            raise ConnectionError("Garmin Connect is down")
+        return list_workouts(start, limit)
+
+    client.list_workouts.side_effect = failing_list_workouts
+
+    lines = [json.loads(line) for line in collect(AccountExporter(client, page_size=2, limit=2).ndjson())]
+
+    assert len(lines) == 6
+    assert lines[-2] == {"error": "Export stopped: Garmin Connect is down"}
+    assert lines[-1] == {"summary": {"exported": 4, "failed": 0, "complete": False}}
+
+
+def test_export_calls_are_not_bound_by_the_request_deadline():
+    """Test each Garmin Connect call of an export gets a budget of its own once the request deadline passed"""
+    client = account(3)
+    budgets = []
+    get_workout = client.get_workout.side_effect
+
+    def timed_get_workout(workout_id):
+        budgets.append(current_deadline().remaining())
+        return get_workout(workout_id)
+
+    client.get_workout.side_effect = timed_get_workout
+
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        records = collect(AccountExporter(client, call_budget=5).records())
+
+    assert len(records) == 3
+    assert all(4 < budget <= 5 for budget in budgets)
@@ -0,0 +1,122 @@
+import io
+import struct
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+from analysis.race_pace import build_pace_tables
+from garmin.fit_archive import iter_fit_archive
+from garmin.fit_encoder import FitWorkoutEncoder, fit_crc
+from parser.runfun_parser import HeartRateZoneConfig, RunFunParser
+
+
+@pytest.fixture
+def parser():
+    return RunFunParser()
+
+
+@pytest.fixture
+def encoder():
+    return FitWorkoutEncoder()
+
+
+def read_records(data: bytes):
+    """Minimal FIT reader returning (global message number, field values) for each data message."""
+    header_size, _, _, data_size, signature = struct.unpack_from("<BBHI4s", data)
+    assert signature == b".FIT"
+
+    definitions, records = {}, []
+    offset, end = header_size, header_size + data_size
+    while offset < end:
+        header = data[offset]
+        local_type = header & 0x0F
+        offset += 1
+        if header & 0x40:
+            _, _, global_number, field_count = struct.unpack_from("<BBHB", data, offset)
+            offset += 5
+            fields = [struct.unpack_from("<BBB", data, offset + 3 * i) for i in range(field_count)]
+            definitions[local_type] = (global_number, fields)
+            offset += 3 * field_count
+        else:
+            global_number, fields = definitions[local_type]
+            values = {}
+            for number, size, base_type in fields:
+                raw = data[offset:offset + size]
+                if base_type == 0x07:
+                    values[number] = raw.split(b"\x00")[0].decode("utf-8")
+                else:
+                    values[number] = int.from_bytes(raw, "little")
+                offset += size
+            records.append((global_number, values))
+    return records
+
+
+def test_encode_header_and_crc(parser, encoder):
+    """Test the file header and both CRCs are valid"""
+    data = encoder.encode(parser.parse("50' zr"))
+
+    assert data[0] == 14
+    assert fit_crc(data[:14]) == 0
+    assert fit_crc(data) == 0
+
+
+def test_encode_steps_with_repetitions(parser, encoder):
+    """Test 15' zr + 2x (8' zm + 5' zr) + 10' zr is encoded with a repeat step after its children"""
+    created = datetime(2024, 10, 10, tzinfo=timezone.utc)
+    records = read_records(encoder.encode(parser.parse("15' zr + 2x (8' zm + 5' zr) + 10' zr"), created))
+
+    file_id = [values for number, values in records if number == 0][0]
+    assert file_id[0] == FitWorkoutEncoder.FILE_TYPE_WORKOUT
+    assert file_id[4] == int(created.timestamp()) - FitWorkoutEncoder.FIT_EPOCH
+
+    workout = [values for number, values in records if number == 26][0]
+    assert workout[4] == 1
+    assert workout[6] == 5
+
+    steps = [values for number, values in records if number == 27]
+    assert [s[254] for s in steps] == [0, 1, 2, 3, 4]
+    assert steps[0][2] == 900_000
+    assert (steps[1][5], steps[1][6]) == tuple(v + 100 for v in HeartRateZoneConfig.get_zone_range("ZM"))
+    assert steps[3][1] == FitWorkoutEncoder.DURATION_REPEAT_UNTIL_STEPS_COMPLETE
+    assert steps[3][2] == 1
+    assert steps[3][4] == 2
+
+
+def test_encode_distance_step(parser, encoder):
+    """Test a distance step is encoded in centimeters without target"""
+    records = read_records(encoder.encode(parser.parse("10' zr + 2km + 10' zr")))
+
+    step = [values for number, values in records if number == 27][1]
+    assert step[1] == FitWorkoutEncoder.DURATION_DISTANCE
+    assert step[2] == 200_000
+    assert step[3] == FitWorkoutEncoder.TARGET_OPEN
+
+
+def test_race_pace_step_is_encoded_as_speed_target(parser):
+    """Test a race pace step is encoded as a custom speed range in millimeters per second"""
+    table = build_pace_tables({"ana": {10000: 2400}})["ana"]
+    records = read_records(FitWorkoutEncoder(pace_table=table).encode(parser.parse("10' zr + 2km ritmo de prova 10km")))
+
+    step = [values for number, values in records if number == 27][1]
+    low, high = table.speed_range(10000)
+    assert step[3] == FitWorkoutEncoder.TARGET_SPEED
+    assert (step[5], step[6]) == (round(low * 1000), round(high * 1000))
+
+
+def test_buffer_is_reused_between_workouts(parser, encoder):
+    """Test encoding a shorter workout after a longer one yields a valid file"""
+    encoder.encode(parser.parse("15' zr + 2x (8' zm + 5' zr) + 3x (1' ze + 1' zr) + 10' zr"))
+    data = encoder.encode(parser.parse("50' zr"))
+
+    assert fit_crc(data) == 0
+    assert len([r for r in read_records(data) if r[0] == 27]) == 1
+
+
+def test_archive_contains_every_file(parser):
+    """Test the streamed ZIP archive can be read back"""
+    workouts = [(f"{i}.fit", parser.parse(f"{i + 10}' zr")) for i in range(50)]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_fit_archive(iter(workouts)))))
+
+    assert archive.namelist() == [name for name, _ in workouts]
+    assert fit_crc(archive.read("49.fit")) == 0
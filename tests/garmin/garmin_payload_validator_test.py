@@ -0,0 +1,92 @@
+import copy
+
+import pytest
+
+from garmin.exceptions import GarminPayloadValidationError
+from garmin.schema import MAX_STEPS, PayloadValidator, validate_payload
+from garmin.serializer import GarminSerializer
+from parser.runfun_parser import RunFunParser
+
+
+@pytest.fixture
+def validator():
+    return PayloadValidator()
+
+
+@pytest.fixture
+def payload():
+    workout = RunFunParser().parse("10' zr + 5x (3' ze + 400m) + 15' zr")
+    return GarminSerializer().serialize(workout)
+
+
+@pytest.mark.parametrize("expression", [
+    "50' zr",
+    "15' zr + 2x (8' zm + 5' zr) + 10' zr",
+    "10' zr + 1,5km + 3x (4' zs + 2' zr) + 15' zr",
+    "10' zr + 5x (400m + 1' zr) + 15' zr",
+])
+def test_serialized_workouts_are_valid(validator, expression):
+    """Test payloads produced by the serializer pass validation"""
+    assert validator.errors(GarminSerializer().serialize(RunFunParser().parse(expression))) == []
+
+
+def test_meters_are_converted(payload):
+    """Test distances in meters are not mistaken for fractions of a kilometer"""
+    assert payload["workoutSegments"][0]["workoutSteps"][1]["workoutSteps"][1]["endConditionValue"] == 400
+
+
+def test_errors_have_precise_paths(validator, payload):
+    """Test every problem is reported with the path of the offending value"""
+    steps = payload["workoutSegments"][0]["workoutSteps"]
+    steps[0]["targetValueTwo"] = 100
+    steps[1]["numberOfIterations"] = 500
+    steps[1]["workoutSteps"][1]["endConditionValue"] = 0.4
+    del payload["workoutName"]
+
+    assert validator.errors(payload) == [
+        ("workoutName", "is required"),
+        ("workoutSegments[0].workoutSteps[0].targetValueTwo", "must be greater than targetValueOne (157), got 100"),
+        ("workoutSegments[0].workoutSteps[1].numberOfIterations", "must be at most 99, got 500"),
+        ("workoutSegments[0].workoutSteps[1].workoutSteps[1].endConditionValue", "must be at least 1, got 0.4"),
+    ]
+
+
+@pytest.mark.parametrize("change,path", [
+    (lambda p: p["workoutSegments"][0]["workoutSteps"][0].pop("targetValueOne"),
+     "workoutSegments[0].workoutSteps[0].targetValueOne"),
+    (lambda p: p["workoutSegments"][0]["workoutSteps"][0].update(type="UnknownDTO"),
+     "workoutSegments[0].workoutSteps[0].type"),
+    (lambda p: p["workoutSegments"][0]["workoutSteps"][1].update(workoutSteps=[]),
+     "workoutSegments[0].workoutSteps[1].workoutSteps"),
+    (lambda p: p["workoutSegments"][0]["workoutSteps"][2].update(stepOrder=9),
+     "workoutSegments[0].workoutSteps[2].stepOrder"),
+    (lambda p: p["workoutSegments"][0]["workoutSteps"][2]["endCondition"].update(conditionTypeKey="laps"),
+     "workoutSegments[0].workoutSteps[2].endCondition.conditionTypeKey"),
+    (lambda p: p["sportType"].update(sportTypeKey="golf"), "sportType.sportTypeKey"),
+    (lambda p: p.update(workoutSegments="none"), "workoutSegments"),
+])
+def test_invalid_values(validator, payload, change, path):
+    """Test a single invalid value is reported at its path"""
+    change(payload)
+
+    assert path in [error_path for error_path, _ in validator.errors(payload)]
+
+
+def test_too_many_steps(validator):
+    """Test workouts with more steps than Garmin Connect accepts are rejected"""
+    expression = " + ".join(["1' zr"] * (MAX_STEPS + 1))
+    payload = GarminSerializer().serialize(RunFunParser().parse(expression))
+
+    assert ("workoutSegments", f"must have at most {MAX_STEPS} steps, got {MAX_STEPS + 1}") in validator.errors(payload)
+
+
+def test_validate_payload_raises(payload):
+    """Test invalid payloads raise an error carrying every problem"""
+    payload["estimatedDurationInSecs"] = -1
+    original = copy.deepcopy(payload)
+
+    with pytest.raises(GarminPayloadValidationError) as error:
+        validate_payload(payload)
+
+    assert error.value.errors == [("estimatedDurationInSecs", "must be at least 0, got -1")]
+    assert payload == original
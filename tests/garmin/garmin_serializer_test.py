@@ -1,7 +1,8 @@
 import pytest
 
 from parser.runfun_parser import RunFunParser
-from garmin.serializer import GarminSerializer
+from garmin.serializer import GarminSerializer, SerializedStepCache, calculate_estimated_duration
+from analysis.race_pace import build_pace_tables
 
 @pytest.fixture
 def parser():
@@ -15,4 +16,75 @@ def serializer():
 def test_parse_with_repetitions_and_serialize(parser, serializer):
     """Test parsing workout with repetitions: 15' zr + 2x (8' zm + 5' zr) + 10' zr"""
     workout = parser.parse("15' zr + 2x (8' zm + 5' zr) + 10' zr")
-    payload = serializer.serialize(workout)
\ No newline at end of file
+    payload = serializer.serialize(workout)
+
+def test_serialize_race_pace_with_pace_table(parser):
+    """Test race pace steps take their speed range from the pace table of the athlete"""
+    table = build_pace_tables({"ana": {10000: 2400}})["ana"]
+    payload = GarminSerializer(pace_table=table).serialize(parser.parse("15' zr + 2km ritmo de prova 10km"))
+
+    step = payload["workoutSegments"][0]["workoutSteps"][1]
+    assert step["targetType"]["workoutTargetTypeKey"] == "pace.zone"
+    assert [step["targetValueOne"], step["targetValueTwo"]] == list(table.speed_range(10000))
+
+
+def test_serialize_race_pace_without_pace_table(parser, serializer):
+    """Test race pace steps are written without target when the athlete is unknown"""
+    payload = serializer.serialize(parser.parse("15' zr + 2km ritmo de prova 10km"))
+
+    assert payload["workoutSegments"][0]["workoutSteps"][1]["targetType"] is None
+
+
+PLAN = [
+    "15' zr + 2x (8' zm + 5' zr) + 10' zr",
+    "10' zr + 2x (8' zm + 5' zr) + 3x (1km + 2' zr) + 10' zr",
+    "2x (8' zm + 5' zr) + 10' zr",
+    "10' zr + 5x (400m + 1' zr) + 10' zr",
+    "10' zr + 2km ritmo de prova 10km",
+]
+
+
+def test_cached_payloads_match_uncached(parser):
+    """Test payloads built from cached blocks equal payloads built from scratch"""
+    cache = SerializedStepCache()
+    table = build_pace_tables({"ana": {10000: 2400}})["ana"]
+
+    for _ in range(3):
+        for expression in PLAN:
+            workout = parser.parse(expression)
+            cached = GarminSerializer(pace_table=table, cache=cache).serialize(workout)
+            assert cached == GarminSerializer(pace_table=table).serialize(workout)
+            assert cached["estimatedDurationInSecs"] == calculate_estimated_duration(cached["workoutSegments"])
+
+
+def test_repeated_blocks_share_inner_dicts(parser):
+    """Test a recurring block is renumbered at its new position and shares its nested dicts"""
+    cache = SerializedStepCache()
+    first = GarminSerializer(cache=cache).serialize(parser.parse("15' zr + 2x (8' zm + 5' zr) + 10' zr"))
+    second = GarminSerializer(cache=cache).serialize(parser.parse("2x (8' zm + 5' zr) + 10' zr"))
+
+    repeat, moved = first["workoutSegments"][0]["workoutSteps"][1], second["workoutSegments"][0]["workoutSteps"][0]
+    assert [repeat["stepOrder"], *(s["stepOrder"] for s in repeat["workoutSteps"])] == [2, 3, 4]
+    assert [moved["stepOrder"], *(s["stepOrder"] for s in moved["workoutSteps"])] == [1, 2, 3]
+    assert moved["stepType"] is repeat["stepType"]
+    assert moved["workoutSteps"][0]["endCondition"] is repeat["workoutSteps"][0]["endCondition"]
+
+    third = GarminSerializer(cache=cache).serialize(parser.parse("15' zr + 2x (8' zm + 5' zr) + 10' zr"))
+    assert third["workoutSegments"][0]["workoutSteps"][1] is repeat
+
+
+def test_blocks_differing_in_payload_are_not_shared(parser):
+    """Test steps with different targets or value types get their own payloads"""
+    cache = SerializedStepCache()
+    zr = GarminSerializer(cache=cache).serialize(parser.parse("10' zr"))
+    zm = GarminSerializer(cache=cache).serialize(parser.parse("10' zm"))
+
+    assert zr["workoutSegments"][0]["workoutSteps"][0] != zm["workoutSegments"][0]["workoutSteps"][0]
+
+
+def test_serializer_reuse_numbers_each_workout_from_one(parser, serializer):
+    """Test a serializer reused for several workouts starts the steps of each at 1"""
+    serializer.serialize(parser.parse("15' zr + 2x (8' zm + 5' zr) + 10' zr"))
+    payload = serializer.serialize(parser.parse("10' zr"))
+
+    assert payload["workoutSegments"][0]["workoutSteps"][0]["stepOrder"] == 1
@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from deadline import DeadlineExceeded, current_deadline, deadline_scope
+from garmin.connect import GarminConnectClient
+from garmin.timeouts import LatencyTracker, hedged_call
+
+
+@pytest.fixture
+def client():
+    with patch("garmin.connect.cloudscraper.CloudScraper"):
+        client = GarminConnectClient(MagicMock(token="token", cookies={}))
+    client.session.get.return_value = MagicMock(status_code=200, headers={}, json=lambda: [])
+    client.session.post.return_value = MagicMock(json=lambda: {"workoutScheduleId": 7})
+    return client
+
+
+def test_calls_have_timeouts(client):
+    """Test reads and writes are sent with connect and read timeouts"""
+    client.list_workouts()
+    client.schedule_workout(1, MagicMock(strftime=lambda fmt: "2024-10-10"))
+
+    for call in (client.session.get.call_args, client.session.post.call_args):
+        connect, read = call.kwargs["timeout"]
+        assert 0 < connect <= read
+
+
+def test_timeouts_follow_request_deadline(client):
+    """Test timeouts shrink to the request budget and no call is made once it is spent"""
+    with deadline_scope(0.5):
+        client.list_workouts()
+    assert all(timeout <= 0.5 for timeout in client.session.get.call_args.kwargs["timeout"])
+
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            client.schedule_workout(1, MagicMock(strftime=lambda fmt: "2024-10-10"))
+    client.session.post.assert_not_called()
+
+
+def test_latency_percentile():
+    """Test percentiles are only given once enough latencies are recorded"""
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for value in range(1, 10):
+        tracker.record(value / 100)
+    assert tracker.percentile(0.95) is None
+
+    for value in range(10, 101):
+        tracker.record(value / 100)
+    assert tracker.percentile(0.95) == 0.96
+
+
+def test_hedged_call_without_delay():
+    """Test a call is made once when there is no hedging delay"""
+    call = MagicMock(return_value=1)
+
+    assert hedged_call(call, None) == 1
+    call.assert_called_once()
+
+
+def test_hedged_call_sends_second_attempt():
+    """Test a slow first attempt is overtaken by the hedged one"""
+    delays = iter([0.5, 0.0])
+
+    def call():
+        delay = next(delays)
+        time.sleep(delay)
+        return delay
+
+    started = time.monotonic()
+    assert hedged_call(call, 0.05) == 0.0
+    assert time.monotonic() - started < 0.4
+
+
+def test_hedged_call_falls_back_on_failure():
+    """Test the other attempt is used when the first to finish failed, and errors are raised when both fail"""
+    outcomes = iter([(0.2, 1), (0.0, ValueError("failed"))])
+
+    def call():
+        delay, outcome = next(outcomes)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert hedged_call(call, 0.05) == 1
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        hedged_call(failing, 0.01)
+
+
+def test_each_thread_has_its_own_session():
+    """Test concurrent calls on one client never share a session"""
+    with patch("garmin.connect.cloudscraper.CloudScraper", side_effect=lambda: MagicMock()):
+        client = GarminConnectClient(MagicMock(token="token", cookies={}))
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            sessions = list(pool.map(lambda _: (threading.get_ident(), client.session), range(8)))
+
+    assert client.session is client.session
+    for ident, session in sessions:
+        assert session is not client.session
+        assert all(other is session for other_ident, other in sessions if other_ident == ident)
+    assert len({id(session) for _, session in sessions}) == len({ident for ident, _ in sessions})
+
+
+def test_hedged_read_uses_its_own_session():
+    """Test the attempts of a hedged read use sessions of their own and are both rate limited"""
+    sessions = []
+
+    def session():
+        sessions.append(MagicMock())
+        if len(sessions) == 2:
+            # The first attempt, made in a hedging thread after the session of the caller.
+            sessions[-1].get.side_effect = lambda *args, **kwargs: time.sleep(0.3) or MagicMock(
+                status_code=200, headers={}, json=lambda: ["slow"]
+            )
+        else:
+            sessions[-1].get.return_value = MagicMock(status_code=200, headers={}, json=lambda: ["hedged"])
+        return sessions[-1]
+
+    with patch("garmin.connect.cloudscraper.CloudScraper", side_effect=session), \
+            patch("garmin.timeouts.read_latency.percentile", return_value=0.01):
+        client = GarminConnectClient(MagicMock(token="token", cookies={}), hedge_reads=True, coordinator=MagicMock())
+        assert client.list_workouts() == ["hedged"]
+
+    assert len(sessions) == 3
+    sessions[0].get.assert_not_called()
+    assert client.coordinator.throttle.call_count == 2
+
+
+def test_hedged_attempts_run_in_request_context():
+    """Test hedged attempts see the deadline of the request they were made for"""
+    with deadline_scope(10) as deadline:
+        seen = hedged_call(lambda: current_deadline(), delay=1)
+
+    assert seen is deadline
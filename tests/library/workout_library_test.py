@@ -0,0 +1,70 @@
+import pytest
+
+from garmin.serializer import GarminSerializer
+from library.store import WorkoutLibrary
+from parser.runfun_parser import RunFunParser
+
+
+@pytest.fixture
+def parser():
+    return RunFunParser()
+
+
+@pytest.fixture
+def library(parser):
+    library = WorkoutLibrary()
+    expressions = [
+        "15' zr + 2x (8' zm + 5' zr) + 10' zr",
+        "10' zr + 4x (5' zs + 2' zr) + 10' zr",
+        "20' zr + 3x (10' zs + 3' zr) + 10' zr",
+        "50' zr",
+    ]
+    library.add_many(((e, parser.parse(e)) for e in expressions), batch_size=3)
+    yield library
+    library.close()
+
+
+def test_add_many_stores_every_workout(library):
+    """Test batched imports store every workout with its stats"""
+    assert library.count() == 4
+
+    stored = library.get(1)
+    assert stored["canonical"] == "15' zr + 2x (8' zm + 5' zr) + 10' zr"
+    assert stored["estimated_duration_in_secs"] == 3060
+    assert stored["time_in_zone_in_secs"] == {"ZR": 2100, "ZM": 960}
+
+
+def test_search_by_time_in_zone_and_duration(library):
+    """Test all workouts with at least 20' in ZS and at most 60' in total"""
+    results = library.search(min_zone_secs={"ZS": 1200}, max_duration=3600)
+
+    assert [r["id"] for r in results] == [2]
+
+
+def test_search_by_maximum_time_in_zone(library):
+    """Test workouts without any time in ZS"""
+    results = library.search(max_zone_secs={"ZS": 0})
+
+    assert [r["id"] for r in results] == [1, 4]
+
+
+def test_search_by_name(library):
+    """Test full text search on names ignores the FTS query syntax"""
+    assert [r["id"] for r in library.search(name="4x")] == [2]
+    assert library.search(name='"zs" OR') == []
+
+
+def test_stored_tree_round_trips(library, parser):
+    """Test the stored tree rebuilds a workout with the same payload"""
+    workout = library.get_workout(2)
+
+    expected = GarminSerializer().serialize(parser.parse("10' zr + 4x (5' zs + 2' zr) + 10' zr"))
+    assert GarminSerializer().serialize(workout) == expected
+
+
+def test_delete(library):
+    """Test deleted workouts disappear from searches"""
+    assert library.delete(2)
+    assert not library.delete(2)
+    assert [r["id"] for r in library.search(min_zone_secs={"ZS": 1})] == [3]
+    assert library.search(name="4x") == []
@@ -0,0 +1,31 @@
+import io
+import json
+import logging
+
+from logger import configure_logging, log_event, shutdown_logging
+
+
+def test_structured_records_through_queue():
+    """Test records are written as JSON objects with their fields by the queue listener"""
+    stream = io.StringIO()
+    configure_logging(level="INFO", handler=logging.StreamHandler(stream))
+    try:
+        log_event(logging.getLogger("tests"), logging.WARNING, "event_loop_blocked", handler="GET /", blocked_for=0.2)
+        logging.getLogger("tests").debug("ignored")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("tests").exception("failed %s", "call")
+    finally:
+        shutdown_logging()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert len(records) == 2
+    assert records[0]["event"] == "event_loop_blocked"
+    assert records[0]["handler"] == "GET /"
+    assert records[0]["blocked_for"] == 0.2
+    assert records[0]["level"] == "WARNING"
+    assert records[0]["logger"] == "tests"
+    assert records[1]["message"] == "failed call"
+    assert "ValueError: boom" in records[1]["exception"]
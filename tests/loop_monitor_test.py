@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+
+from fastapi import APIRouter, Depends, FastAPI
+
+from loop_monitor import EventLoopMonitor, route_callables
+from metrics import MetricsRegistry
+
+
+async def get_value():
+    time.sleep(0.3)
+    return 1
+
+
+def build_routes():
+    router = APIRouter()
+
+    @router.post("/blocking")
+    async def blocking():
+        time.sleep(0.3)
+
+    @router.post("/dependency")
+    async def with_dependency(value: int = Depends(get_value)):
+        return value
+
+    app = FastAPI()
+    app.include_router(router, prefix="/v1")
+    return app.routes, blocking, with_dependency
+
+
+def test_route_callables():
+    """Test endpoints and their dependencies are labelled"""
+    routes, blocking, with_dependency = build_routes()
+    labels = route_callables(routes)
+
+    assert labels[blocking.__code__] == "POST /v1/blocking"
+    assert labels[with_dependency.__code__] == "POST /v1/dependency"
+    assert labels[get_value.__code__] == "dependency get_value"
+
+
+def run_monitored(call, routes=()):
+    registry = MetricsRegistry()
+    monitor = EventLoopMonitor(interval=0.02, threshold=0.1, registry=registry)
+
+    async def scenario():
+        monitor.start(routes)
+        await asyncio.sleep(0.05)
+        await call()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    return monitor
+
+
+def test_lag_is_measured():
+    """Test the lag histogram records the ticks of the loop"""
+    async def idle():
+        await asyncio.sleep(0.1)
+
+    monitor = run_monitored(idle)
+
+    assert monitor.lag.count() >= 5
+    assert monitor.blocked.value(handler="unknown") == 0
+
+
+def test_blocking_endpoint_is_reported(caplog):
+    """Test a blocking call is reported with its endpoint and stack"""
+    routes, blocking, _ = build_routes()
+
+    with caplog.at_level(logging.WARNING, logger="loop_monitor"):
+        monitor = run_monitored(blocking, routes)
+
+    assert monitor.blocked.value(handler="POST /v1/blocking") == 1
+    record = next(record for record in caplog.records if record.getMessage() == "event_loop_blocked")
+    assert record.fields["handler"] == "POST /v1/blocking"
+    assert record.fields["blocked_for"] >= 0.1
+    assert any("in blocking" in frame for frame in record.fields["stack"])
+
+
+def test_blocking_dependency_is_reported():
+    """Test a blocking async dependency is reported rather than the endpoint using it"""
+    routes, _, _ = build_routes()
+
+    monitor = run_monitored(get_value, routes)
+
+    assert monitor.blocked.value(handler="dependency get_value") == 1
+    assert monitor.lag.count() > 0
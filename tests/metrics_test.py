@@ -0,0 +1,54 @@
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def test_counter_and_gauge():
+    """Test counters and gauges keep one value per set of labels"""
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests")
+    gauge = registry.gauge("queue_depth", "Queued requests")
+
+    counter.inc(route="parse")
+    counter.inc(2, route="parse")
+    counter.inc(route="create")
+    gauge.set(3)
+    gauge.dec()
+
+    assert counter.value(route="parse") == 3
+    assert counter.value(route="create") == 1
+    assert gauge.value() == 2
+    assert registry.counter("requests_total", "Requests") is counter
+
+
+def test_metric_kind_conflict():
+    """Test a name cannot be registered with two kinds of metrics"""
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests")
+
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests")
+
+
+def test_render():
+    """Test metrics are rendered in the Prometheus text format"""
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc(route='say "hi"')
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert registry.render() == (
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 3\n'
+        "latency_seconds_sum 5.55\n"
+        "latency_seconds_count 3\n"
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="say \\"hi\\""} 1\n'
+    )
+    assert histogram.count() == 3
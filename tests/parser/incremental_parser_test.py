@@ -0,0 +1,91 @@
+import pytest
+
+from library.codec import workout_to_dict
+from parser.incremental import IncrementalParser, IncrementalParseSessions
+from parser.runfun_parser import RunFunParser
+
+
+@pytest.fixture
+def parser():
+    return IncrementalParser()
+
+
+@pytest.mark.parametrize("expression", [
+    "50' zr",
+    "15' zr+2x (8' zm +  5' zr)+10' zr",
+    "10' zr + 1,5km + 3x (4' zs + 2' zr) + 15' zr",
+    "10' zr + 5x (400m + 1' zr) + 15' zr",
+])
+def test_same_workout_as_full_parse(parser, expression):
+    """Test valid expressions give the same workout as RunFunParser.parse"""
+    result = parser.update(expression)
+
+    assert result.errors == []
+    assert workout_to_dict(result.workout) == workout_to_dict(RunFunParser().parse(expression))
+
+
+def test_unchanged_prefix_is_reused(parser):
+    """Test only the steps after an edit are parsed again"""
+    parser.update("15' zr + 2x (8' zm + 5' zr) + 1")
+    result = parser.update("15' zr + 2x (8' zm + 5' zr) + 10' zr")
+
+    assert result.reused == 2
+    assert result.errors == []
+    assert [step.step_type.key for step in result.workout.steps] == ["warmup", "repeat", "cooldown"]
+
+
+def test_step_types_follow_positions(parser):
+    """Test reused steps get the type of their new position"""
+    parser.update("10' zr + 20' zm")
+    result = parser.update("10' zr + 20' zm + 10' zr")
+
+    assert [step.step_type.key for step in result.workout.steps] == ["warmup", "interval", "cooldown"]
+    assert workout_to_dict(result.workout) == workout_to_dict(RunFunParser().parse("10' zr + 20' zm + 10' zr"))
+
+
+@pytest.mark.parametrize("expression,errors", [
+    ("10' zr +", [(8, 8, "Expected a step")]),
+    ("10' zr + 5x (3' ze", [(9, 18, "The step '5x (3' ze' could not be recognized")]),
+    ("10' zr + 5' zq + 20' zm", [(9, 14, "The step '5' zq' could not be recognized")]),
+])
+def test_error_spans(parser, expression, errors):
+    """Test invalid steps are reported with their position and left out of the workout"""
+    result = parser.update(expression)
+
+    assert [(e["start"], e["end"], e["message"]) for e in result.errors] == errors
+    assert expression[errors[0][0]:errors[0][1]].strip() == expression[errors[0][0]:errors[0][1]]
+    assert len(result.workout.steps) == expression.count("+") + 1 - len(errors)
+
+
+def test_estimates(parser):
+    """Test time and distance are summed with repeats and converted with the default pace"""
+    result = parser.update("10' zr + 2x (1km + 2' zr) + 5' zr")
+
+    assert result.estimates() == {
+        "duration_in_secs": 600 + 2 * 120 + 300,
+        "distance_in_meters": 2000,
+        "estimated_duration_in_secs": 1140 + 600,
+        "estimated_distance_in_meters": 2000 + 1140 * 1000 / 300,
+    }
+    assert [step["elapsed_secs"] for step in result.timeline()] == [600, 600 + 2 * 420, 1740]
+
+
+def test_zone_change_invalidates_parsed_steps(parser):
+    """Test steps parsed before a zone change are parsed again with the new heart rates"""
+    parser.update("10' zr", RunFunParser())
+    result = parser.update("10' zr", RunFunParser(zones={"ZR": (150, 160)}))
+
+    assert result.reused == 0
+    assert tuple(result.workout.steps[0].target.values) == (150, 160)
+
+
+def test_sessions_are_bounded():
+    """Test sessions are kept by ID and the least recently used ones are dropped"""
+    sessions = IncrementalParseSessions(max_sessions=2)
+    first, parser = sessions.get()
+    second, _ = sessions.get()
+
+    assert sessions.get(first) == (first, parser)
+    sessions.get()
+    assert sessions.close(first)
+    assert not sessions.close(second)
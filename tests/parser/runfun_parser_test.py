@@ -2,7 +2,7 @@ import pytest
 
 from models.condition import Distance, Duration
 from models.step import RepeatedStep, Step
-from models.target import HeartRateZoneTarget
+from models.target import HeartRateZoneTarget, PaceTarget
 from parser.runfun_parser import HeartRateZoneConfig, RunFunParser
 
 
@@ -115,4 +115,18 @@ def test_parse_with_repeats_and_distance(parser):
     assert isinstance(workout.steps[2].condition, Duration)
     assert workout.steps[2].condition.value == 900
     assert isinstance(workout.steps[2].target, HeartRateZoneTarget)
-    assert workout.steps[2].target.values == HeartRateZoneConfig.get_zone_range("ZR")
\ No newline at end of file
+    assert workout.steps[2].target.values == HeartRateZoneConfig.get_zone_range("ZR")
+
+def test_parse_race_pace_steps(parser):
+    """Test parsing race pace steps: 3x (2km ritmo de prova 10km + 2' zr) + 1km ritmo de prova 1500m"""
+    workout = parser.parse("3x (2km ritmo de prova 10km + 2' zr) + 1km ritmo de prova 1500m")
+
+    interval = workout.steps[0].steps[0]
+    assert interval.condition.value == 2000
+    assert interval.step_name == "2km ritmo de prova 10km"
+    assert isinstance(interval.target, PaceTarget)
+    assert interval.target.race_distance == 10000
+    assert interval.target.values is None
+
+    assert workout.steps[1].condition.value == 1000
+    assert workout.steps[1].target.race_distance == 1500
@@ -0,0 +1,35 @@
+import pytest
+
+from parser.runfun_parser import RunFunParser
+from parser.runfun_printer import RunFunPrinter
+
+
+@pytest.fixture
+def parser():
+    return RunFunParser()
+
+
+@pytest.fixture
+def printer():
+    return RunFunPrinter()
+
+
+@pytest.mark.parametrize("expression,expected", [
+    ("50' zr", "50' zr"),
+    ("15' zr+2x (8' zm +  5' zr)+10' zr", "15' zr + 2x (8' zm + 5' zr) + 10' zr"),
+    ("20' zr + 1,5km + 10' zr", "20' zr + 1,5km + 10' zr"),
+    ("10' zr + 3km + 10' zr", "10' zr + 3km + 10' zr"),
+    ("2x (1km ritmo de prova 5km + 2' zr) + 1km  ritmo de prova 1500m", "2x (1km ritmo de prova 5km + 2' zr) + 1km ritmo de prova 1,5km"),
+])
+def test_print_canonical_expression(parser, printer, expression, expected):
+    """Test expressions are printed in canonical form"""
+    assert printer.print(parser.parse(expression)) == expected
+
+
+def test_print_round_trip(parser, printer):
+    """Test printing and parsing again yields the same steps"""
+    workout = parser.parse("15' zr + 2x (8' zm + 5' zr) + 10' zr")
+    reparsed = parser.parse(printer.print(workout))
+
+    assert printer.print(reparsed) == printer.print(workout)
+    assert reparsed.steps[1].iterations == 2
@@ -0,0 +1,110 @@
+import pytest
+
+from garmin.serializer import GarminSerializer
+from library.codec import workout_to_dict
+from parser.runfun_parser import RunFunParser
+from parser.template import WorkoutTemplate, compile_template
+
+
+@pytest.fixture
+def parser():
+    return RunFunParser()
+
+
+@pytest.mark.parametrize("template,parameters,expression", [
+    ("{minutes}' zr", {"minutes": 50}, "50' zr"),
+    (
+        "{warm}' zr + {n}x ({rep}' ze + {rec}' zr) + {cool}' zr",
+        {"warm": 15, "n": 6, "rep": 3, "rec": 2, "cool": 10},
+        "15' zr + 6x (3' ze + 2' zr) + 10' zr",
+    ),
+    ("10' zr + {km}km + {n}x (4' zs + 2' zr)", {"km": 1.5, "n": 3}, "10' zr + 1,5km + 3x (4' zs + 2' zr)"),
+    ("{d}' zr + 2x ({d}' zm + 5' zr)", {"d": 8}, "8' zr + 2x (8' zm + 5' zr)"),
+    (
+        "10' zr + {n}x ({d}m + 1' zr) + {km}km ritmo de prova 5km",
+        {"n": 5, "d": 400, "km": 2},
+        "10' zr + 5x (400m + 1' zr) + 2km ritmo de prova 5km",
+    ),
+])
+def test_instantiate_matches_parsing(parser, template, parameters, expression):
+    """Test instances are identical to parsing the expression with the values filled in"""
+    compiled = WorkoutTemplate(template)
+    workout = parser.parse(expression)
+
+    assert compiled.instantiate_payload(parameters) == GarminSerializer().serialize(workout)
+    assert workout_to_dict(compiled.instantiate(parameters)) == workout_to_dict(workout)
+
+
+def test_instances_are_independent():
+    """Test every instance has its own top-level payload and values"""
+    template = WorkoutTemplate("{warm}' zr + {n}x (3' ze + 2' zr)")
+
+    first = template.instantiate_payload({"warm": 10, "n": 4})
+    second = template.instantiate_payload({"warm": 20, "n": 5})
+    first["workoutId"] = 1
+
+    assert "workoutId" not in second
+    assert first["estimatedDurationInSecs"] == 600 + 4 * 300
+    assert second["estimatedDurationInSecs"] == 1200 + 5 * 300
+    assert second["workoutName"] == "20 'zr + 5x (3 'ze + 2 'zr)"
+
+
+def test_parameter_kinds():
+    """Test each parameter is recognized as a duration, distance or repeat count"""
+    template = WorkoutTemplate("{warm}' zr + {n}x ({km}km + 2' zr)")
+
+    assert template.parameters == ["warm", "n", "km"]
+    assert template.kinds == {"warm": "minutes", "n": "count", "km": "kilometers"}
+
+
+@pytest.mark.parametrize("parameters,message", [
+    ({"warm": 10}, "Missing template parameter"),
+    ({"warm": 10, "n": 0}, "must be a positive number"),
+    ({"warm": 10, "n": "3"}, "must be a positive number"),
+    ({"warm": 10.5, "n": 3}, "must be a whole number"),
+])
+def test_invalid_parameters(parameters, message):
+    """Test invalid values are rejected with a ValueError"""
+    template = WorkoutTemplate("{warm}' zr + {n}x (3' ze + 2' zr)")
+
+    with pytest.raises(ValueError, match=message):
+        template.instantiate_payload(parameters)
+
+
+def test_whole_floats_are_accepted():
+    """Test whole numbers given as floats behave like integers"""
+    template = WorkoutTemplate("{warm}' zr")
+
+    assert template.instantiate_payload({"warm": 10.0}) == template.instantiate_payload({"warm": 10})
+
+
+def test_compile_template_is_cached():
+    """Test the same expression is compiled only once"""
+    assert compile_template("{warm}' zr") is compile_template("{warm}' zr")
+
+
+def test_literal_numbers_are_not_parameters(parser):
+    """Test numbers written in the template stay as written whatever the parameter values"""
+    template = WorkoutTemplate("{d}' zr + 8' zr + 8km + 8x (8' ze + 8' zr)")
+
+    assert template.instantiate_payload({"d": 8}) == GarminSerializer().serialize(
+        parser.parse("8' zr + 8' zr + 8km + 8x (8' ze + 8' zr)")
+    )
+    assert template.instantiate({"d": 5}).name == parser.parse("5' zr + 8' zr + 8km + 8x (8' ze + 8' zr)").name
+
+
+def test_parameter_of_two_kinds_is_rejected():
+    """Test a parameter cannot stand for both a duration and a distance"""
+    with pytest.raises(ValueError):
+        WorkoutTemplate("{d}' zr + {d}km")
+
+
+def test_instances_write_their_own_values(parser):
+    """Test instances made one after the other each carry their own values"""
+    template = WorkoutTemplate("{warm}' zr + {n}x ({rep}' ze + 2' zr)")
+
+    for warm, n, rep in [(10, 4, 3), (15, 6, 2), (10, 5, 3)]:
+        expression = f"{warm}' zr + {n}x ({rep}' ze + 2' zr)"
+        assert template.instantiate_payload({"warm": warm, "n": n, "rep": rep}) == GarminSerializer().serialize(
+            parser.parse(expression)
+        )
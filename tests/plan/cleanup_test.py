@@ -0,0 +1,58 @@
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from plan.cleanup import delete_workouts, resolve_workouts
+
+
+WORKOUTS = [
+    {"workoutId": 1, "workoutName": "test-1", "createdDate": "2024-09-01T10:00:00.0"},
+    {"workoutId": 2, "workoutName": "test-2", "createdDate": "2024-10-05T10:00:00.0"},
+    {"workoutId": 3, "workoutName": "Tempo", "createdDate": "2024-09-02T10:00:00.0"},
+]
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    client.iter_workouts.side_effect = lambda: iter(WORKOUTS)
+    return client
+
+
+async def collect(stream):
+    return [json.loads(line) async for line in stream]
+
+
+def test_resolve_by_prefix_and_creation_date(client):
+    """Test workouts must match every filter"""
+    matches = resolve_workouts(client, name_prefix="test-", created_before=datetime(2024, 10, 1))
+
+    assert [w["workoutId"] for w in matches] == [1]
+
+
+def test_resolve_by_ids_does_not_list(client):
+    """Test IDs alone are used without listing the account"""
+    matches = resolve_workouts(client, workout_ids=[3, 1, 3])
+
+    assert [w["workoutId"] for w in matches] == [3, 1]
+    client.iter_workouts.assert_not_called()
+
+
+def test_resolve_requires_a_criterion(client):
+    """Test an empty request cannot match every workout"""
+    with pytest.raises(ValueError):
+        resolve_workouts(client)
+
+
+def test_delete_reports_progress_and_summary(client):
+    """Test every deletion is reported followed by a summary"""
+    client.delete_workout.side_effect = lambda workout_id: 1 / (workout_id - 2)
+
+    events = asyncio.run(collect(delete_workouts(client, WORKOUTS)))
+
+    assert sorted((e["workout_id"], e["status"]) for e in events[:-1]) == [(1, "deleted"), (2, "failed"), (3, "deleted")]
+    assert [e["done"] for e in events[:-1]] == [1, 2, 3]
+    assert events[-1] == {"summary": {"total": 3, "deleted": 2, "failed": 1}}
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import date
+from itertools import count
+from unittest.mock import MagicMock
+
+import pytest
+
+from parser.runfun_parser import RunFunParser
+from plan.sync import PlanSynchronizer, PlanSyncStore
+
+
+@pytest.fixture
+def client():
+    ids = count(100)
+    client = MagicMock()
+    client.create_workout.side_effect = lambda workout, idempotency_key=None: next(ids)
+    client.schedule_workout.side_effect = lambda workout_id, day: next(ids)
+    return client
+
+
+@pytest.fixture
+def synchronizer():
+    return PlanSynchronizer("plan", RunFunParser(), PlanSyncStore())
+
+
+def sync(synchronizer, client, items):
+    diff = synchronizer.diff(items)
+    return diff, asyncio.run(synchronizer.apply(diff, client))
+
+
+def test_first_sync_creates_and_schedules(synchronizer, client):
+    """Test every workout of a new plan is created and scheduled"""
+    diff, outcomes = sync(synchronizer, client, [("50' zr", date(2024, 10, 7)), ("30' zm", date(2024, 10, 9))])
+
+    assert [c.action for c in diff.changes] == ["create", "create"]
+    assert diff.calls == 4
+    assert all(o["status"] == "ok" for o in outcomes)
+    assert len(synchronizer.store.get("plan")) == 2
+
+
+def test_resync_only_pushes_changes(synchronizer, client):
+    """Test an edited, a removed and an unchanged workout produce the minimal calls"""
+    sync(synchronizer, client, [
+        ("50' zr", date(2024, 10, 7)),
+        ("30' zm", date(2024, 10, 9)),
+        ("40' zr", date(2024, 10, 11)),
+    ])
+    client.reset_mock()
+
+    diff, _ = sync(synchronizer, client, [
+        ("50' zr", date(2024, 10, 7)),
+        ("35' zm", date(2024, 10, 9)),
+    ])
+
+    assert [c.action for c in diff.changes] == ["unchanged", "update", "unschedule"]
+    assert diff.calls == 2
+    client.create_workout.assert_not_called()
+    client.update_workout.assert_called_once()
+    client.unschedule_workout.assert_called_once()
+    assert set(synchronizer.store.get("plan")) == {date(2024, 10, 7), date(2024, 10, 9)}
+
+
+def test_moved_workout_is_rescheduled(synchronizer, client):
+    """Test a workout moved to another date reuses the existing Garmin workout"""
+    sync(synchronizer, client, [("50' zr", date(2024, 10, 7))])
+    workout_id = synchronizer.store.get("plan")[date(2024, 10, 7)].workout_id
+    client.reset_mock()
+
+    diff, _ = sync(synchronizer, client, [("50' zr", date(2024, 10, 8))])
+
+    assert [c.action for c in diff.changes] == ["move"]
+    client.create_workout.assert_not_called()
+    client.schedule_workout.assert_called_once_with(workout_id, date(2024, 10, 8))
+    assert list(synchronizer.store.get("plan")) == [date(2024, 10, 8)]
+
+
+def test_failed_change_is_retried_on_next_sync(synchronizer, client):
+    """Test a failed change is reported and not recorded"""
+    client.create_workout.side_effect = Exception("Service unavailable")
+
+    _, outcomes = sync(synchronizer, client, [("50' zr", date(2024, 10, 7))])
+
+    assert outcomes[0]["status"] == "failed"
+    assert synchronizer.store.get("plan") == {}
+
+
+def test_duplicate_dates_are_rejected(synchronizer):
+    """Test a plan cannot have two workouts on the same date"""
+    with pytest.raises(ValueError):
+        synchronizer.diff([("50' zr", date(2024, 10, 7)), ("30' zm", date(2024, 10, 7))])
+
+
+def test_store_persists_to_file(tmp_path, synchronizer, client):
+    """Test the sync state is reloaded from disk"""
+    path = str(tmp_path / "state.json")
+    synchronizer.store = PlanSyncStore(path)
+    sync(synchronizer, client, [("50' zr", date(2024, 10, 7))])
+
+    reloaded = PlanSyncStore(path).get("plan")
+    assert list(reloaded) == [date(2024, 10, 7)]
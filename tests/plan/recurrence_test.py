@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+
+from plan.recurrence import MAX_OCCURRENCES, expand_recurrence
+
+
+def test_weekly_on_start_weekday():
+    """Test a weekly rule defaults to the weekday of the start date"""
+    dates = expand_recurrence(date(2024, 10, 8), count=3)
+
+    assert dates == [date(2024, 10, 8), date(2024, 10, 15), date(2024, 10, 22)]
+
+
+def test_weekly_on_weekdays_until():
+    """Test a weekly rule on Tuesdays and Thursdays skips days before the start"""
+    dates = expand_recurrence(date(2024, 10, 10), weekdays=[3, 1], until=date(2024, 10, 22))
+
+    assert dates == [date(2024, 10, 10), date(2024, 10, 15), date(2024, 10, 17), date(2024, 10, 22)]
+
+
+def test_every_other_day():
+    """Test a daily rule with an interval"""
+    dates = expand_recurrence(date(2024, 10, 30), frequency="daily", interval=2, until=date(2024, 11, 5))
+
+    assert dates == [date(2024, 10, 30), date(2024, 11, 1), date(2024, 11, 3), date(2024, 11, 5)]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"count": 0},
+    {"count": 2, "interval": 0},
+    {"count": 2, "frequency": "monthly"},
+    {"count": 2, "weekdays": [7]},
+    {"frequency": "daily", "until": date(2030, 1, 1)},
+])
+def test_invalid_rules(kwargs):
+    """Test invalid or unbounded rules are rejected"""
+    with pytest.raises(ValueError):
+        expand_recurrence(date(2024, 10, 7), **kwargs)
+
+
+def test_count_is_bounded():
+    """Test no rule produces more than the maximum number of dates"""
+    assert len(expand_recurrence(date(2024, 10, 7), frequency="daily", count=MAX_OCCURRENCES)) == MAX_OCCURRENCES
+    with pytest.raises(ValueError):
+        expand_recurrence(date(2024, 10, 7), frequency="daily", count=MAX_OCCURRENCES + 1)
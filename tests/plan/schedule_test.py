@@ -0,0 +1,74 @@
+import asyncio
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from garmin.connect import GarminConnectClient
+from plan.schedule import schedule_dates, shift_schedule
+
+
+CALENDARS = {
+    (2024, 10): {"calendarItems": [
+        {"id": 1, "itemType": "workout", "workoutId": 10, "date": "2024-10-30", "title": "Tempo"},
+        {"id": 2, "itemType": "activity", "date": "2024-10-31"},
+        {"id": 3, "itemType": "workout", "workoutId": 11, "date": "2024-10-01", "title": "Long run"},
+    ]},
+    (2024, 11): {"calendarItems": [
+        {"id": 4, "itemType": "workout", "workoutId": 12, "date": "2024-11-02", "title": "Easy"},
+    ]},
+}
+
+
+@pytest.fixture
+def client():
+    with patch("garmin.connect.cloudscraper.CloudScraper"):
+        client = GarminConnectClient(MagicMock(token="token", cookies={}))
+    client.get_calendar = MagicMock(side_effect=lambda year, month: CALENDARS[(year, month)])
+    client.schedule_workout = MagicMock(side_effect=lambda workout_id, day: workout_id * 100)
+    client.unschedule_workout = MagicMock()
+    return client
+
+
+def test_scheduled_workouts_across_months(client):
+    """Test scheduled workouts are collected across months and filtered by date"""
+    entries = client.get_scheduled_workouts(date(2024, 10, 15), date(2024, 11, 10))
+
+    assert [entry["id"] for entry in entries] == [1, 4]
+
+
+def test_shift_moves_every_entry(client):
+    """Test each entry is scheduled on its new date before the old one is removed"""
+    outcomes = asyncio.run(shift_schedule(client, date(2024, 10, 15), date(2024, 11, 10), 3))
+
+    assert [(o["from_date"], o["to_date"], o["status"]) for o in outcomes] == [
+        ("2024-10-30", "2024-11-02", "ok"),
+        ("2024-11-02", "2024-11-05", "ok"),
+    ]
+    client.schedule_workout.assert_any_call(10, date(2024, 11, 2))
+    assert sorted(c.args[0] for c in client.unschedule_workout.call_args_list) == [1, 4]
+
+
+def test_shift_reports_partial_failures(client):
+    """Test a failing move does not remove the old entry and is reported"""
+    client.schedule_workout.side_effect = lambda workout_id, day: 1 / (workout_id - 12)
+
+    outcomes = asyncio.run(shift_schedule(client, date(2024, 10, 15), date(2024, 11, 10), 3))
+
+    assert [o["status"] for o in outcomes] == ["ok", "failed"]
+    client.unschedule_workout.assert_called_once_with(1)
+
+
+def test_shift_dry_run(client):
+    """Test a dry run lists the moves without calling Garmin Connect"""
+    outcomes = asyncio.run(shift_schedule(client, date(2024, 10, 1), date(2024, 10, 31), -1, dry_run=True))
+
+    assert [o["to_date"] for o in outcomes] == ["2024-09-30", "2024-10-29"]
+    client.schedule_workout.assert_not_called()
+
+
+def test_schedule_dates_reports_each_date(client):
+    """Test one workout is scheduled on every date"""
+    outcomes = asyncio.run(schedule_dates(client, 7, [date(2024, 10, 7), date(2024, 10, 14)]))
+
+    assert [(o["date"], o["schedule_id"]) for o in outcomes] == [("2024-10-07", 700), ("2024-10-14", 700)]
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import date
+from itertools import count
+from unittest.mock import MagicMock
+
+import pytest
+
+from parser.runfun_parser import HeartRateZone, HeartRateZoneConfig, RunFunParser
+from plan.sync import PlanSyncEntry, PlanSynchronizer, PlanSyncStore
+from plan.zones import changed_zones, propagate_zone_change
+
+
+@pytest.fixture
+def client():
+    ids = count(100)
+    client = MagicMock()
+    client.create_workout.side_effect = lambda workout, idempotency_key=None: next(ids)
+    client.schedule_workout.side_effect = lambda workout_id, day: next(ids)
+    return client
+
+
+@pytest.fixture
+def store(client):
+    store = PlanSyncStore()
+    synchronizer = PlanSynchronizer("plan", RunFunParser(), store)
+    diff = synchronizer.diff([
+        ("50' zr", date(2024, 10, 1)),
+        ("15' zr + 4x (3' ze + 2' zr)", date(2024, 10, 7)),
+        ("30' zm", date(2024, 10, 9)),
+        ("10' zr + 5x (1' zt + 1' zm)", date(2024, 10, 11)),
+    ])
+    asyncio.run(synchronizer.apply(diff, client))
+    client.reset_mock()
+    return store
+
+
+def test_index_tracks_zones_of_pushed_workouts(store):
+    """Test the reverse index returns the entries that target a zone"""
+    assert [entry.date.day for _, entry in store.find_by_zones(["ZR"])] == [1, 7, 11]
+    assert [entry.date.day for _, entry in store.find_by_zones(["ZE", "ZT"])] == [7, 11]
+    assert [entry.date.day for _, entry in store.find_by_zones(["ZM"], date(2024, 10, 10))] == [11]
+    assert store.find_by_zones(["ZS"]) == []
+
+
+def test_index_follows_changes(store):
+    """Test replaced and removed entries leave the index"""
+    store.remove("plan", date(2024, 10, 9))
+    entry = store.get("plan")[date(2024, 10, 11)]
+    store.put("plan", PlanSyncEntry.from_dict({**entry.to_dict(), "zones": ["ZS"]}))
+
+    assert [entry.date.day for _, entry in store.find_by_zones(["ZM"])] == []
+    assert [entry.date.day for _, entry in store.find_by_zones(["ZS"])] == [11]
+
+
+def test_zone_change_updates_only_affected_future_workouts(store, client):
+    """Test only future workouts that target the changed zone are updated"""
+    result = asyncio.run(propagate_zone_change(
+        store, client, {"ze": [185, 195], "zr": [157, 167]}, start=date(2024, 10, 5),
+    ))
+
+    assert result["changed_zones"] == ["ZE"]
+    assert [w["date"] for w in result["workouts"]] == ["2024-10-07"]
+    assert result["failed"] == 0
+    client.update_workout.assert_called_once()
+    workout_id, workout = client.update_workout.call_args.args
+    assert workout_id == store.get("plan")[date(2024, 10, 7)].workout_id
+    assert tuple(workout.steps[1].steps[0].target.values) == (185, 195)
+    assert store.zones() == {"ZE": (185, 195), "ZR": (157, 167)}
+    assert HeartRateZoneConfig.ZONES[HeartRateZone.ZE] == (186, 196)
+
+
+def test_zone_change_is_recorded(store, client):
+    """Test a plan sync after the zone change finds nothing left to push"""
+    asyncio.run(propagate_zone_change(store, client, {"ZM": [168, 177]}, start=date(2024, 10, 1)))
+    assert client.update_workout.call_count == 2
+    client.reset_mock()
+
+    diff = PlanSynchronizer("plan", RunFunParser(zones=store.zones()), store).diff([
+        ("50' zr", date(2024, 10, 1)),
+        ("15' zr + 4x (3' ze + 2' zr)", date(2024, 10, 7)),
+        ("30' zm", date(2024, 10, 9)),
+        ("10' zr + 5x (1' zt + 1' zm)", date(2024, 10, 11)),
+    ])
+    assert diff.pending == []
+
+
+def test_failed_update_is_reported(store, client):
+    """Test a failed update is reported and keeps the previous state"""
+    client.update_workout.side_effect = Exception("Service unavailable")
+    previous = store.get("plan")[date(2024, 10, 9)].payload_hash
+
+    result = asyncio.run(propagate_zone_change(store, client, {"ZM": [168, 177]}, start=date(2024, 10, 1)))
+
+    assert result["failed"] == 2
+    assert store.get("plan")[date(2024, 10, 9)].payload_hash == previous
+
+
+def test_dry_run_changes_nothing(store, client):
+    """Test a dry run lists the affected workouts without applying the zones"""
+    result = asyncio.run(propagate_zone_change(
+        store, None, {"ZT": [200, 220]}, start=date(2024, 10, 1), dry_run=True,
+    ))
+
+    assert [(w["date"], w["status"]) for w in result["workouts"]] == [("2024-10-11", "planned")]
+    assert store.zones() == {}
+
+
+@pytest.mark.parametrize("zones", [{"zx": [150, 160]}, {"zr": [160, 150]}, {"zr": [150]}])
+def test_invalid_zones(zones):
+    """Test unknown zones and invalid ranges are rejected"""
+    with pytest.raises(ValueError):
+        changed_zones(zones, HeartRateZoneConfig.ZONES)
+
+
+def test_zones_survive_a_restart(tmp_path, client):
+    """Test zone ranges are persisted with the plans and given to parsers of later requests"""
+    path = str(tmp_path / "sync.json")
+    store = PlanSyncStore(path)
+    synchronizer = PlanSynchronizer("plan", RunFunParser(), store)
+    asyncio.run(synchronizer.apply(synchronizer.diff([("30' ze", date(2024, 10, 9))]), client))
+
+    asyncio.run(propagate_zone_change(store, client, {"ZE": [185, 195]}, start=date(2024, 10, 1)))
+
+    restarted = PlanSyncStore(path)
+    assert restarted.zones() == {"ZE": (185, 195)}
+    assert [entry.date.day for _, entry in restarted.find_by_zones(["ZE"])] == [9]
+    workout = RunFunParser(zones=restarted.zones()).parse("30' ze")
+    assert tuple(workout.steps[0].target.values) == (185, 195)
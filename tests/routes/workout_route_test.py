@@ -0,0 +1,97 @@
+import os
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("GARMIN_CLIENT_ID", "client")
+os.environ.setdefault("GARMIN_CLIENT_SECRET", "secret")
+os.environ.setdefault("WORKOUT_LIBRARY_PATH", ":memory:")
+
+import dependencies  # noqa: E402
+from garmin.exceptions import GarminPayloadValidationError  # noqa: E402
+from main import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    garmin = MagicMock()
+    garmin.create_workout.return_value = 42
+    garmin.schedule_workout.side_effect = lambda workout_id, day: int(day.strftime("%Y%m%d"))
+    app.dependency_overrides[dependencies.get_garmin_connect_client] = lambda: garmin
+    yield garmin
+    app.dependency_overrides.clear()
+
+
+def create(body):
+    with TestClient(app) as http:
+        return http.post("/v1/workout/parse/create", params={"workout_parser": "runfun"}, json=body)
+
+
+def test_create_on_many_dates(client):
+    """Test a workout is created once and scheduled on every date of the request"""
+    response = create({
+        "workout_expr": "10' zr",
+        "workout_schedule": "2024-10-07",
+        "workout_schedule_dates": ["2024-10-08"],
+        "workout_recurrence": {"start": "2024-10-07", "frequency": "daily", "count": 3},
+    })
+
+    assert response.status_code == 201
+    assert response.json() == {
+        "workout_id": 42,
+        "schedules": [
+            {"date": "2024-10-07", "status": "ok", "schedule_id": 20241007},
+            {"date": "2024-10-08", "status": "ok", "schedule_id": 20241008},
+            {"date": "2024-10-09", "status": "ok", "schedule_id": 20241009},
+        ],
+        "failed": 0,
+    }
+    assert client.create_workout.call_count == 1
+
+
+def test_create_reports_failed_dates(client):
+    """Test dates that could not be scheduled are reported with a multi-status response"""
+    def schedule(workout_id, day):
+        if day == date(2024, 10, 8):
+            raise RuntimeError("Garmin Connect is down")
+        return 1
+
+    client.schedule_workout.side_effect = schedule
+    response = create({"workout_expr": "10' zr", "workout_schedule_dates": ["2024-10-07", "2024-10-08"]})
+
+    assert response.status_code == 207
+    assert response.json() == {
+        "workout_id": 42,
+        "schedules": [
+            {"date": "2024-10-07", "status": "ok", "schedule_id": 1},
+            {"date": "2024-10-08", "status": "failed", "error": "Garmin Connect is down"},
+        ],
+        "failed": 1,
+    }
+
+
+def test_create_rejects_excessive_recurrence(client):
+    """Test a recurrence producing too many dates is rejected before the workout is created"""
+    response = create({
+        "workout_expr": "10' zr",
+        "workout_recurrence": {"start": "2024-10-07", "frequency": "daily", "count": 500},
+    })
+
+    assert response.status_code == 400
+    client.create_workout.assert_not_called()
+
+
+def test_create_rejects_invalid_payload(client):
+    """Test a workout Garmin Connect would reject is answered with the problems of its payload"""
+    client.create_workout.side_effect = GarminPayloadValidationError([("steps", "must not be empty")])
+
+    response = create({"workout_expr": "10' zr"})
+
+    assert response.status_code == 422
+    assert response.json() == {
+        "error": "invalid_payload",
+        "message": "The workout would be rejected by Garmin Connect",
+        "errors": [{"path": "steps", "message": "must not be empty"}],
+    }
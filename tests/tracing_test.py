@@ -0,0 +1,170 @@
+import inspect
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tracing import (
+    CLIENT,
+    NOOP_SPAN,
+    STATUS_ERROR,
+    FileExporter,
+    SpanExporter,
+    Tracer,
+    TracingMiddleware,
+    current_span,
+    parse_traceparent,
+    span,
+    trace_requests,
+    traced,
+)
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class CollectingExporter(SpanExporter):
+    def __init__(self) -> None:
+        super().__init__()
+        self.spans = []
+
+    def export(self, span) -> None:
+        self.spans.append(span)
+
+    def write(self, payload) -> None:
+        pass
+
+
+@pytest.fixture
+def exporter():
+    return CollectingExporter()
+
+
+@pytest.fixture
+def tracer(exporter):
+    return Tracer(exporter, sample_ratio=1.0)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (TRACEPARENT, ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)),
+    ("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00", ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", False)),
+    ("00-00000000000000000000000000000000-b7ad6b7169203331-01", None),
+    ("ff-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01", None),
+    ("00-0af7651916cd43dd-b7ad6b7169203331-01", None),
+    (None, None),
+])
+def test_parse_traceparent(value, expected):
+    """Test W3C traceparent headers are parsed and invalid ones ignored"""
+    assert parse_traceparent(value) == expected
+
+
+def test_span_outside_trace_is_noop():
+    """Test spans started outside a sampled trace are the shared no-op span"""
+    assert current_span() is None
+    with span("parse") as s:
+        s.set_attribute("key", "value")
+    assert s is NOOP_SPAN
+
+
+def test_sampling(exporter):
+    """Test the sampling ratio applies to new traces and the caller's decision to joined traces"""
+    assert Tracer(exporter, sample_ratio=0.0).start_trace("request") is NOOP_SPAN
+    assert Tracer(None, sample_ratio=1.0).start_trace("request") is NOOP_SPAN
+
+    joined = Tracer(exporter, sample_ratio=0.0).start_trace("request", TRACEPARENT, "vendor=1")
+    assert joined.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert joined.parent_id == "b7ad6b7169203331"
+    assert Tracer(exporter, sample_ratio=1.0).start_trace("request", TRACEPARENT[:-2] + "00") is NOOP_SPAN
+
+
+def test_child_spans_form_a_tree(tracer, exporter):
+    """Test spans started in a span are its children and errors mark the span"""
+    with tracer.start_trace("request") as root:
+        with span("parse"):
+            with span("tokenize"):
+                pass
+        with pytest.raises(ValueError), span("serialize"):
+            raise ValueError("bad step")
+    assert current_span() is None
+
+    spans = {s.name: s for s in exporter.spans}
+    assert spans["parse"].parent_id == root.span_id
+    assert spans["tokenize"].parent_id == spans["parse"].span_id
+    assert spans["serialize"].status == STATUS_ERROR
+    assert spans["serialize"].attributes["exception.type"] == "ValueError"
+    assert [s.name for s in exporter.spans][-1] == "request"
+
+
+def test_traced_keeps_signature(tracer, exporter):
+    """Test traced functions keep their signature and run in a span"""
+    @traced("dependency get_parser")
+    def get_parser(workout_parser: str = "runfun"):
+        return workout_parser
+
+    assert list(inspect.signature(get_parser).parameters) == ["workout_parser"]
+    with tracer.start_trace("request"):
+        assert get_parser(workout_parser="x") == "x"
+    assert exporter.spans[0].name == "dependency get_parser"
+
+
+def test_trace_requests_records_client_spans(tracer, exporter):
+    """Test outbound requests are recorded with status and body sizes"""
+    session = MagicMock()
+    session.request.return_value = MagicMock(status_code=404, content=b"not found")
+    session.request.return_value.request.body = b'{"a":1}'
+    trace_requests(session)
+
+    with tracer.start_trace("request"):
+        session.request("get", "https://connect.garmin.com/workout-service/workout/1?x=1")
+
+    client = exporter.spans[0]
+    assert client.kind == CLIENT
+    assert client.name == "HTTP GET"
+    assert client.attributes == {
+        "http.request.method": "GET",
+        "url.full": "https://connect.garmin.com/workout-service/workout/1",
+        "http.response.status_code": 404,
+        "http.request.body.size": 7,
+        "http.response.body.size": 9,
+    }
+    assert client.status == STATUS_ERROR
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    """Test spans are written as OTLP/JSON documents, one per line"""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(FileExporter(str(path), flush_interval=0.01), sample_ratio=1.0)
+
+    with tracer.start_trace("request", TRACEPARENT, attributes={"http.response.status_code": 201}):
+        with span("parse"):
+            pass
+    tracer.shutdown()
+
+    documents = [json.loads(line) for line in path.read_text().splitlines()]
+    spans = [s for d in documents for s in d["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    assert [s["name"] for s in spans] == ["parse", "request"]
+    assert spans[1]["traceId"] == "0af7651916cd43dd8448eb211c80319c"
+    assert spans[1]["parentSpanId"] == "b7ad6b7169203331"
+    assert spans[1]["attributes"] == [{"key": "http.response.status_code", "value": {"intValue": "201"}}]
+    assert int(spans[1]["endTimeUnixNano"]) >= int(spans[1]["startTimeUnixNano"])
+
+
+def test_middleware_names_span_after_route(tracer, exporter):
+    """Test requests run in a server span named after their route, returned in traceresponse"""
+    app = FastAPI()
+
+    @app.get("/workouts/{workout_id}")
+    async def get_workout(workout_id: int):
+        with span("parse"):
+            return {"workout_id": workout_id}
+
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+    response = TestClient(app).get("/workouts/7", headers={"traceparent": TRACEPARENT})
+
+    server = exporter.spans[-1]
+    assert server.name == "GET /workouts/{workout_id}"
+    assert server.attributes["http.response.status_code"] == 200
+    assert server.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert exporter.spans[0].parent_id == server.span_id
+    assert response.headers["traceresponse"] == server.traceparent